@@ -9,19 +9,44 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, Dict, AsyncGenerator, Optional
+import logging
+import time
+import uuid
+from typing import Any, Dict, AsyncGenerator, List, Optional, Tuple
 
+from celery import group
 from celery.result import AsyncResult
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
 
-from ..core.schemas import OrchestratorPlan, TaskDispatchResponse, UserRequest
-from ..orchestrator.orchestrator import get_orchestrator
+from .. import config
+from ..core.schemas import (
+    BatchDispatchResponse,
+    BatchUserRequest,
+    BrainReloadRequest,
+    OrchestratorPlan,
+    OrchestratorTask,
+    TaskDispatchResponse,
+    UserRequest,
+)
+from ..core.admission import AdmissionRejected, admission_controller
+from ..core.asset_registry import asset_registry, current_session
+from ..core.cache import plan_cache
+from ..core.coalescing import normalize_prompt, plan_single_flight, task_coalescer
+from ..core.intent_classifier import routing_log
+from ..core.memory import memory, sessions
+from ..core.metrics import STAGE_SECONDS, metrics
+from ..core.semantic_cache import all_semantic_caches
+from ..core.simple_responder import fast_path
+from ..core.task_events import READY_STATES, task_event_hub
+from ..core.tracing import tracer
+from ..orchestrator.orchestrator import get_orchestrator, orchestrator_registry
 from ..workers.celery_app import celery_app
 from ..workers.tasks_3d_generation import generate_3d_model
 from ..workers.tasks_web_research import perform_web_research
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # This maps the worker names from the LLM plan to the
 # actual Celery task functions.
@@ -33,63 +58,315 @@ WORKER_MAP: Dict[str, Any] = {
 
 
 @router.post("/interact", response_model=TaskDispatchResponse, status_code=status.HTTP_202_ACCEPTED)
-async def handle_interaction(request: UserRequest) -> TaskDispatchResponse:
+async def handle_interaction(
+    request: UserRequest,
+    traceparent: Optional[str] = Header(None, description="Optional W3C trace context to continue."),
+) -> TaskDispatchResponse:
     """
     The main interaction endpoint for MILES.
 
     1.  Receives the user's prompt.
-    2.  Asks the Orchestrator "brain" to process it.
-    3.  If the brain assigns tasks, dispatches them to Celery.
+    2.  Answers trivial prompts locally (tier 0), otherwise asks the Orchestrator "brain".
+    3.  If the brain assigns tasks, dispatches them to Celery (HTTP 429 if
+        the worker's queue is too backed up to meet its SLO).
     4.  Returns the brain's direct response (if any) and task IDs (if any).
+
+    Each call is one trace (`trace_id` in the response); worker tasks join it.
     """
 
     try:
-        # 1. Get the current "brain" (Gemini or Ollama)
-        print(f"[DEBUG_ENDPOINT] Received request: '{request.prompt}'")
-        orchestrator = get_orchestrator()
-        print(f"[DEBUG_ENDPOINT] Brain Type: {type(orchestrator)}")
+        with tracer.span("interact", traceparent, prompt_chars=len(request.prompt)):
+            logger.debug("Received request: %r", request.prompt)
+
+            # 1-2. Tier 0 (fast path) first, then the current "brain" (Gemini or Ollama)
+            #      processes the request (Hybrid Decision).
+            plan, shared = await _plan_prompt(request.prompt)
+            logger.debug("Plan generated%s: %s", " (shared)" if shared else "", plan)
+
+            if not plan.tasks and not plan.direct_response:
+                raise HTTPException(status_code=400, detail="Orchestrator could not generate a valid response.")
+            # Files the workers produce are registered under this user's session
+            current_session.set(_session_key(request.user_id))
+
+            # 3. Admission control, then dispatch tasks to the queue (if any).
+            #    A rejected request leaves no turn in the user's memory.
+            estimate = _admit(plan.tasks)
+            await _remember_turn(request, plan)
+            task_ids = _dispatch_tasks(plan)
+
+            # 4. Return the response
+            # If we have tasks, it's a 202 Accepted (which is the default status code).
+            # If we ONLY have a direct response, we might want to consider a 200 OK,
+            # but for simplicity/consistency of the endpoint, 202 is fine, or we can just return.
+            return _build_dispatch_response(plan, task_ids, estimate)
 
-        # 2. Ask the brain to process the request (Hybrid Decision)
-        plan = orchestrator.decompose_task(request.prompt)
-        print(f"[DEBUG_ENDPOINT] Plan Generated: {plan}")
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
 
-        if not plan.tasks and not plan.direct_response:
-            raise HTTPException(status_code=400, detail="Orchestrator could not generate a valid response.")
 
-        # 3. Dispatch tasks to the queue (if any)
-        task_ids = []
-        for task in plan.tasks:
-            worker_function = WORKER_MAP.get(task.worker_name)
-            if worker_function is None:
-                print(f"Warning: Orchestrator requested unknown worker: {task.worker_name}")
-                continue
+@router.post("/interact/stream", summary="Interact with token streaming (SSE)")
+async def stream_interaction(
+    request: UserRequest,
+    traceparent: Optional[str] = Header(None, description="Optional W3C trace context to continue."),
+) -> StreamingResponse:
+    """
+    Streaming variant of /interact, as Server-Sent Events over one connection.
+
+    Events, in order:
+    - `token`    {"text": ...}  direct_response fragments as the model produces them
+    - `plan`     the final OrchestratorPlan
+    - `dispatch` the TaskDispatchResponse (same shape as /interact)
+    - unnamed task progress/result events tagged with `task_id` (worker route only)
+    - `error`    {"status", "detail", ...} if planning or dispatch failed
+    - `end`      always last
+    """
+
+    async def event_generator() -> AsyncGenerator[str, None]:
+        logger.debug("Streaming request: %r", request.prompt)
+        plan: Optional[OrchestratorPlan] = None
+        started = time.perf_counter()
+
+        # The trace covers planning and dispatch; the task relay below only waits.
+        with tracer.span("interact", traceparent, prompt_chars=len(request.prompt), streaming=True) as span:
+            try:
+                fast = fast_path.respond(request.prompt) if config.FAST_PATH_ENABLED else None
+                if fast is not None:
+                    rule, answer = fast
+                    plan = OrchestratorPlan(direct_response=answer, tasks=[], tier=f"fast_path:{rule}")
+                    yield _sse("token", {"text": answer})
+                else:
+                    first_token = True
+                    async for item in get_orchestrator().astream_decompose(request.prompt):
+                        if isinstance(item, OrchestratorPlan):
+                            plan = item
+                            continue
+                        if first_token:
+                            first_token = False
+                            metrics.observe(STAGE_SECONDS, time.perf_counter() - started, stage="first_token")
+                        yield _sse("token", {"text": item})
+                    if first_token and plan is not None and plan.direct_response:
+                        # A brain may answer with a plan alone (e.g. its connection fallback).
+                        yield _sse("token", {"text": plan.direct_response})
+
+                if plan is None or (not plan.tasks and not plan.direct_response):
+                    yield _sse("error", {"status": 400, "detail": "Orchestrator could not generate a valid response."})
+                    yield "event: end\ndata: {}\n\n"
+                    return
+                if plan.tier is None:
+                    plan.tier = "brain"
+                _log_routing(request.prompt, plan)
+                _record_plan(plan, started)
+                yield _sse("plan", plan.model_dump())
+                current_session.set(_session_key(request.user_id))
+
+                estimate = _admit(plan.tasks)
+                await _remember_turn(request, plan)
+                task_ids = _dispatch_tasks(plan)
+                yield _sse("dispatch", _build_dispatch_response(plan, task_ids, estimate).model_dump())
+            except HTTPException as exc:
+                span.set("http.status_code", exc.status_code)
+                error = {"status": exc.status_code, "detail": exc.detail}
+                if exc.headers and "Retry-After" in exc.headers:
+                    error["retry_after"] = int(exc.headers["Retry-After"])
+                yield _sse("error", error)
+                yield "event: end\ndata: {}\n\n"
+                return
+            except Exception as exc:
+                span.set("http.status_code", 500)
+                yield _sse("error", {"status": 500, "detail": str(exc)})
+                yield "event: end\ndata: {}\n\n"
+                return
+
+        # Worker route: relay task progress on the same connection (ends with `end`).
+        async for chunk in _task_event_stream(task_ids):
+            yield chunk
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.post(
+    "/interact/batch",
+    response_model=BatchDispatchResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Plan and dispatch many prompts at once",
+)
+async def handle_batch_interaction(batch: BatchUserRequest) -> BatchDispatchResponse:
+    """
+    Batch variant of /interact for kiosks and offline jobs.
+
+    1.  Plans every prompt concurrently (bounded by BATCH_PLANNING_CONCURRENCY).
+    2.  Applies admission control to the batch as a whole (HTTP 429 if backed up).
+    3.  Dispatches ALL resulting worker tasks in a single Celery `group`.
+    4.  Returns one batch ID plus a TaskDispatchResponse per prompt, in order.
 
-            # .delay() is the Celery command to run this "asynchronously"
-            task_result = worker_function.delay(task.prompt)
-            task_ids.append(task_result.id)
-
-        # 4. Return the response
-        # If we have tasks, it's a 202 Accepted (which is the default status code).
-        # If we ONLY have a direct response, we might want to consider a 200 OK,
-        # but for simplicity/consistency of the endpoint, 202 is fine, or we can just return.
-        
-        message = "Request processed."
-        if task_ids:
-            message = "Tasks accepted and are being processed."
-        elif plan.direct_response:
-            message = "Responded directly."
-
-        return TaskDispatchResponse(
-            message=message,
-            task_ids=task_ids,
-            plan=plan,
-            direct_response=plan.direct_response,
+    The whole batch is one trace; every item reports the same `trace_id`.
+    """
+
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Batch contains no requests.")
+    if len(batch.requests) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: at most {config.BATCH_MAX_ITEMS} requests per call.",
         )
 
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    with tracer.span("interact.batch", batch_size=len(batch.requests)):
+        semaphore = asyncio.Semaphore(config.BATCH_PLANNING_CONCURRENCY)
+
+        async def plan_one(item: UserRequest) -> Optional[OrchestratorPlan]:
+            async with semaphore:
+                try:
+                    plan, _shared = await _plan_prompt(item.prompt)
+                    return plan
+                except Exception as exc:
+                    logger.warning("Batch planning failed for %r: %s", item.prompt, exc)
+                    return None
+
+        plans = await asyncio.gather(*(plan_one(item) for item in batch.requests))
+        # The group publish below does not coalesce, so every task is a new job.
+        estimate = _admit([task for plan in plans if plan is not None for task in plan.tasks], coalesce=False)
+        for item, plan in zip(batch.requests, plans):
+            if plan is not None:
+                await _remember_turn(item, plan)
+
+        # Collect every worker signature so the broker sees one group publish.
+        signatures = []
+        owners: List[int] = []
+        for index, plan in enumerate(plans):
+            if plan is None:
+                continue
+            for task in plan.tasks:
+                worker_function = WORKER_MAP.get(task.worker_name)
+                if worker_function is None:
+                    logger.warning("Orchestrator requested unknown worker: %s", task.worker_name)
+                    continue
+                # Items may belong to different users, so each carries its own session header.
+                signature = worker_function.s(task.prompt).set(
+                    headers={"miles_session": _session_key(batch.requests[index].user_id)}
+                )
+                if config.PRIORITY_LANE_ENABLED:
+                    # Bulk work yields to interactive requests on the same queue.
+                    signature = signature.set(priority=config.TASK_PRIORITY_BATCH)
+                signatures.append(signature)
+                owners.append(index)
+
+        task_ids: List[List[str]] = [[] for _ in plans]
+        batch_id = str(uuid.uuid4())
+        if signatures:
+            try:
+                with tracer.span("dispatch.group", tasks=len(signatures)):
+                    group_result = group(signatures).apply_async()
+            except Exception as exc:
+                raise HTTPException(status_code=500, detail=str(exc)) from exc
+            batch_id = group_result.id
+            for owner, child in zip(owners, group_result.results):
+                task_ids[owner].append(child.id)
+
+        items = []
+        for plan, ids in zip(plans, task_ids):
+            if plan is None or (not plan.tasks and not plan.direct_response):
+                items.append(
+                    TaskDispatchResponse(
+                        message="Orchestrator could not generate a valid response.",
+                        task_ids=[],
+                        plan=plan or OrchestratorPlan(),
+                    )
+                )
+                continue
+            items.append(_build_dispatch_response(plan, ids, estimate if ids else None))
+
+        return BatchDispatchResponse(batch_id=batch_id, items=items)
+
+
+@router.post("/brain/reload", summary="Swap the orchestrator brain")
+async def reload_brain(request: BrainReloadRequest) -> Dict[str, Any]:
+    """
+    Rebuild the active brain (optionally in another mode) without a restart.
+    """
+
+    try:
+        brain = await orchestrator_registry.reload(request.mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return {"status": "reloaded", "mode": orchestrator_registry.mode, "brain": type(brain).__name__}
+
+
+@router.get("/brain/health", summary="Brain circuit breakers and latency health")
+async def brain_health() -> Dict[str, Any]:
+    """
+    Per-brain breaker state and latency score (fallback chain only).
+    """
+
+    brain = get_orchestrator()
+    health = getattr(brain, "health", None)
+    return {
+        "mode": orchestrator_registry.mode,
+        "brain": type(brain).__name__,
+        "members": health() if health is not None else [],
+    }
+
+
+@router.get("/assets", summary="Generated files of a user or a prompt")
+async def list_assets(
+    user_id: str = Query("default-user", description="Session whose files to list."),
+    prompt: Optional[str] = Query(None, description="List files generated for this prompt instead."),
+) -> Dict[str, Any]:
+    """
+    Images and models registered by any process (API or worker), newest first.
+    """
+
+    if prompt is not None:
+        assets = await asyncio.to_thread(asset_registry.by_prompt, prompt)
+    else:
+        assets = await asyncio.to_thread(asset_registry.list_session, _session_key(user_id))
+    return {"assets": assets}
+
+
+@router.post("/assets/{asset_id}/save", summary="Keep a generated file permanently")
+async def save_asset(asset_id: str) -> Dict[str, Any]:
+    """
+    Copy a generated file into the saved models directory; it is then never cleaned up.
+    """
+
+    asset = await asyncio.to_thread(asset_registry.get, asset_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail=f"Unknown asset: {asset_id}")
+    saved_path = await asyncio.to_thread(memory.save_model_permanently, asset["basename"])
+    if not saved_path:
+        raise HTTPException(status_code=410, detail=f"File no longer exists: {asset['basename']}")
+    return {"asset_id": asset_id, "saved_path": saved_path}
+
+
+@router.post("/assets/cleanup", summary="Delete a user's temporary files")
+async def cleanup_assets(
+    user_id: str = Query("default-user", description="Session whose temporary files to delete."),
+) -> Dict[str, Any]:
+    removed = await asyncio.to_thread(lambda: sessions.get(user_id).cleanup_session())
+    return {"removed": removed}
+
+
+@router.get("/cache/stats", summary="Response cache counters")
+async def cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss/eviction counters for the in-process response caches.
+    """
+
+    return {
+        "plan_cache": plan_cache.stats(),
+        "semantic_cache": {name: cache.stats() for name, cache in all_semantic_caches().items()},
+    }
+
+
+@router.get("/fast-path/stats", summary="Tier-0 responder counters")
+async def fast_path_stats() -> Dict[str, Any]:
+    """
+    How much traffic the tier-0 fast path answers without any brain.
+    """
+
+    return fast_path.stats()
 
 
 @router.get("/tasks/{task_id}", summary="Check task status")
@@ -107,29 +384,248 @@ async def stream_task(task_id: str) -> StreamingResponse:
     """
     Server-Sent Events (SSE) endpoint that pushes task progress/results
     to the client without requiring explicit polling.
+
+    State changes are pushed by the workers through the task event hub, so
+    the result backend is only read on connect, once for the final result,
+    and as a periodic re-sync if no event arrives.
     """
 
-    async def event_generator() -> AsyncGenerator[str, None]:
-        result = AsyncResult(task_id, app=celery_app)
-        last_state = ""
-
-        while not result.ready():
-            if result.status != last_state:
-                payload = json.dumps({"task_id": task_id, "status": result.status})
-                yield f"data: {payload}\n\n"
-                last_state = result.status
-            await asyncio.sleep(1)
-
-        payload = json.dumps(
-            {
-                "task_id": task_id,
-                "status": result.status,
-                "result": result.result,
-            }
+    return StreamingResponse(_task_event_stream([task_id]), media_type="text/event-stream")
+
+
+@router.get("/stream", summary="Stream progress for several tasks")
+async def stream_tasks(ids: str = Query(..., description="Comma-separated Celery task IDs.")) -> StreamingResponse:
+    """
+    Multiplexed SSE endpoint covering every task of one /interact call.
+
+    Each event carries its `task_id`; the stream sends a final `end` event
+    and closes once the last task has finished.
+    """
+
+    task_ids = list(dict.fromkeys(t.strip() for t in ids.split(",") if t.strip()))
+    if not task_ids:
+        raise HTTPException(status_code=400, detail="No task IDs provided.")
+    if len(task_ids) > config.TASK_STREAM_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.TASK_STREAM_MAX_IDS} task IDs per stream.",
         )
-        yield f"data: {payload}\n\n"
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return StreamingResponse(_task_event_stream(task_ids), media_type="text/event-stream")
+
+
+async def _task_event_stream(task_ids: List[str]) -> AsyncGenerator[str, None]:
+    """
+    Shared SSE generator: emits state changes for all given tasks, then each
+    task's final result, and closes with an `end` event after the last one.
+    """
+
+    # Subscribe BEFORE reading the current states so no transition is lost.
+    queue = task_event_hub.subscribe(task_ids)
+    try:
+        results = {task_id: AsyncResult(task_id, app=celery_app) for task_id in task_ids}
+        states = {task_id: result.status for task_id, result in results.items()}
+        last_states: Dict[str, str] = {}
+
+        while states:
+            for task_id, state in list(states.items()):
+                if state in READY_STATES:
+                    payload = json.dumps(_serialize_final(results[task_id]))
+                    yield f"data: {payload}\n\n"
+                    del states[task_id]
+                elif state != last_states.get(task_id):
+                    payload = json.dumps({"task_id": task_id, "status": state})
+                    yield f"data: {payload}\n\n"
+                    last_states[task_id] = state
+
+            if not states:
+                break
+
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=config.TASK_STREAM_RESYNC_SECONDS
+                )
+                if event["task_id"] in states:
+                    states[event["task_id"]] = event["status"]
+            except asyncio.TimeoutError:
+                for task_id in states:
+                    states[task_id] = results[task_id].status
+
+        yield "event: end\ndata: {}\n\n"
+    finally:
+        task_event_hub.unsubscribe(task_ids, queue)
+
+
+async def _plan_prompt(prompt: str) -> Tuple[OrchestratorPlan, bool]:
+    """
+    Produce a plan for one prompt: tier-0 fast path first, then the brain.
+
+    The brain's async path keeps slow LLM calls off the event loop, and
+    identical prompts already being planned share that one call.
+    Returns (plan, shared).
+    """
+
+    with tracer.span("plan"):
+        started = time.perf_counter()
+        if config.FAST_PATH_ENABLED:
+            fast = fast_path.respond(prompt)
+            if fast is not None:
+                rule, answer = fast
+                plan = OrchestratorPlan(direct_response=answer, tasks=[], tier=f"fast_path:{rule}")
+                _record_plan(plan, started)
+                return plan, False
+
+        orchestrator = get_orchestrator()
+
+        async def run_brain() -> OrchestratorPlan:
+            plan = await orchestrator.adecompose_task(prompt)
+            if plan.tier is None:
+                plan.tier = "brain"
+            _log_routing(prompt, plan)
+            return plan
+
+        plan_key = f"{orchestrator_registry.mode}:{normalize_prompt(prompt)}"
+        plan, shared = await plan_single_flight.run(plan_key, run_brain)
+        _record_plan(plan, started)
+        return plan, shared
+
+
+def _record_plan(plan: OrchestratorPlan, started: float) -> None:
+    """
+    Planning latency per answering tier (fast_path, plan_cache, semantic_cache, preflight, classifier, brain).
+    """
+
+    tier = (plan.tier or "brain").split(":", 1)[0]
+    metrics.observe(STAGE_SECONDS, time.perf_counter() - started, stage=tier)
+    metrics.inc("miles_plan_tier_total", tier=plan.tier or "brain")
+    span = tracer.current()
+    if span is not None:
+        span.set("tier", plan.tier or "brain")
+
+
+def _log_routing(prompt: str, plan: OrchestratorPlan) -> None:
+    """
+    Keep routing decisions an LLM made as training labels for the local intent
+    classifier (the DEMO brain's keyword heuristics are not worth learning).
+    """
+
+    if plan.tier == "brain" and orchestrator_registry.mode != "DEMO":
+        routing_log.record(prompt, [task.worker_name for task in plan.tasks])
+
+
+def _session_key(user_id: Optional[str]) -> str:
+    return sessions.session_key(user_id or "default-user")
+
+
+async def _remember_turn(request: UserRequest, plan: OrchestratorPlan) -> None:
+    """
+    Append the exchange to the user's own conversation session (off the event
+    loop: an evicted session is reloaded from disk on its next turn).
+    """
+
+    if not config.MEMORY_SESSIONS_ENABLED:
+        return
+
+    def remember() -> None:
+        session = sessions.get(request.user_id or "default-user")
+        session.add_message("user", request.prompt)
+        if plan.direct_response:
+            session.add_message("model", plan.direct_response)
+
+    try:
+        await asyncio.to_thread(remember)
+    except Exception as exc:
+        logger.warning("Could not record conversation turn: %s", exc)
+
+
+def _dispatch_tasks(plan: OrchestratorPlan) -> List[str]:
+    """
+    Send each planned task to its Celery worker and return the task IDs.
+    """
+
+    task_ids = []
+    for task in plan.tasks:
+        worker_function = WORKER_MAP.get(task.worker_name)
+        if worker_function is None:
+            logger.warning("Orchestrator requested unknown worker: %s", task.worker_name)
+            continue
+
+        # Dispatch asynchronously, or attach to an identical task already in flight
+        with metrics.timer("dispatch"):
+            task_id, coalesced = task_coalescer.dispatch(task.worker_name, task.prompt, worker_function)
+        if coalesced:
+            logger.debug("Attached to in-flight task %s", task_id)
+            metrics.inc("miles_tasks_coalesced_total", worker=task.worker_name)
+        task_ids.append(task_id)
+    return task_ids
+
+
+def _admit(tasks: List[OrchestratorTask], coalesce: bool = True) -> Optional[float]:
+    """
+    Admission control for the tasks about to be dispatched.
+
+    Raises HTTP 429 with Retry-After if any worker's estimated wait exceeds
+    its SLO; otherwise returns the slowest estimated completion time.
+    Tasks that will attach to an identical in-flight job cost nothing, unless
+    the caller dispatches without coalescing (`coalesce=False`).
+    """
+
+    new_jobs: Dict[str, int] = {}
+    for task in tasks:
+        worker_function = WORKER_MAP.get(task.worker_name)
+        if worker_function is None:
+            continue
+        if coalesce and task_coalescer.inflight(task.worker_name, task.prompt, worker_function):
+            continue
+        new_jobs[task.worker_name] = new_jobs.get(task.worker_name, 0) + 1
+
+    estimates = []
+    for worker_name, jobs in new_jobs.items():
+        try:
+            estimate = admission_controller.check(worker_name, jobs)
+        except AdmissionRejected as exc:
+            metrics.inc("miles_admission_rejected_total", worker=worker_name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(exc),
+                headers={"Retry-After": str(exc.retry_after)},
+            ) from exc
+        if estimate is not None:
+            estimates.append(estimate)
+
+    return max(estimates) if estimates else None
+
+
+def _sse(event: str, data: Any) -> str:
+    """
+    Format one named Server-Sent Event.
+    """
+
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _build_dispatch_response(
+    plan: OrchestratorPlan, task_ids: List[str], estimate: Optional[float] = None
+) -> TaskDispatchResponse:
+    """
+    Wrap a plan and its dispatched task IDs into the public response model.
+    """
+
+    message = "Request processed."
+    if task_ids:
+        message = "Tasks accepted and are being processed."
+    elif plan.direct_response:
+        message = "Responded directly."
+
+    span = tracer.current()
+    return TaskDispatchResponse(
+        message=message,
+        task_ids=task_ids,
+        plan=plan,
+        direct_response=plan.direct_response,
+        estimated_completion_seconds=estimate,
+        trace_id=span.trace_id if span is not None else None,
+    )
 
 
 def _serialize_task(result: AsyncResult) -> Dict[str, Any]:
@@ -148,3 +644,14 @@ def _serialize_task(result: AsyncResult) -> Dict[str, Any]:
 
     return response
 
+
+def _serialize_final(result: AsyncResult) -> Dict[str, Any]:
+    """
+    Final SSE payload for a finished task. Failures carry the exception text.
+    """
+
+    value = result.result
+    if not result.successful() and value is not None:
+        value = str(value)
+    return {"task_id": result.id, "status": result.status, "result": value}
+
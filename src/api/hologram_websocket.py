@@ -3,19 +3,26 @@ Hologram WebSocket Router
 
 Relays hand tracking data from the UDP tracker (Python script on port 5052)
 to the 'display' (Browser tab) in real-time via WebSocket.
+
+Per-frame paths log nothing; relay volume is reported as a periodic DEBUG
+summary, and errors are rate-limited by the logging layer (src/core/logs.py).
 """
 
 import asyncio
 import json
+import logging
+import time
 from typing import List, Dict, Any
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 UDP_HOST = "127.0.0.1"
 UDP_PORT = 5052
+RELAY_REPORT_SECONDS = 30.0  # how often the relayed-frame count is logged (DEBUG)
 
 
 class HologramCommand(BaseModel):
@@ -32,18 +39,18 @@ class ConnectionManager:
     async def connect_display(self, websocket: WebSocket):
         await websocket.accept()
         self.display_connections.append(websocket)
-        print(f"[WS] Display connected. Total: {len(self.display_connections)}")
+        logger.info("Display connected. Total: %d", len(self.display_connections))
 
         # Send last model URL to new client if available
         if self.last_model_url:
             msg = json.dumps({"type": "load_model", "url": self.last_model_url})
-            print(f"[WS] Sending stored model to new client: {self.last_model_url}")
+            logger.info("Sending stored model to new client: %s", self.last_model_url)
             await websocket.send_text(msg)
 
     def disconnect_display(self, websocket: WebSocket):
         if websocket in self.display_connections:
             self.display_connections.remove(websocket)
-            print("[WS] Display disconnected.")
+            logger.info("Display disconnected.")
 
     async def broadcast_to_displays(self, message: str):
         """Send data to all connected display clients."""
@@ -52,7 +59,7 @@ class ConnectionManager:
             try:
                 await connection.send_text(message)
             except Exception as e:
-                print(f"[WS] Error broadcasting to display: {e}")
+                logger.warning("Error broadcasting to display: %s", e)
                 dead.append(connection)
         for d in dead:
             self.disconnect_display(d)
@@ -70,7 +77,9 @@ class UDPHandTrackerProtocol(asyncio.DatagramProtocol):
 
     def connection_made(self, transport):
         self.transport = transport
-        print(f"[UDP] Listening for hand-tracker data on {UDP_HOST}:{UDP_PORT}")
+        self.frames = 0
+        self.last_report = time.monotonic()
+        logger.info("Listening for hand-tracker data on %s:%d", UDP_HOST, UDP_PORT)
 
     def datagram_received(self, data: bytes, addr):
         message = data.decode("utf-8", errors="replace").strip()
@@ -79,12 +88,22 @@ class UDPHandTrackerProtocol(asyncio.DatagramProtocol):
             # Schedule coroutine on the running event loop (thread-safe)
             loop = asyncio.get_event_loop()
             loop.create_task(manager.broadcast_to_displays(message))
+            self.frames += 1
+
+        now = time.monotonic()
+        if now - self.last_report >= RELAY_REPORT_SECONDS:
+            logger.debug(
+                "Relayed %d frames in %.0fs to %d display(s)",
+                self.frames, now - self.last_report, len(manager.display_connections),
+            )
+            self.frames = 0
+            self.last_report = now
 
     def error_received(self, exc):
-        print(f"[UDP] Error: {exc}")
+        logger.warning("UDP error: %s", exc)
 
     def connection_lost(self, exc):
-        print(f"[UDP] Connection lost: {exc}")
+        logger.info("UDP connection lost: %s", exc)
 
 
 async def start_udp_listener():
@@ -94,7 +113,7 @@ async def start_udp_listener():
         UDPHandTrackerProtocol,
         local_addr=(UDP_HOST, UDP_PORT)
     )
-    print(f"[UDP] ✓ Bridge running on {UDP_HOST}:{UDP_PORT}")
+    logger.info("Bridge running on %s:%d", UDP_HOST, UDP_PORT)
 
 
 # ---------------------------------------------------------------------------
@@ -107,8 +126,7 @@ async def websocket_endpoint(websocket: WebSocket, client_type: str):
     client_type: 'display'  — browser tab showing the 3D model
     (Tracker now sends UDP, not WebSocket.)
     """
-    print(f"[WS-RAW] Connection attempt: {client_type}")
-    import traceback
+    logger.debug("Connection attempt: %s", client_type)
     try:
         if client_type == "display":
             await manager.connect_display(websocket)
@@ -130,8 +148,7 @@ async def websocket_endpoint(websocket: WebSocket, client_type: str):
                 pass
 
     except Exception as e:
-        print(f"[WS] CRITICAL ERROR in endpoint: {e}")
-        traceback.print_exc()
+        logger.exception("Error in hologram WebSocket endpoint: %s", e)
         try:
             await websocket.close()
         except Exception:
@@ -11,12 +11,34 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent / ".env"  # src/.env
 load_dotenv(dotenv_path=env_path)
 
+# Runtime data (caches, journals, registries) lives under src/data
+DATA_DIR = Path(__file__).parent / "data"
+
 # Set to "DEMO" for the deterministic mock brain.
 # Set to "GEMINI" to use the fast, powerful online API.
 # Set to "LOCAL" to use the free, private, local Ollama model.
+# Set to "CHAIN" to try the brains in BRAIN_CHAIN in order, failing over when one is down.
 # This "swappable brain" design is a key feature of the MILES architecture.
 BRAIN_MODE = "GEMINI"
 
+# --- Brain Fallback Chain (BRAIN_MODE = "CHAIN") ---
+# Each brain has a per-call deadline and a circuit breaker: after
+# BRAIN_BREAKER_FAILURES consecutive failures or timeouts it is skipped
+# instantly until BRAIN_BREAKER_RESET_SECONDS pass, then one probe request may
+# close it again. Brains whose average latency exceeds BRAIN_SLOW_FRACTION of
+# their deadline are tried after the healthy ones.
+BRAIN_CHAIN = ["GEMINI", "LOCAL", "DEMO"]
+BRAIN_DEADLINE_SECONDS = {
+    "GEMINI": 15.0,
+    "LOCAL": 60.0,
+    "DEMO": 2.0,
+}
+BRAIN_DEFAULT_DEADLINE_SECONDS = 30.0
+BRAIN_BREAKER_FAILURES = 3
+BRAIN_BREAKER_RESET_SECONDS = 30.0
+BRAIN_HEALTH_EWMA_ALPHA = 0.3
+BRAIN_SLOW_FRACTION = 0.5
+
 # --- API Keys ---
 # !! IMPORTANT: Never commit real API keys to Git.
 # !! Use environment variables in a real application.
@@ -32,11 +54,246 @@ HUGGINGFACE_API_TOKEN = os.environ.get("HUGGINGFACE_API_TOKEN", "")
 # --- Local Model Config ---
 # Ensure you have run 'ollama run llama3.1:8b' in your terminal
 LOCAL_MODEL_NAME = "llama3.1:8b"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST")  # None = http://localhost:11434
+# How long Ollama keeps the model loaded after each request ("30m", "-1" = forever).
+OLLAMA_KEEP_ALIVE = "30m"
+# Load the model at API startup so the first request does not pay the load time.
+OLLAMA_PRELOAD = True
+OLLAMA_PRELOAD_TIMEOUT_SECONDS = 120
+# Ping the model after this long without traffic so keep_alive never lapses (0 = off).
+OLLAMA_KEEPWARM_SECONDS = 240
+# Pooled HTTP connections to the Ollama server, shared by all requests.
+OLLAMA_MAX_CONNECTIONS = 8
+OLLAMA_TIMEOUT_SECONDS = 300
+# A brain swapped out by /brain/reload waits this long for its in-flight calls before closing.
+OLLAMA_CLOSE_GRACE_SECONDS = 60
 
 # --- Task Queue Config ---
 REDIS_BROKER_URL = "redis://localhost:6379/0"
 REDIS_BACKEND_URL = "redis://localhost:6379/1"
 
+# --- Worker Topology ---
+# Celery task name, queue and worker concurrency for each plan worker name.
+# GPU-bound 3D jobs and IO-bound research run on separate queues (and separate
+# worker processes) so multi-minute 3D bursts never starve quick RAG searches.
+# WORKER_CONCURRENCY must match the -c flag of each queue's worker launch
+# profile (see README / start_miles.bat); admission control relies on it.
+WORKER_TASK_NAMES = {
+    "3D_Generator": "tasks.generate_3d_model",
+    "RAG_Search": "tasks.perform_web_research",
+}
+WORKER_QUEUES = {
+    "3D_Generator": "gpu",
+    "RAG_Search": "io",
+}
+WORKER_CONCURRENCY = {
+    "3D_Generator": 1,
+    "RAG_Search": 8,
+}
+
+# Optional priority lane (Redis broker priority steps; lower = served first).
+# Interactive /interact dispatches jump ahead of bulk /interact/batch work.
+PRIORITY_LANE_ENABLED = True
+CELERY_PRIORITY_STEPS = [0, 3, 6, 9]
+TASK_PRIORITY_INTERACTIVE = 0
+TASK_PRIORITY_BATCH = 6
+
+# --- Admission Control ---
+# Reject new jobs (HTTP 429 + Retry-After) when the estimated queue wait
+# exceeds the worker's SLO. Workers without an SLO are always admitted.
+ADMISSION_SLO_SECONDS = {
+    "3D_Generator": 600,
+    "RAG_Search": 120,
+}
+# Used until workers have reported real durations.
+ADMISSION_DEFAULT_DURATION_SECONDS = {
+    "3D_Generator": 90.0,
+    "RAG_Search": 15.0,
+}
+# A running-job marker older than this is presumed dead (worker killed
+# mid-task) and no longer counted. Keep it above the longest real job.
+ADMISSION_RUNNING_STALE_SECONDS = {
+    "3D_Generator": 1800,
+    "RAG_Search": 600,
+}
+ADMISSION_EWMA_ALPHA = 0.2     # weight of the newest job duration
+ADMISSION_CACHE_SECONDS = 1.0  # how long a queue-depth snapshot is reused
+
+# --- Task Progress Events ---
+# Workers publish state changes here; the API runs a single subscriber that
+# fans them out to all SSE clients (see src/core/task_events.py).
+TASK_EVENTS_REDIS_URL = REDIS_BACKEND_URL
+TASK_EVENTS_CHANNEL = "miles:task_events"
+# Safety net: an SSE stream re-reads the result backend if no event arrives
+# for this many seconds (covers missed pub/sub messages).
+TASK_STREAM_RESYNC_SECONDS = 15
+# Upper bound on task IDs accepted by the multiplexed /stream?ids=... endpoint.
+TASK_STREAM_MAX_IDS = 32
+
+# --- Request Coalescing ---
+# Identical (worker, prompt) dispatches attach to the task already in flight.
+# The claim expires after this many seconds even if the task never reports back.
+COALESCE_TASK_TTL_SECONDS = 900
+
+# --- Tier-0 Fast Path ---
+# Rules from src/core/simple_responder.py that may answer a prompt before any
+# brain runs, in order. "short_question" and "short_prompt" also exist but are
+# off by default: they would intercept terse commands like "generate helmet model".
+FAST_PATH_ENABLED = True
+FAST_PATH_RULES = ["empty", "greeting", "name", "math"]
+
+# --- Intent Routing ---
+# Phrases per intent, compiled once into one automaton (src/core/intent_router.py)
+# used by every brain and the fast path. Words match on word boundaries; a
+# trailing * on a single word matches any word with that prefix.
+INTENT_RULES = {
+    # Pre-flight 3D route: needs a verb AND a noun from these lists.
+    "3d_verb": ["generate", "make", "create", "build", "produce", "render"],
+    "3d_noun": ["3d", "model", "glb", "mesh", "hologram"],
+    # Pre-flight RAG route: explicit search commands only, not "research" alone.
+    "web_search": [
+        "search for", "search about", "search on", "look up", "web search", "latest news",
+        "find news", "find info", "find information", "find latest",
+        "find me news", "find me info", "find me information", "find me latest",
+        "conduct research", "conduct a research", "do research", "do a research",
+    ],
+    # The fast path never answers these; they go to the brain.
+    "deep_research": [
+        "research*", "deep dive", "analyze*", "analysis", "report*", "whitepaper*",
+        "citation*", "compare*", "survey*", "comprehensive*", "study*", "pipeline*",
+        "architecture*", "implementation details", "evaluation*", "benchmark*",
+    ],
+    "greeting": ["hi", "hello", "hey", "hola", "yo", "sup"],
+    "ask_name": ["your name"],
+    # DEMO brain routing.
+    "demo_research": ["research*", "explain*", "find*", "compare*"],
+    "demo_hologram": ["hologram*", "gesture*", "rotate*"],
+}
+
+# --- Intent Classifier ---
+# Local hashed TF-IDF + linear model (src/core/intent_classifier.py) consulted
+# after the rule pre-flight. A 3D/RAG prediction at or above the threshold is
+# dispatched without an LLM call; anything else goes to the brain. Inactive
+# until trained: python -m src.core.intent_classifier train
+# Routing decisions made by the brain are appended to ROUTING_LOG_PATH as labels.
+INTENT_CLASSIFIER_ENABLED = True
+INTENT_CLASSIFIER_PATH = DATA_DIR / "intent_classifier.npz"
+INTENT_CLASSIFIER_THRESHOLD = 0.92  # checked by tests/verify_intent_classifier.py
+INTENT_CLASSIFIER_DIM = 2 ** 14
+ROUTING_LOG_PATH = DATA_DIR / "routing_log.jsonl"
+
+# --- Gemini Key Pool ---
+# All Gemini callers (orchestrator, RAG worker) share one key pool in Redis
+# (src/core/key_pool.py): per-key request budget, 429 cooldowns, least-loaded
+# selection. Set the budget to your tier's per-key limit.
+GEMINI_KEY_POOL_REDIS_URL = REDIS_BACKEND_URL
+GEMINI_KEY_REQUESTS_PER_MINUTE = 15
+GEMINI_KEY_BURST = 5
+GEMINI_KEY_COOLDOWN_SECONDS = 30.0  # when the 429 carries no retry delay
+GEMINI_KEY_STALE_SECONDS = 300.0    # in-flight counts of a key idle this long are reset
+RAG_KEY_EXHAUSTED_RETRIES = 3       # RAG jobs re-queued (with the pool's wait) when every key is cooling down
+
+# --- Plan Cache (Gemini direct chat) ---
+# Bounded LRU with TTL in each process. Set PLAN_CACHE_REDIS_URL to share
+# cached plans between API processes (e.g. REDIS_BACKEND_URL); None = memory only.
+PLAN_CACHE_MAX_ENTRIES = 1024
+PLAN_CACHE_TTL_SECONDS = 3600
+PLAN_CACHE_REDIS_URL = None
+
+# --- Semantic Cache (paraphrase-tolerant answers) ---
+# Prompts are embedded with a hashed n-gram vectorizer; a stored answer is served
+# when cosine similarity >= threshold. One persisted .npz file per model.
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.9  # calibrated in tests/verify_semantic_cache.py
+SEMANTIC_CACHE_CAPACITY = 4096
+SEMANTIC_CACHE_DIM = 1024
+SEMANTIC_CACHE_PERSIST_EVERY = 16  # new answers between disk writes
+SEMANTIC_CACHE_DIR = DATA_DIR / "semantic_cache"
+
+# --- Conversation Memory ---
+# src/core/memory.py keeps the last MEMORY_MAX_MESSAGES messages; everything
+# older than the newest MEMORY_RECENT_MESSAGES is folded into a running summary
+# by a background thread once MEMORY_COMPACT_BATCH messages are waiting.
+# get_history(prompt=...) returns summary + the MEMORY_RELEVANT_MESSAGES older
+# messages most similar to the prompt + recent messages, within the budget. The
+# messages are embedded (MEMORY_INDEX_DIM-wide hashed n-grams) only once a caller
+# asks for relevant messages. The window is per session (up to
+# MEMORY_MAX_HOT_SESSIONS in memory), so keep it modest: older turns live on in the summary.
+MEMORY_MAX_MESSAGES = 500
+MEMORY_RECENT_MESSAGES = 6
+MEMORY_RELEVANT_MESSAGES = 4
+MEMORY_RELEVANCE_MIN_SCORE = 0.25  # cosine similarity
+MEMORY_INDEX_DIM = 256
+MEMORY_COMPACT_BATCH = 8
+MEMORY_CONTEXT_TOKEN_BUDGET = 1500
+MEMORY_SUMMARY_TOKEN_BUDGET = 400
+MEMORY_SUMMARY_LINE_WORDS = 30   # default extractive summarizer: words kept per turn
+# Every change is one line appended to src/data/memory.journal.jsonl; fsyncs are
+# batched per interval and the journal is compacted into the memory.json snapshot
+# in the background every MEMORY_JOURNAL_COMPACT_RECORDS records.
+MEMORY_JOURNAL_FSYNC_SECONDS = 0.2
+MEMORY_JOURNAL_COMPACT_RECORDS = 2000
+MEMORY_RESTORE_ON_STARTUP = False  # True = resume the conversation after a restart
+MEMORY_COMPACTION_WORKERS = 2      # background threads shared by all sessions
+# Per-user sessions (UserRequest.user_id): hot sessions stay in memory, LRU
+# beyond MEMORY_MAX_HOT_SESSIONS or idle ones are written to MEMORY_SESSIONS_DIR
+# and reloaded on the user's next request.
+MEMORY_SESSIONS_ENABLED = True
+MEMORY_SESSIONS_DIR = DATA_DIR / "sessions"
+MEMORY_MAX_HOT_SESSIONS = 512
+MEMORY_SESSION_IDLE_SECONDS = 900
+
+# --- Asset Registry ---
+# Generated images/models, shared by the API and Celery workers (SQLite, WAL mode),
+# indexed by asset ID, file name, prompt hash and user session.
+ASSET_REGISTRY_PATH = DATA_DIR / "assets.sqlite3"
+
+# --- Batch Interaction ---
+# Max prompts per /interact/batch call and how many are planned at once.
+BATCH_MAX_ITEMS = 64
+BATCH_PLANNING_CONCURRENCY = 8
+
+# --- Metrics ---
+# Stage timers, counters and gauges (src/core/metrics.py). Each process flushes
+# its deltas to Redis every METRICS_FLUSH_SECONDS; GET /metrics renders the
+# totals of all processes in Prometheus text format. None = per-process only.
+METRICS_ENABLED = True
+METRICS_REDIS_URL = REDIS_BACKEND_URL
+METRICS_FLUSH_SECONDS = 5.0
+# A process's gauges (in-flight counts) drop out this long after its last flush,
+# so a worker killed mid-task does not leave its +1 behind. Several flushes' worth.
+METRICS_GAUGE_STALE_SECONDS = 30
+# Histogram bucket upper bounds (seconds): sub-ms cache hits to multi-minute 3D jobs.
+METRICS_LATENCY_BUCKETS = [
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600,
+]
+
+# --- Tracing ---
+# One trace per /interact request, propagated to workers in a `traceparent`
+# Celery header. Spans are appended as OTLP/JSON lines to one file per process
+# in TRACE_DIR (inspect with `python -m src.core.tracing [trace_id]`).
+TRACING_ENABLED = True
+TRACE_DIR = DATA_DIR / "traces"
+TRACE_FLUSH_SECONDS = 2.0
+
+# --- Logging ---
+# All modules log through one background queue (src/core/logs.py); call sites
+# never block on stdout. LOG_LEVELS overrides the level per module prefix.
+LOG_LEVEL = "INFO"
+LOG_LEVELS = {
+    "src.api.hologram_websocket": "INFO",
+    "httpx": "WARNING",
+    "urllib3": "WARNING",
+}
+LOG_FORMAT = "text"          # "text" for consoles, "json" for log collectors
+LOG_QUEUE_SIZE = 10000       # records beyond this are dropped, never waited on
+# Records at or below this level are limited per call site (logger + message).
+# Keep it at DEBUG (INFO at most): repeated warnings are ongoing failures and must show.
+LOG_RATE_LIMIT_LEVEL = "DEBUG"
+LOG_RATE_LIMIT_PER_INTERVAL = 5
+LOG_RATE_LIMIT_INTERVAL = 10.0  # seconds
+
 # Tencent Cloud Credentials
 TENCENT_SECRET_ID = os.environ.get("TENCENT_SECRET_ID", "")
 TENCENT_SECRET_KEY = os.environ.get("TENCENT_SECRET_KEY", "")
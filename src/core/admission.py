@@ -0,0 +1,216 @@
+"""
+Admission Control for Heavy Workers
+
+Before dispatching, the API estimates how long a new job would wait:
+
+    wait ≈ (queued + running) / concurrency × average job duration
+
+Queue depth comes from the broker (Redis list length), running jobs and a
+moving average of job durations are recorded by the workers themselves
+(see src/workers/signals.py). If the estimate exceeds the worker's SLO, the
+request is rejected with HTTP 429 and a computed Retry-After.
+
+Running jobs are per-task markers (task → start time), not a bare counter,
+so a worker killed mid-task (SIGKILL, OOM) cannot inflate the count for
+good: markers older than ADMISSION_RUNNING_STALE_SECONDS are pruned on
+read, and a restarting worker drops the markers it left behind.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import redis
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "miles:job_stats"          # hash: <worker>:avg -> EWMA seconds
+RUNNING_PREFIX = "miles:job_running:"  # sorted set per worker: <host>|<task_id> -> start time
+
+TASK_TO_WORKER: Dict[str, str] = {task: worker for worker, task in config.WORKER_TASK_NAMES.items()}
+
+_stats_client: Optional[redis.Redis] = None
+
+
+def _stats_redis() -> redis.Redis:
+    global _stats_client
+    if _stats_client is None:
+        _stats_client = redis.Redis.from_url(config.REDIS_BACKEND_URL, decode_responses=True)
+    return _stats_client
+
+
+def _running_key(worker_name: str) -> str:
+    return f"{RUNNING_PREFIX}{worker_name}"
+
+
+def _running_member(hostname: Optional[str], task_id: str) -> str:
+    return f"{hostname or '-'}|{task_id}"
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────
+
+def record_job_started(worker_name: str, task_id: str, hostname: Optional[str] = None) -> None:
+    try:
+        _stats_redis().zadd(_running_key(worker_name), {_running_member(hostname, task_id): time.time()})
+    except redis.RedisError as exc:
+        logger.warning("Could not record job start: %s", exc)
+
+
+def record_job_finished(
+    worker_name: str, task_id: str, duration_seconds: Optional[float], hostname: Optional[str] = None
+) -> None:
+    """
+    Remove the job's running marker and fold the duration into the moving average.
+
+    The read-modify-write of the average is not atomic across workers; it is
+    an estimate, and an occasional lost update does not matter.
+    """
+
+    try:
+        client = _stats_redis()
+        client.zrem(_running_key(worker_name), _running_member(hostname, task_id))
+        if duration_seconds is None:
+            return
+        field = f"{worker_name}:avg"
+        previous = client.hget(STATS_KEY, field)
+        alpha = config.ADMISSION_EWMA_ALPHA
+        average = duration_seconds if previous is None else (
+            alpha * duration_seconds + (1 - alpha) * float(previous)
+        )
+        client.hset(STATS_KEY, field, round(average, 3))
+    except redis.RedisError as exc:
+        logger.warning("Could not record job finish: %s", exc)
+
+
+def forget_worker_jobs(hostname: str) -> int:
+    """
+    Drop the running markers a worker left behind (call when it starts: any
+    job it had in flight died with the previous process). Returns how many.
+    """
+
+    removed = 0
+    try:
+        client = _stats_redis()
+        for worker_name in config.WORKER_TASK_NAMES:
+            key = _running_key(worker_name)
+            stale = [member for member, _ in client.zscan_iter(key, match=f"{hostname}|*")]
+            if stale:
+                removed += client.zrem(key, *stale)
+    except redis.RedisError as exc:
+        logger.warning("Could not reset running jobs of %s: %s", hostname, exc)
+    if removed:
+        logger.info("Dropped %d running-job markers left by %s", removed, hostname)
+    return removed
+
+
+# ── API side ─────────────────────────────────────────────────────────────────
+
+class AdmissionRejected(Exception):
+    """Raised when a worker's estimated wait exceeds its SLO."""
+
+    def __init__(self, worker_name: str, estimated_wait: float, retry_after: int):
+        super().__init__(
+            f"{worker_name} is at capacity (estimated wait {estimated_wait:.0f}s). "
+            f"Retry in {retry_after}s."
+        )
+        self.worker_name = worker_name
+        self.estimated_wait = estimated_wait
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Queue-depth-aware admission check per worker type.
+
+    Broker/stat reads are cached for a short window so a burst of requests
+    costs one Redis round trip; jobs admitted during the window are added
+    to the cached depth locally.
+    """
+
+    def __init__(self, broker_url: str):
+        self.broker_url = broker_url
+        self._broker: Optional[redis.Redis] = None
+        self._snapshots: Dict[str, Tuple[float, int, int, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def broker(self) -> redis.Redis:
+        if self._broker is None:
+            self._broker = redis.Redis.from_url(self.broker_url, socket_timeout=0.5)
+        return self._broker
+
+    def check(self, worker_name: str, jobs: int = 1) -> Optional[float]:
+        """
+        Admit `jobs` new jobs for `worker_name`.
+
+        Returns the estimated completion time in seconds (None if the worker
+        has no SLO configured), or raises AdmissionRejected.
+        """
+
+        slo = config.ADMISSION_SLO_SECONDS.get(worker_name)
+        if slo is None:
+            return None
+
+        queued, running, average = self._snapshot(worker_name)
+        concurrency = max(1, config.WORKER_CONCURRENCY.get(worker_name, 1))
+        wait = (queued + running + jobs - 1) / concurrency * average
+
+        if wait > slo:
+            retry_after = max(1, math.ceil(wait - slo))
+            raise AdmissionRejected(worker_name, wait, retry_after)
+
+        with self._lock:
+            taken_at, cached_queued, cached_running, cached_avg = self._snapshots[worker_name]
+            self._snapshots[worker_name] = (taken_at, cached_queued + jobs, cached_running, cached_avg)
+        return round(wait + average, 1)
+
+    def _snapshot(self, worker_name: str) -> Tuple[int, int, float]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._snapshots.get(worker_name)
+            if cached is not None and now - cached[0] < config.ADMISSION_CACHE_SECONDS:
+                return cached[1], cached[2], cached[3]
+
+        default_avg = config.ADMISSION_DEFAULT_DURATION_SECONDS.get(worker_name, 30.0)
+        try:
+            queued = self._queue_depth(config.WORKER_QUEUES.get(worker_name, "io"))
+            running, average = self._running(worker_name, default_avg)
+        except redis.RedisError as exc:
+            # Fail open: without broker stats we cannot estimate, so admit.
+            logger.warning("Stats unavailable, admitting: %s", exc)
+            queued, running, average = 0, 0, default_avg
+
+        with self._lock:
+            self._snapshots[worker_name] = (now, queued, max(0, running), average)
+        return queued, max(0, running), average
+
+    def _running(self, worker_name: str, default_avg: float) -> Tuple[int, float]:
+        # Prune markers of jobs that cannot still be running, then count the rest.
+        stale_after = config.ADMISSION_RUNNING_STALE_SECONDS.get(worker_name, 3600)
+        key = _running_key(worker_name)
+        pipe = _stats_redis().pipeline(transaction=False)
+        pipe.zremrangebyscore(key, "-inf", time.time() - stale_after)
+        pipe.zcard(key)
+        pipe.hget(STATS_KEY, f"{worker_name}:avg")
+        _, running, average = pipe.execute()
+        return int(running), float(average or default_avg)
+
+    def _queue_depth(self, queue: str) -> int:
+        # With the priority lane, Redis keeps one list per priority step
+        # ("io", "io:3", "io:6", ...); priority 0 uses the bare queue name.
+        keys = [queue]
+        if config.PRIORITY_LANE_ENABLED:
+            keys += [f"{queue}:{step}" for step in config.CELERY_PRIORITY_STEPS if step]
+        pipe = self.broker.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+        return int(sum(pipe.execute()))
+
+
+admission_controller = AdmissionController(config.REDIS_BROKER_URL)
@@ -0,0 +1,174 @@
+"""
+Cross-process Asset Registry
+
+Generated files (concept images, GLB models) are created inside Celery worker
+processes but listed, saved and cleaned up from the API. Each process used to
+track them in its own `MemoryManager` list, so the API never saw them and
+`save_model_permanently` fell back to probing the filesystem.
+
+This registry is one SQLite database in WAL mode shared by every process on
+the host (readers never block the single writer), indexed by asset ID,
+basename, prompt hash and session, so every lookup is an O(log n) index probe.
+
+The session an asset belongs to travels with the request: the API sets
+`current_session` before dispatching, the Celery publish hook copies it into
+a `miles_session` message header, and the worker restores it before the task
+runs (see src/workers/signals.py).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+# Session key (see SessionStore.session_key) of the request being served.
+current_session: ContextVar[Optional[str]] = ContextVar("miles_asset_session", default=None)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id    TEXT PRIMARY KEY,
+    path        TEXT NOT NULL UNIQUE,
+    basename    TEXT NOT NULL,
+    kind        TEXT,
+    prompt_hash TEXT,
+    session     TEXT,
+    is_temp     INTEGER NOT NULL,
+    saved_path  TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_basename ON assets (basename, created_at);
+CREATE INDEX IF NOT EXISTS assets_prompt ON assets (prompt_hash, created_at);
+CREATE INDEX IF NOT EXISTS assets_session ON assets (session, created_at);
+"""
+
+
+def prompt_hash(prompt: str) -> str:
+    """Hash of the whitespace/case-normalized prompt."""
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+class AssetRegistry:
+    """
+    SQLite-backed index of generated files, safe to use from any process or thread.
+    """
+
+    def __init__(self, path: os.PathLike):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (Celery prefork children).
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def register(
+        self,
+        path: str,
+        is_temp: bool = True,
+        prompt: Optional[str] = None,
+        session: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> str:
+        """Record a generated file (re-registering a path refreshes it); returns its asset ID."""
+        path = os.path.abspath(path)
+        asset_id = uuid.uuid4().hex
+        conn = self._conn()
+        conn.execute(
+            """
+            INSERT INTO assets (asset_id, path, basename, kind, prompt_hash, session, is_temp, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                kind = COALESCE(excluded.kind, kind),
+                prompt_hash = COALESCE(excluded.prompt_hash, prompt_hash),
+                session = COALESCE(excluded.session, session),
+                is_temp = MIN(is_temp, excluded.is_temp),
+                created_at = excluded.created_at
+            """,
+            (
+                asset_id,
+                path,
+                os.path.basename(path),
+                kind,
+                prompt_hash(prompt) if prompt else None,
+                session,
+                int(is_temp),
+                time.time(),
+            ),
+        )
+        row = conn.execute("SELECT asset_id FROM assets WHERE path = ?", (path,)).fetchone()
+        return row["asset_id"]
+
+    def get(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def find(self, basename: str) -> Optional[Dict[str, Any]]:
+        """Newest asset with this file name."""
+        row = self._conn().execute(
+            "SELECT * FROM assets WHERE basename = ? ORDER BY created_at DESC LIMIT 1", (basename,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def by_prompt(self, prompt: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Assets generated for this prompt, newest first."""
+        rows = self._conn().execute(
+            "SELECT * FROM assets WHERE prompt_hash = ? ORDER BY created_at DESC LIMIT ?",
+            (prompt_hash(prompt), limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_session(self, session: Optional[str], temp_only: bool = False, limit: int = 100) -> List[Dict[str, Any]]:
+        """Assets of one session (None = assets created outside any session), newest first."""
+        query = "SELECT * FROM assets WHERE session IS ?"
+        if temp_only:
+            query += " AND is_temp = 1"
+        rows = self._conn().execute(query + " ORDER BY created_at DESC LIMIT ?", (session, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_saved(self, asset_id: str, saved_path: str) -> None:
+        """Record the permanent copy; saved assets are never removed by cleanup."""
+        self._conn().execute(
+            "UPDATE assets SET is_temp = 0, saved_path = ? WHERE asset_id = ?", (saved_path, asset_id)
+        )
+
+    def cleanup_session(self, session: Optional[str]) -> int:
+        """Delete the session's temporary files and forget them; returns how many were removed."""
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT asset_id, path FROM assets WHERE session IS ? AND is_temp = 1", (session,)
+        ).fetchall()
+        for row in rows:
+            if os.path.exists(row["path"]):
+                try:
+                    os.remove(row["path"])
+                    logger.debug("Cleaned up %s", row["path"])
+                except OSError as e:
+                    logger.warning("Error cleaning up %s: %s", row["path"], e)
+        conn.execute("BEGIN")
+        conn.executemany("DELETE FROM assets WHERE asset_id = ?", [(row["asset_id"],) for row in rows])
+        conn.execute("COMMIT")
+        return len(rows)
+
+
+# Singleton
+asset_registry = AssetRegistry(config.ASSET_REGISTRY_PATH)
@@ -0,0 +1,145 @@
+"""
+Plan Cache - Bounded LRU with TTL
+
+Direct-chat answers from the Gemini brain depend only on the prompt (no
+history is sent), so parsed `OrchestratorPlan`s can be reused. The cache is
+in-memory per process, with an optional Redis tier shared by all processes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+from .. import config
+from .coalescing import normalize_prompt
+from .schemas import OrchestratorPlan
+
+logger = logging.getLogger(__name__)
+
+
+class PlanCache:
+    """
+    Thread-safe LRU + TTL cache of orchestrator plans with hit/miss/eviction counters.
+    """
+
+    REDIS_PREFIX = "miles:plan_cache:"
+
+    def __init__(self, max_entries: int, ttl_seconds: float, redis_url: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_url = redis_url
+        self._entries: "OrderedDict[str, Tuple[float, OrchestratorPlan]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis: Optional[redis.Redis] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.redis_hits = 0
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str) -> str:
+        return f"{model_name}:{normalize_prompt(prompt)}"
+
+    def get(self, key: str) -> Optional[OrchestratorPlan]:
+        """Return a copy of the cached plan, or None on miss/expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, plan = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return plan.model_copy(deep=True)
+                del self._entries[key]
+                self.expirations += 1
+
+        plan = self._redis_get(key)
+        with self._lock:
+            if plan is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.redis_hits += 1
+            self._store_local(key, plan, now)
+        return plan.model_copy(deep=True)
+
+    def set(self, key: str, plan: OrchestratorPlan) -> None:
+        with self._lock:
+            self._store_local(key, plan.model_copy(deep=True), time.monotonic())
+        self._redis_set(key, plan)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "redis_hits": self.redis_hits,
+                "redis_enabled": bool(self.redis_url),
+            }
+
+    # ── Internals ────────────────────────────────────────────────────────────
+    def _store_local(self, key: str, plan: OrchestratorPlan, now: float) -> None:
+        # Caller holds the lock.
+        self._entries[key] = (now + self.ttl_seconds, plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _redis_key(self, key: str) -> str:
+        return self.REDIS_PREFIX + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _redis_client(self) -> Optional[redis.Redis]:
+        if not self.redis_url:
+            return None
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.2)
+        return self._redis
+
+    def _redis_get(self, key: str) -> Optional[OrchestratorPlan]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(self._redis_key(key))
+            return OrchestratorPlan.model_validate_json(raw) if raw else None
+        except Exception as exc:
+            logger.warning("Redis tier read failed: %s", exc)
+            return None
+
+    def _redis_set(self, key: str, plan: OrchestratorPlan) -> None:
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            client.set(self._redis_key(key), plan.model_dump_json(), px=int(self.ttl_seconds * 1000))
+        except Exception as exc:
+            logger.warning("Redis tier write failed: %s", exc)
+
+
+plan_cache = PlanCache(
+    max_entries=config.PLAN_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.PLAN_CACHE_TTL_SECONDS,
+    redis_url=config.PLAN_CACHE_REDIS_URL,
+)
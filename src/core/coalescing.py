@@ -0,0 +1,181 @@
+"""
+Request Coalescing (Single-Flight)
+
+When many users send the same prompt at once (e.g. a demo crowd tapping the
+same suggestion chip), only ONE plan is computed and only ONE worker task is
+dispatched. Later identical requests attach to the work already in flight.
+
+- `PlanSingleFlight`: in-process, shares one `adecompose_task` call per prompt.
+- `TaskCoalescer`: cross-process (Redis), shares one Celery task per
+  (worker, prompt) while that task is still running.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis
+
+from .. import config
+from .task_events import READY_STATES
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: claim key. ARGV: expected owner, new owner, TTL seconds.
+# Replaces the claim only if it still names the expected (finished) task.
+_TAKEOVER = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+return 1
+"""
+
+# KEYS[1]: claim key. ARGV[1]: owner. Deletes the claim only if we still own it.
+_RELEASE = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+return redis.call('DEL', KEYS[1])
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form used as a coalescing/cache key: lower-case, single-spaced, no trailing punctuation."""
+    return _WHITESPACE.sub(" ", prompt.strip().lower()).rstrip(".!?")
+
+
+class PlanSingleFlight:
+    """
+    Share one in-flight planning call between identical concurrent prompts.
+
+    The call runs as its own task, so a caller that is cancelled (a client
+    that disconnected) stops waiting without cancelling it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await the in-flight call for `key`, or start it via `factory`.
+
+        Returns (result, shared) where `shared` is True if this caller attached
+        to a call started by someone else.
+        """
+
+        existing = self._inflight.get(key)
+        if existing is not None:
+            return await asyncio.shield(existing), True
+
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a call nobody waited for does not log a warning.
+            task.exception()
+
+
+class TaskCoalescer:
+    """
+    Attach identical (worker, prompt) dispatches to the Celery task already running.
+
+    Uses `SET NX` on a Redis key holding the owning task ID, so the claim is
+    atomic across API processes. A claim whose task has already finished is
+    replaced by the next dispatch with a compare-and-set, so of two racing
+    dispatches only one takes it over. A claim whose publish failed is
+    released again.
+    """
+
+    CLAIM_ATTEMPTS = 3
+
+    KEY_PREFIX = "miles:inflight_task:"
+
+    def __init__(self, redis_url: str, ttl_seconds: int):
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self._client: Optional[redis.Redis] = None
+        self._takeover_script = None
+        self._release_script = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.redis_url, decode_responses=True)
+            self._takeover_script = self._client.register_script(_TAKEOVER)
+            self._release_script = self._client.register_script(_RELEASE)
+        return self._client
+
+    def inflight(self, worker_name: str, prompt: str, worker_function: Any) -> Optional[str]:
+        """
+        Return the ID of an identical task still running, without claiming anything.
+        """
+
+        try:
+            existing = self.client.get(self._key(worker_name, prompt))
+        except redis.RedisError:
+            return None
+        if existing and worker_function.AsyncResult(existing).state not in READY_STATES:
+            return existing
+        return None
+
+    def dispatch(self, worker_name: str, prompt: str, worker_function: Any) -> Tuple[str, bool]:
+        """
+        Dispatch `worker_function(prompt)` unless an identical task is in flight.
+
+        Returns (task_id, coalesced).
+        """
+
+        key = self._key(worker_name, prompt)
+        task_id = str(uuid.uuid4())
+
+        claimed = False
+        try:
+            for _ in range(self.CLAIM_ATTEMPTS):
+                if self.client.set(key, task_id, nx=True, ex=self.ttl_seconds):
+                    claimed = True
+                    break
+                existing = self.client.get(key)
+                if existing is None:
+                    continue  # expired in between; claim it with NX
+                if worker_function.AsyncResult(existing).state not in READY_STATES:
+                    return existing, True
+                # Stale claim (task finished) — take it over unless someone else just did.
+                if self._takeover_script(keys=[key], args=[existing, task_id, self.ttl_seconds]):
+                    claimed = True
+                    break
+        except redis.RedisError as exc:
+            # Coalescing is an optimization; never block dispatch on it.
+            logger.warning("Redis unavailable, dispatching without coalescing: %s", exc)
+
+        options: Dict[str, Any] = {}
+        if config.PRIORITY_LANE_ENABLED:
+            options["priority"] = config.TASK_PRIORITY_INTERACTIVE
+        try:
+            worker_function.apply_async(args=(prompt,), task_id=task_id, **options)
+        except BaseException:
+            if claimed:
+                self._release(key, task_id)
+            raise
+        return task_id, False
+
+    def _release(self, key: str, task_id: str) -> None:
+        # A claim pointing at a task that was never published would stay PENDING until its TTL.
+        try:
+            self._release_script(keys=[key], args=[task_id])
+        except redis.RedisError as exc:
+            logger.warning("Could not release coalescing claim %s: %s", key, exc)
+
+    def _key(self, worker_name: str, prompt: str) -> str:
+        return f"{self.KEY_PREFIX}{worker_name}:{normalize_prompt(prompt)}"
+
+
+plan_single_flight = PlanSingleFlight()
+task_coalescer = TaskCoalescer(config.REDIS_BACKEND_URL, config.COALESCE_TASK_TTL_SECONDS)
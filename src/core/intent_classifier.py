@@ -0,0 +1,361 @@
+"""
+Local Intent Classifier (hashed TF-IDF + linear model)
+
+Prompts the rule pre-flight does not catch used to go to the LLM even when
+all it did was pick a worker. This small offline-trained model predicts
+`3D_Generator`, `RAG_Search` or `direct` with a confidence; a confident
+worker prediction is dispatched without any LLM call, and everything else
+is escalated to the brain as before.
+
+- Features: word unigrams, word bigrams and character trigrams, hashed with
+  crc32 into a fixed number of buckets; sublinear TF × IDF, L2-normalised.
+- Model: multinomial logistic regression on sparse rows, trained with Adam
+  and class-balanced weights, all in NumPy.
+- Data: the routing log of decisions the brain made (ROUTING_LOG_PATH) and a
+  small built-in seed set so every label is represented. Prompts the rule
+  router can label are already routed by the pre-flight, so rule-labelled
+  history would only teach the model what the rules know.
+- The threshold is checked against held-out prompts, including ambiguous
+  ones that must go to the brain (tests/verify_intent_classifier.py).
+
+    python -m src.core.intent_classifier train [files...]
+    python -m src.core.intent_classifier predict "make me a lamp mesh"
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+LABELS: Tuple[str, ...] = ("3D_Generator", "RAG_Search", "direct")
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("generate a 3d model of a helmet", "3D_Generator"),
+    ("make a chair model", "3D_Generator"),
+    ("i need a mesh of a dragon", "3D_Generator"),
+    ("can you build me a low poly tree", "3D_Generator"),
+    ("turn this into a 3d object: a red sports car", "3D_Generator"),
+    ("show me a hologram of the eiffel tower", "3D_Generator"),
+    ("sculpt a small robot figure", "3D_Generator"),
+    ("design a vintage camera in 3d", "3D_Generator"),
+    ("render a coffee mug", "3D_Generator"),
+    ("create a glb of a spaceship", "3D_Generator"),
+    ("search for the latest gpu prices", "RAG_Search"),
+    ("look up reviews of the oneplus 11r", "RAG_Search"),
+    ("what happened in the news today", "RAG_Search"),
+    ("find recent papers on diffusion models", "RAG_Search"),
+    ("what are the current bitcoin prices", "RAG_Search"),
+    ("research the best budget laptops this year", "RAG_Search"),
+    ("latest updates on the mars mission", "RAG_Search"),
+    ("who won the match yesterday", "RAG_Search"),
+    ("get me sources about solid state batteries", "RAG_Search"),
+    ("browse the web for python 3.13 release notes", "RAG_Search"),
+    ("what is the capital of india", "direct"),
+    ("explain how photosynthesis works", "direct"),
+    ("tell me a joke", "direct"),
+    ("how are you today", "direct"),
+    ("write a haiku about rain", "direct"),
+    ("what does a transformer attention layer do", "direct"),
+    ("thanks that was helpful", "direct"),
+    ("translate good morning to french", "direct"),
+    ("why is the sky blue", "direct"),
+    ("summarize the plot of hamlet", "direct"),
+]
+
+
+class HashedTfidfVectorizer:
+    """
+    Text → sparse (bucket indices, weights). IDF is learned by `fit`; until
+    then every bucket weighs 1. crc32 keeps buckets stable across processes.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        words = _TOKEN.findall(text.lower())
+        feats = [f"w:{w}" for w in words]
+        feats.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+        for w in words:
+            padded = f"<{w}>"
+            feats.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return feats
+
+    def _counts(self, text: str) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        for feat in self.features(text):
+            bucket = zlib.crc32(feat.encode("utf-8")) % self.dim
+            counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+
+    def fit(self, texts: Sequence[str]) -> None:
+        df = np.zeros(self.dim, dtype=np.float64)
+        for text in texts:
+            df[list(self._counts(text))] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+    def transform(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        counts = self._counts(text)
+        indices = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        values = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[indices]
+        norm = float(np.linalg.norm(values))
+        if norm > 0:
+            values /= norm
+        return indices, values
+
+
+class IntentClassifier:
+    """
+    Softmax regression over hashed TF-IDF rows.
+    """
+
+    def __init__(self, dim: int, labels: Sequence[str] = LABELS):
+        self.labels = tuple(labels)
+        self.vectorizer = HashedTfidfVectorizer(dim)
+        self.weights = np.zeros((dim, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = self.vectorizer.transform(text)
+        logits = values @ self.weights[indices] + self.bias
+        return _softmax(logits[None, :])[0]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(label, confidence) for one prompt."""
+        proba = self.predict_proba(text)
+        best = int(np.argmax(proba))
+        return self.labels[best], float(proba[best])
+
+    def fit(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        epochs: int = 300,
+        learning_rate: float = 0.05,
+        l2: float = 1e-4,
+    ) -> "IntentClassifier":
+        self.vectorizer.fit(texts)
+        rows = [self.vectorizer.transform(text) for text in texts]
+        lengths = np.array([len(indices) for indices, _ in rows])
+        keep = lengths > 0
+        rows = [row for row, k in zip(rows, keep) if k]
+        y = np.array([self.labels.index(label) for label in labels])[keep]
+        n, k = len(rows), len(self.labels)
+        if n == 0:
+            raise ValueError("No usable training examples")
+
+        indices = np.concatenate([r[0] for r in rows])
+        values = np.concatenate([r[1] for r in rows])
+        row_of = np.repeat(np.arange(n), lengths[keep])
+        starts = np.concatenate(([0], np.cumsum(lengths[keep])[:-1]))
+        targets = np.eye(k, dtype=np.float32)[y]
+        # Balanced class weights: a mostly-"direct" log must not drown the worker labels.
+        class_counts = np.bincount(y, minlength=k).astype(np.float32)
+        sample_weight = (n / (k * np.maximum(class_counts, 1)))[y][:, None] / n
+
+        weights = np.zeros_like(self.weights)
+        bias = np.zeros_like(self.bias)
+        params = [weights, bias]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            logits = np.add.reduceat(values[:, None] * weights[indices], starts, axis=0) + bias
+            grad_logits = (_softmax(logits) - targets) * sample_weight
+            spread = values[:, None] * grad_logits[row_of]
+            grad_w = np.stack(
+                [np.bincount(indices, weights=spread[:, c], minlength=len(weights)) for c in range(k)], axis=1
+            ).astype(np.float32)
+            grads = [grad_w + l2 * weights, grad_logits.sum(axis=0)]
+            for param, grad, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        self.weights, self.bias = weights, bias
+        return self
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            weights=self.weights,
+            bias=self.bias,
+            idf=self.vectorizer.idf,
+            labels=np.array(self.labels, dtype=np.str_),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            model = cls(data["weights"].shape[0], [str(label) for label in data["labels"]])
+            model.weights = data["weights"]
+            model.bias = data["bias"]
+            model.vectorizer.idf = data["idf"]
+        return model
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+# ── Training data ────────────────────────────────────────────────────────────
+
+def load_examples(paths: Iterable[Path]) -> List[Tuple[str, str]]:
+    """
+    (prompt, label) pairs from routing-log JSONL files (labels as logged).
+    """
+
+    examples: List[Tuple[str, str]] = []
+    for path in paths:
+        if not path.exists():
+            continue
+        if path.suffix != ".jsonl":
+            logger.warning("Skipping %s: not a routing log (.jsonl)", path)
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line
+                    if record.get("label") in LABELS and record.get("prompt"):
+                        examples.append((record["prompt"], record["label"]))
+        except OSError as exc:
+            logger.warning("Skipping %s: %s", path, exc)
+    return examples
+
+
+class RoutingLog:
+    """
+    Append-only JSONL of routing decisions the brain made, used as training
+    labels. Writes happen on a background thread; the request path only enqueues.
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._queue: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def record(self, prompt: str, workers: Sequence[str]) -> None:
+        if self.path is None or not prompt.strip():
+            return
+        label = workers[0] if workers else "direct"
+        if label not in LABELS:
+            return
+        self._queue.put(json.dumps({"prompt": prompt, "label": label}, ensure_ascii=False))
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="routing-log", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            lines = [self._queue.get()]
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as exc:
+                logger.warning("Could not write %d routing records: %s", len(lines), exc)
+
+
+routing_log = RoutingLog(config.ROUTING_LOG_PATH)
+
+
+# ── Runtime access ───────────────────────────────────────────────────────────
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """
+    The trained classifier, loaded once per process; None if disabled in
+    config or not trained yet (routing then behaves exactly as before).
+    """
+
+    global _classifier, _classifier_loaded
+    if not config.INTENT_CLASSIFIER_ENABLED:
+        return None
+    if not _classifier_loaded:
+        with _classifier_lock:
+            if not _classifier_loaded:
+                path = config.INTENT_CLASSIFIER_PATH
+                if path.exists():
+                    try:
+                        _classifier = IntentClassifier.load(path)
+                        logger.info("Loaded intent classifier from %s", path)
+                    except Exception as exc:
+                        logger.error("Failed to load %s: %s", path, exc)
+                _classifier_loaded = True
+    return _classifier
+
+
+def train(paths: Sequence[Path]) -> IntentClassifier:
+    examples = SEED_EXAMPLES + load_examples(paths)
+    texts = [prompt for prompt, _ in examples]
+    labels = [label for _, label in examples]
+
+    # Hold out every fifth example to report accuracy, then refit on everything.
+    if len(examples) >= 20:
+        held = set(range(0, len(examples), 5))
+        model = IntentClassifier(config.INTENT_CLASSIFIER_DIM).fit(
+            [t for i, t in enumerate(texts) if i not in held],
+            [l for i, l in enumerate(labels) if i not in held],
+        )
+        predictions = [model.predict(texts[i]) for i in sorted(held)]
+        correct = sum(label == labels[i] for (label, _), i in zip(predictions, sorted(held)))
+        local = sum(conf >= config.INTENT_CLASSIFIER_THRESHOLD and label != "direct" for label, conf in predictions)
+        print(f"Held-out accuracy: {correct}/{len(held)}  routed locally: {local}/{len(held)}")
+
+    model = IntentClassifier(config.INTENT_CLASSIFIER_DIM).fit(texts, labels)
+    counts = {label: labels.count(label) for label in LABELS}
+    print(f"Trained on {len(examples)} examples {counts}")
+    return model
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "train":
+        sources = [Path(p) for p in sys.argv[2:]] or [config.ROUTING_LOG_PATH]
+        trained = train(sources)
+        trained.save(config.INTENT_CLASSIFIER_PATH)
+        print(f"Saved {config.INTENT_CLASSIFIER_PATH}")
+    elif command == "predict" and len(sys.argv) > 2:
+        label, confidence = IntentClassifier.load(config.INTENT_CLASSIFIER_PATH).predict(" ".join(sys.argv[2:]))
+        print(f"{label}  {confidence:.3f}")
+    else:
+        print(__doc__)
@@ -0,0 +1,127 @@
+"""
+Compiled Intent Router
+
+One keyword/phrase matcher shared by every brain and the tier-0 fast path.
+Rules come from `config.INTENT_RULES` (intent -> phrases) and are compiled
+once into a word-level Aho-Corasick automaton, so a prompt is scanned in a
+single pass over its tokens and the cost does not grow with the number of
+intents or phrases. Overlapping matches ("do research" and "research") are
+all reported.
+
+Phrase syntax:
+    "look up"      words matched on word boundaries, case-insensitive
+    "analy*"       trailing * on a single word: any word with that prefix
+
+Benchmark: python tests/benchmark_intent_router.py
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Mapping, Sequence, Set, Tuple
+
+from .. import config
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class IntentRouter:
+    """
+    Multi-pattern matcher over word tokens.
+
+    `route()` returns {intent: token index of its first match}; the helpers
+    answer the yes/no questions the brains ask.
+    """
+
+    def __init__(self, rules: Mapping[str, Sequence[str]]):
+        self.intents: Tuple[str, ...] = tuple(rules)
+        # Automaton over whole words; state 0 is the root.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, int], ...]] = [()]
+        # Single-word prefix rules: prefix -> intents, probed per token by length.
+        self._prefixes: Dict[str, Tuple[str, ...]] = {}
+        self._prefix_lengths: Tuple[int, ...] = ()
+
+        outputs: List[Set[Tuple[str, int]]] = [set()]
+        prefixes: Dict[str, Set[str]] = {}
+        for intent, phrases in rules.items():
+            for phrase in phrases:
+                words = tokenize(phrase)
+                if phrase.rstrip().endswith("*"):
+                    if len(words) != 1:
+                        raise ValueError(f"Intent {intent!r}: prefix rules must be one word, got {phrase!r}")
+                    prefixes.setdefault(words[0], set()).add(intent)
+                    continue
+                if not words:
+                    raise ValueError(f"Intent {intent!r}: empty phrase")
+                state = 0
+                for word in words:
+                    nxt = self._goto[state].get(word)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][word] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append(set())
+                    state = nxt
+                outputs[state].add((intent, len(words)))
+
+        # Breadth-first failure links; each state inherits its fallback's outputs.
+        frontier = list(self._goto[0].values())
+        while frontier:
+            next_frontier = []
+            for state in frontier:
+                for word, child in self._goto[state].items():
+                    fallback = self._fail[state]
+                    while fallback and word not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    target = self._goto[fallback].get(word, 0)
+                    self._fail[child] = target
+                    outputs[child] |= outputs[self._fail[child]]
+                    next_frontier.append(child)
+            frontier = next_frontier
+
+        self._out = [tuple(sorted(out)) for out in outputs]
+        self._prefixes = {prefix: tuple(sorted(intents)) for prefix, intents in prefixes.items()}
+        self._prefix_lengths = tuple(sorted({len(prefix) for prefix in prefixes}))
+
+    def route(self, text: str) -> Dict[str, int]:
+        """Every intent that matches `text`, with the token index where it first starts."""
+        found: Dict[str, int] = {}
+        goto, fail, out = self._goto, self._fail, self._out
+        prefixes, lengths = self._prefixes, self._prefix_lengths
+        state = 0
+        for index, token in enumerate(tokenize(text)):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if state:
+                for intent, size in out[state]:
+                    if intent not in found:
+                        found[intent] = index - size + 1
+            for length in lengths:
+                if length > len(token):
+                    break
+                for intent in prefixes.get(token[:length], ()):
+                    if intent not in found:
+                        found[intent] = index
+        return found
+
+    # ── Questions the brains ask ─────────────────────────────────────────────
+    def is_3d_request(self, text: str) -> bool:
+        found = self.route(text)
+        return "3d_verb" in found and "3d_noun" in found
+
+    def is_rag_request(self, text: str) -> bool:
+        return "web_search" in self.route(text)
+
+    def needs_deep_research(self, text: str) -> bool:
+        return "deep_research" in self.route(text)
+
+
+intent_router = IntentRouter(config.INTENT_RULES)
@@ -0,0 +1,230 @@
+"""
+Append-only Journal with Snapshots
+
+Durable state for `MemoryManager` without rewriting a whole file per change:
+
+- every mutation is one JSON line appended to the journal and flushed to the
+  OS (survives a process crash); a background thread fsyncs the file at most
+  every MEMORY_JOURNAL_FSYNC_SECONDS (group commit), so a power loss can cost
+  at most that window,
+- every MEMORY_JOURNAL_COMPACT_RECORDS records the owner writes a snapshot
+  (tmp file + fsync + atomic rename) and the journal segment it covers is
+  deleted,
+- recovery loads the snapshot and replays the newer records. Records carry a
+  sequence number, so a crash at any point of compaction replays nothing
+  twice, and a torn last line (crash mid-append) is skipped.
+
+Segment rotation: compaction renames the live journal to `<path>.old` and
+starts a new one; the snapshot covers everything up to the rotation point, so
+`.old` is removed once the snapshot is in place. Owners hold
+`checkpoint_lock` across rotate → write_snapshot, so two compactions of the
+same journal never interleave, and a snapshot older than the one on disk is
+refused.
+
+One fsync thread serves every open journal (there is one per user session).
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_open_journals: "weakref.WeakSet[Journal]" = weakref.WeakSet()
+_fsync_thread: Optional[threading.Thread] = None
+_fsync_lock = threading.Lock()
+
+
+class Journal:
+    """
+    JSONL write-ahead log plus one JSON snapshot file.
+    """
+
+    def __init__(self, path: os.PathLike, snapshot_path: os.PathLike, fsync_seconds: float = 0.2):
+        self.path = Path(path)
+        self.old_path = self.path.with_name(self.path.name + ".old")
+        self.snapshot_path = Path(snapshot_path)
+        self.fsync_seconds = fsync_seconds
+        self.seq = 0
+        self.snapshot_seq = 0  # sequence number covered by the snapshot on disk
+        self.pending = 0  # records appended since the last rotation
+        self._file = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        # Held by the owner from rotate() until write_snapshot() returns.
+        self.checkpoint_lock = threading.Lock()
+
+    # ── Recovery ────────────────────────────────────────────────────────────
+    def recover(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Return (snapshot or None, records newer than the snapshot) and open
+        the journal for appending after the last intact record.
+        """
+
+        snapshot = None
+        if self.snapshot_path.exists():
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except Exception as exc:
+                logger.error("Unreadable snapshot %s: %s", self.snapshot_path, exc)
+        snapshot_seq = int((snapshot or {}).get("seq", 0))
+        self.snapshot_seq = snapshot_seq
+
+        records: List[Dict[str, Any]] = []
+        self.seq = snapshot_seq
+        for segment in (self.old_path, self.path):
+            for record in self._read(segment):
+                if record["seq"] > snapshot_seq:
+                    records.append(record)
+                self.seq = max(self.seq, record["seq"])
+        self.pending = len(records)
+        self._open()
+        return snapshot, records
+
+    def _read(self, segment: Path) -> List[Dict[str, Any]]:
+        if not segment.exists():
+            return []
+        records = []
+        intact = 0  # bytes up to the end of the last complete record
+        with open(segment, "rb") as f:
+            for lineno, line in enumerate(f, 1):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("no newline")
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping torn journal record %s:%d", segment.name, lineno)
+                    break
+                intact += len(line)
+        if intact < segment.stat().st_size:
+            # Drop the torn tail so new appends start on a clean line.
+            with open(segment, "rb+") as f:
+                f.truncate(intact)
+        return records
+
+    # ── Writing ─────────────────────────────────────────────────────────────
+    def append(self, record: Dict[str, Any]) -> int:
+        """Append one record (a single small write); returns its sequence number."""
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self.seq += 1
+            record["seq"] = self.seq
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.pending += 1
+            self._dirty = True
+            return self.seq
+
+    def rotate(self) -> int:
+        """
+        Start a new segment; returns the last sequence number in the retired
+        one (the snapshot to write next must cover exactly that). Call from
+        one compaction at a time, with the owner's state frozen.
+        """
+
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+            if self.old_path.exists() and self.path.exists():
+                # A crash left the previous compaction unfinished: retire both segments together.
+                with open(self.old_path, "ab") as old, open(self.path, "rb") as live:
+                    old.write(live.read())
+                    old.flush()
+                    os.fsync(old.fileno())
+                self.path.unlink()
+            elif self.path.exists():
+                os.replace(self.path, self.old_path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self.pending = 0
+            return self.seq
+
+    def write_snapshot(self, state: Dict[str, Any], seq: int) -> None:
+        """Atomically replace the snapshot, then drop the segment it covers."""
+        if seq < self.snapshot_seq:
+            # Replacing a newer snapshot would lose the records only it covers.
+            logger.warning("Refusing snapshot at seq %d older than %d (%s)", seq, self.snapshot_seq,
+                           self.snapshot_path)
+            return
+        data = dict(state, seq=seq)
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self._fsync_dir()
+        self.snapshot_seq = seq
+        if self.old_path.exists():
+            self.old_path.unlink()
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync_locked()
+
+    def close(self) -> None:
+        """Flush, fsync and close; a later append reopens the file."""
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        _open_journals.discard(self)
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        _open_journals.add(self)
+        _start_fsync_thread()
+
+    def _sync_locked(self) -> None:
+        if self._file is not None and self._dirty:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def _fsync_dir(self) -> None:
+        # Make the rename itself durable (not supported on Windows).
+        if os.name == "nt":
+            return
+        fd = os.open(self.snapshot_path.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _start_fsync_thread() -> None:
+    global _fsync_thread
+    with _fsync_lock:
+        if _fsync_thread is None:
+            _fsync_thread = threading.Thread(target=_fsync_loop, name="journal-fsync", daemon=True)
+            _fsync_thread.start()
+
+
+def _fsync_loop() -> None:
+    while True:
+        journals = list(_open_journals)
+        time.sleep(min((j.fsync_seconds for j in journals), default=0.2))
+        for journal in journals:
+            try:
+                journal.sync()
+            except Exception as exc:
+                logger.error("Journal fsync failed (%s): %s", journal.path, exc)
+
+
+@atexit.register
+def close_all() -> None:
+    for journal in list(_open_journals):
+        journal.close()
@@ -0,0 +1,362 @@
+"""
+Shared Gemini API Key Pool
+
+One pool of API keys for every process that talks to Gemini (the API's
+orchestrator and the RAG worker). State lives in Redis, one hash per key,
+so a key that hit a 429 in a worker is skipped by the API too:
+
+- a token bucket per key (GEMINI_KEY_REQUESTS_PER_MINUTE, GEMINI_KEY_BURST)
+- a cooldown timestamp set when Gemini answers 429 (its retry delay if given)
+- an in-flight count, so selection picks the least-loaded healthy key
+
+Selection runs as one Lua script (atomic, one round trip, Redis server
+clock). A rate-limited call moves straight on to the next healthy key; when
+none is left the pool raises KeyPoolExhausted with the wait until one is,
+instead of sleeping. Without Redis the pool falls back to the same logic
+in-process.
+
+Keys are never written to Redis; they are identified by a short hash.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+import redis
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# KEYS: one hash per API key. ARGV: tokens/second, burst, seconds after which
+# an untouched in-flight count is presumed leaked (crashed caller).
+# Returns {index (1-based), ""} or {0, seconds until some key is usable}.
+_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate, burst, stale = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local best, best_score, best_tokens, best_inflight, soonest = 0, 0, 0, 0, nil
+for i, key in ipairs(KEYS) do
+    local s = redis.call('HMGET', key, 'tokens', 'ts', 'cooldown_until', 'inflight')
+    local ts = tonumber(s[2]) or now
+    local tokens = math.min(burst, (tonumber(s[1]) or burst) + (now - ts) * rate)
+    local cooldown = tonumber(s[3]) or 0
+    local inflight = math.max(0, tonumber(s[4]) or 0)
+    if now - ts > stale then inflight = 0 end
+    local ready = nil
+    if cooldown > now then
+        ready = cooldown
+    elseif tokens < 1 then
+        ready = now + (1 - tokens) / rate
+    elseif best == 0 or tokens - inflight > best_score then
+        best, best_score, best_tokens, best_inflight = i, tokens - inflight, tokens, inflight
+    end
+    if ready and (soonest == nil or ready < soonest) then soonest = ready end
+end
+if best == 0 then
+    return {0, tostring(soonest - now)}
+end
+redis.call('HSET', KEYS[best], 'tokens', tostring(best_tokens - 1), 'ts', tostring(now), 'inflight', best_inflight + 1)
+redis.call('HINCRBY', KEYS[best], 'requests', 1)
+return {best, ''}
+"""
+
+# KEYS[1]: key hash. ARGV[1]: cooldown seconds (from the server clock).
+_COOLDOWN = """
+local t = redis.call('TIME')
+local until_ = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'cooldown_until') or '0')
+if until_ > current then redis.call('HSET', KEYS[1], 'cooldown_until', tostring(until_)) end
+redis.call('HINCRBY', KEYS[1], 'rate_limited', 1)
+return 1
+"""
+
+_RETRY_DELAY = re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+
+class KeyPoolExhausted(Exception):
+    """Every key is cooling down or out of budget."""
+
+    def __init__(self, pool: str, retry_after: float):
+        super().__init__(pool, retry_after)  # args round-trip through pickle (Celery results)
+        self.pool = pool
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        return f"All {self.pool} API keys are rate limited. Retry in {self.retry_after:.0f}s."
+
+
+class KeyLease:
+    __slots__ = ("key", "key_id")
+
+    def __init__(self, key: str, key_id: str):
+        self.key = key
+        self.key_id = key_id
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return any(x in str(exc) for x in ["429", "ResourceExhausted", "QuotaExceeded"])
+
+
+class KeyPool:
+    """
+    Cross-process API key selection with per-key budgets and cooldowns.
+
+        result = gemini_key_pool.call(lambda key: gemini_model(key, name).generate_content(p))
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: Sequence[str],
+        redis_url: Optional[str],
+        requests_per_minute: float,
+        burst: int,
+        cooldown_seconds: float,
+    ):
+        self.name = name
+        self.keys: List[str] = list(dict.fromkeys(keys))
+        self.key_ids = [hashlib.sha256(k.encode("utf-8")).hexdigest()[:12] for k in self.keys]
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.cooldown_seconds = cooldown_seconds
+        self.redis_url = redis_url
+        self._client: Optional[redis.Redis] = None
+        self._acquire_script = None
+        self._cooldown_script = None
+        # In-process fallback state: key_id -> [tokens, ts, cooldown_until, inflight]
+        self._local: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _hash(self, key_id: str) -> str:
+        return f"miles:keypool:{self.name}:{key_id}"
+
+    @property
+    def client(self) -> Optional[redis.Redis]:
+        if self._client is None and self.redis_url:
+            self._client = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, decode_responses=True)
+            self._acquire_script = self._client.register_script(_ACQUIRE)
+            self._cooldown_script = self._client.register_script(_COOLDOWN)
+        return self._client
+
+    # ── Leases ───────────────────────────────────────────────────────────────
+    def acquire(self) -> KeyLease:
+        """Take one request's budget from the least-loaded healthy key."""
+        if not self.keys:
+            raise KeyPoolExhausted(self.name, self.cooldown_seconds)
+        index: Optional[int] = None
+        wait = 0.0
+        if self.client is not None:
+            try:
+                found, retry = self._acquire_script(
+                    keys=[self._hash(k) for k in self.key_ids],
+                    args=[self.rate, self.burst, config.GEMINI_KEY_STALE_SECONDS],
+                )
+                index, wait = int(found) - 1, float(retry or 0)
+            except redis.RedisError as exc:
+                logger.warning("Key pool state unavailable, using local budgets: %s", exc)
+        if index is None:
+            index, wait = self._local_acquire()
+        if index < 0:
+            raise KeyPoolExhausted(self.name, max(wait, 0.0))
+        return KeyLease(self.keys[index], self.key_ids[index])
+
+    def release(self, lease: KeyLease) -> None:
+        with self._lock:
+            state = self._local.get(lease.key_id)
+            if state is not None and state[3] > 0:
+                state[3] -= 1
+        if self.client is not None:
+            try:
+                self.client.hincrby(self._hash(lease.key_id), "inflight", -1)
+            except redis.RedisError:
+                pass
+
+    def cooldown(self, lease: KeyLease, seconds: Optional[float] = None) -> None:
+        """Park a key after a 429 so no process picks it until the cooldown ends."""
+        seconds = seconds or self.cooldown_seconds
+        logger.warning("%s key %s rate limited; cooling down %.0fs", self.name, lease.key_id, seconds)
+        with self._lock:
+            state = self._local_state(lease.key_id, time.time())
+            state[2] = max(state[2], time.time() + seconds)
+        if self.client is not None:
+            try:
+                self._cooldown_script(keys=[self._hash(lease.key_id)], args=[seconds])
+            except redis.RedisError:
+                pass
+
+    @contextmanager
+    def lease(self) -> Iterator[KeyLease]:
+        lease = self.acquire()
+        try:
+            yield lease
+        except Exception as exc:
+            if is_rate_limited(exc):
+                self.cooldown(lease, retry_delay(exc))
+            raise
+        finally:
+            self.release(lease)
+
+    @asynccontextmanager
+    async def alease(self) -> AsyncIterator[KeyLease]:
+        """Async twin of `lease`; the Redis round trips run in a thread, off the event loop."""
+        lease = await asyncio.to_thread(self.acquire)
+        try:
+            yield lease
+        except Exception as exc:
+            if is_rate_limited(exc):
+                await asyncio.to_thread(self.cooldown, lease, retry_delay(exc))
+            raise
+        finally:
+            await asyncio.to_thread(self.release, lease)
+
+    # ── Calls with failover ──────────────────────────────────────────────────
+    def call(self, fn: Callable[[str], T]) -> T:
+        """
+        Run `fn(api_key)`; on a 429 cool that key down and retry at once on
+        the next healthy one. Other errors propagate.
+        """
+
+        for _ in range(len(self.keys)):
+            try:
+                with self.lease() as lease:
+                    return fn(lease.key)
+            except Exception as exc:
+                if not is_rate_limited(exc):
+                    raise
+        raise KeyPoolExhausted(self.name, self.cooldown_seconds)
+
+    async def acall(self, fn: Callable[[str], Awaitable[T]]) -> T:
+        """Async twin of `call`."""
+        for _ in range(len(self.keys)):
+            try:
+                async with self.alease() as lease:
+                    return await fn(lease.key)
+            except Exception as exc:
+                if not is_rate_limited(exc):
+                    raise
+        raise KeyPoolExhausted(self.name, self.cooldown_seconds)
+
+    # ── Introspection ────────────────────────────────────────────────────────
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        out = []
+        for key_id in self.key_ids:
+            entry: Dict[str, Any] = {"key_id": key_id}
+            try:
+                if self.client is None:
+                    raise redis.RedisError("no redis")
+                state = self.client.hgetall(self._hash(key_id))
+                entry.update({
+                    "requests": int(state.get("requests", 0)),
+                    "rate_limited": int(state.get("rate_limited", 0)),
+                    "inflight": max(0, int(state.get("inflight", 0))),
+                    "cooldown_remaining": round(max(0.0, float(state.get("cooldown_until", 0)) - now), 1),
+                })
+            except redis.RedisError:
+                with self._lock:
+                    local = self._local.get(key_id, [self.burst, now, 0.0, 0])
+                entry.update({
+                    "inflight": int(local[3]),
+                    "cooldown_remaining": round(max(0.0, local[2] - now), 1),
+                })
+            out.append(entry)
+        return out
+
+    # ── In-process fallback (mirrors _ACQUIRE) ───────────────────────────────
+    def _local_state(self, key_id: str, now: float) -> List[float]:
+        return self._local.setdefault(key_id, [float(self.burst), now, 0.0, 0])
+
+    def _local_acquire(self) -> Tuple[int, float]:
+        now = time.time()
+        best, best_score, soonest = -1, 0.0, None
+        with self._lock:
+            for i, key_id in enumerate(self.key_ids):
+                state = self._local_state(key_id, now)
+                state[0] = min(self.burst, state[0] + (now - state[1]) * self.rate)
+                state[1] = now
+                if state[2] > now:
+                    ready = state[2]
+                elif state[0] < 1:
+                    ready = now + (1 - state[0]) / self.rate
+                else:
+                    score = state[0] - state[3]
+                    if best < 0 or score > best_score:
+                        best, best_score = i, score
+                    continue
+                soonest = ready if soonest is None else min(soonest, ready)
+            if best < 0:
+                return -1, (soonest or now) - now
+            state = self._local[self.key_ids[best]]
+            state[0] -= 1
+            state[3] += 1
+        return best, 0.0
+
+
+def retry_delay(exc: BaseException) -> Optional[float]:
+    """The retry delay Gemini suggests in a 429 error, if it gave one."""
+    match = _RETRY_DELAY.search(str(exc))
+    return float(match.group(1)) if match else None
+
+
+def configured_gemini_keys(extra: Sequence[str] = ()) -> List[str]:
+    keys = list(extra) + list(config.GEMINI_API_KEYS) + [config.GEMINI_API_KEY]
+    keys = [k.strip() for k in dict.fromkeys(keys) if k and k.strip() and "YOUR_GEMINI" not in k]
+    # No real key: keep the placeholder so callers fail with a clear auth error.
+    return keys or ["YOUR_GEMINI_API_KEY_GOES_HERE"]
+
+
+class _KeyedGenerativeModel(genai.GenerativeModel):
+    """
+    GenerativeModel bound to one API key through its own clients instead of
+    the process-global `genai.configure`, so concurrent requests on different
+    keys never race. The async client is created on first use, inside the
+    event loop that will drive it.
+    """
+
+    def __init__(self, api_key: str, model_name: str, system_instruction: Optional[str]):
+        self._client_options = {"api_key": api_key}
+        self._keyed_async_client = None
+        super().__init__(model_name, system_instruction=system_instruction)
+        self._client = glm.GenerativeServiceClient(client_options=self._client_options)
+
+    @property
+    def _async_client(self):
+        if self._keyed_async_client is None:
+            self._keyed_async_client = glm.GenerativeServiceAsyncClient(client_options=self._client_options)
+        return self._keyed_async_client
+
+    @_async_client.setter
+    def _async_client(self, value) -> None:
+        self._keyed_async_client = value
+
+
+@lru_cache(maxsize=64)
+def gemini_model(api_key: str, model_name: str, system_instruction: Optional[str] = None) -> genai.GenerativeModel:
+    """The (cached) model for one key."""
+    return _KeyedGenerativeModel(api_key, model_name, system_instruction)
+
+
+gemini_key_pool = KeyPool(
+    name="gemini",
+    keys=configured_gemini_keys(),
+    redis_url=config.GEMINI_KEY_POOL_REDIS_URL,
+    requests_per_minute=config.GEMINI_KEY_REQUESTS_PER_MINUTE,
+    burst=config.GEMINI_KEY_BURST,
+    cooldown_seconds=config.GEMINI_KEY_COOLDOWN_SECONDS,
+)
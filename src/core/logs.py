@@ -0,0 +1,184 @@
+"""
+Structured, Non-Blocking Logging
+
+One logging layer for the API and the workers. Call sites only enqueue a
+record (never touching stdout); a background QueueListener thread formats
+and writes it. The queue is bounded and drops records when full rather
+than blocking the event loop or a worker.
+
+- Per-module levels: LOG_LEVEL plus LOG_LEVELS overrides in config.
+- Rate limiting: records at or below LOG_RATE_LIMIT_LEVEL are limited per
+  call site (logger + message template) to LOG_RATE_LIMIT_PER_INTERVAL per
+  LOG_RATE_LIMIT_INTERVAL seconds; the next record that gets through reports
+  how many were suppressed. High-frequency paths (UDP relay) cannot flood.
+- Formats: "text" for consoles, "json" (one object per line) for collection.
+  Both include the current trace ID when a span is active.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .. import config
+from .tracing import tracer
+
+# Attributes every LogRecord has; anything else came from `extra=` and is emitted as a field.
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `burst` records per call site per `interval` seconds.
+    """
+
+    def __init__(self, max_level: int, burst: int, interval: float):
+        super().__init__()
+        self.max_level = max_level
+        self.burst = burst
+        self.interval = interval
+        self._windows: Dict[Tuple[str, object], list] = {}  # key -> [window_start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 4096:
+                    self._windows.clear()  # unbounded templates; start over rather than grow
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record and counts it."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        span = tracer.current()
+        if span is not None and not hasattr(record, "trace_id"):
+            record.trace_id = span.trace_id
+        return super().prepare(record)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = _extras(record)
+        if extras:
+            line += "  " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "service": self.service,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extras(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _extras(record: logging.LogRecord) -> Dict[str, object]:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS and not k.startswith("_")}
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[_DroppingQueueHandler] = None
+_pid: Optional[int] = None
+_service = "miles"
+
+
+def setup_logging(service: str = "miles-api") -> None:
+    """
+    Route the root logger through the background queue. Safe to call again
+    (e.g. in a forked worker child, whose listener thread did not survive).
+    """
+
+    global _listener, _handler, _pid, _service
+    if _pid == os.getpid():
+        return
+    _service = service
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter(service) if config.LOG_FORMAT == "json" else TextFormatter())
+
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter(
+        logging.getLevelName(config.LOG_RATE_LIMIT_LEVEL),
+        config.LOG_RATE_LIMIT_PER_INTERVAL,
+        config.LOG_RATE_LIMIT_INTERVAL,
+    ))
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    root.handlers = [h for h in root.handlers if not isinstance(h, logging.StreamHandler)]
+    root.addHandler(handler)
+    root.setLevel(config.LOG_LEVEL)
+    for name, level in config.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    _listener, _handler, _pid = listener, handler, os.getpid()
+
+
+def reset_after_fork(service: Optional[str] = None) -> None:
+    """Rebuild the queue and listener thread in a forked child process."""
+    global _pid
+    _pid = None
+    setup_logging(service or _service)
+
+
+def dropped_records() -> int:
+    return _DroppingQueueHandler.dropped
+
+
+def _stop() -> None:
+    if _listener is not None and _pid == os.getpid():
+        _listener.stop()  # drains what is already queued
+
+
+atexit.register(_stop)
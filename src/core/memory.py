@@ -3,121 +3,465 @@ MILES Memory Manager
 
 Handles:
 1.  **Short-term Conversation History**: For context-aware multi-turn conversations.
+    Older turns are folded into a running summary by a background thread, and
+    `get_history(prompt=...)` adds the stored turns most relevant to the prompt
+    from a NumPy index (`conversation_index.py`), so it returns "summary +
+    relevant turns + last K turns" within a fixed token budget. The index is
+    only built once a caller asks for relevant turns.
+    Changes are appended to a JSONL journal (`journal.py`) and periodically
+    compacted into the `memory.json` snapshot, so a message costs one small
+    append instead of rewriting the whole history.
+    Conversations are per user: `sessions` keeps an LRU of hot per-user
+    managers, evicts idle ones to disk and reloads them on their next request.
 2.  **File Lifecycle Management**: Tracking generated files (images/models) and managing their
-    persistence (temp vs. saved).
+    persistence (temp vs. saved), through the cross-process `asset_registry`.
 """
 
 import os
+import hashlib
 import json
+import logging
+import re
 import shutil
+import threading
 import time
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import OrderedDict
+from typing import Callable, List, Dict, Optional, Any
 from pathlib import Path
 
+from .. import config
+from .asset_registry import asset_registry, current_session
+from .conversation_index import ConversationIndex
+from .journal import Journal
+
+logger = logging.getLogger(__name__)
+
+# (previous summary, messages to fold in) -> new summary
+Summarizer = Callable[[str, List[Dict[str, Any]]], str]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
 # Constants
-MEMORY_FILE = os.path.join("src", "data", "memory.json")
+MEMORY_FILE = os.path.join("src", "data", "memory.json")  # snapshot
+JOURNAL_FILE = os.path.join("src", "data", "memory.journal.jsonl")
 TMP_DIR = os.path.join("src", "data", "tmp")
 SAVED_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "models") # Root/models
 
+# Summary folds and snapshots of every session run here, so thread count does not grow with users.
+_compactor = ThreadPoolExecutor(max_workers=config.MEMORY_COMPACTION_WORKERS, thread_name_prefix="memory-compactor")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for context budgets."""
+    return len(text) // 4 + 1
+
+
+def extractive_summary(summary: str, messages: List[Dict[str, Any]]) -> str:
+    """
+    Default summarizer: one line per folded turn (its first sentence, at most
+    MEMORY_SUMMARY_LINE_WORDS words), oldest lines dropped once the summary
+    exceeds MEMORY_SUMMARY_TOKEN_BUDGET. Local and instant; install an LLM
+    summarizer with `memory.summarizer = fn` for abstractive summaries.
+    """
+
+    lines = summary.splitlines() if summary else []
+    for m in messages:
+        first = _SENTENCE_END.split(m["content"].strip(), 1)[0]
+        words = first.split()
+        if len(words) > config.MEMORY_SUMMARY_LINE_WORDS:
+            first = " ".join(words[:config.MEMORY_SUMMARY_LINE_WORDS]) + " ..."
+        if first:
+            lines.append(f"{m['role']}: {first}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > config.MEMORY_SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
 class MemoryManager:
-    def __init__(self):
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        memory_file: Optional[str] = None,
+        journal_file: Optional[str] = None,
+        restore: Optional[bool] = None,
+        session_id: Optional[str] = None,
+    ):
+        self.memory_file = memory_file or MEMORY_FILE
+        self.session_id = session_id  # SessionStore key; None = the process-wide manager
         self._ensure_dirs()
-        # Always start fresh — do NOT load old history from disk.
-        # This prevents stale context from previous sessions bleeding into new ones.
+        # Start fresh unless MEMORY_RESTORE_ON_STARTUP — stale context from previous
+        # sessions should not bleed into new ones. The journal is opened on first
+        # use, so processes that never touch history (workers) never open it.
+        # Per-user sessions always restore: their files are that user's conversation.
+        self.restore = config.MEMORY_RESTORE_ON_STARTUP if restore is None else restore
         self.history: List[Dict[str, Any]] = []
+        # Row i embeds history[i]; built on the first get_history(prompt=...), so
+        # sessions nobody retrieves from never pay for embeddings.
+        self.index: Optional[ConversationIndex] = None
         self.active_session_files: List[str] = [] # List of file paths generated in this session
 
+        # Running summary of every message before `_folded` (a count of all
+        # messages ever added, so it survives the history window sliding).
+        self.summary = ""
+        self.summarizer: Summarizer = summarizer or extractive_summary
+        self._added = 0
+        self._folded = 0
+        self._compacting = False
+        self._snapshotting = False
+        self._lock = threading.RLock()
+        self.journal = Journal(journal_file or JOURNAL_FILE, self.memory_file, config.MEMORY_JOURNAL_FSYNC_SECONDS)
+        self._loaded = False
+
     def clear_history(self):
         """Clears the in-memory history and wipes the history file on disk."""
-        self.history = []
+        with self._lock:
+            self._ensure_loaded()
+            self._apply({"op": "clear"})
+            self.journal.append({"op": "clear"})
         self.save_memory()
-        print("[Memory] History cleared.")
+        logger.info("History cleared.")
+
+    def close(self):
+        """Snapshot unsaved changes and close the journal (session eviction / shutdown)."""
+        with self._lock:
+            dirty = self._loaded and self.journal.pending > 0
+        if dirty:
+            self.save_memory()
+        self.journal.close()
 
     def _ensure_dirs(self):
-        os.makedirs(os.path.dirname(MEMORY_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(self.memory_file), exist_ok=True)
         os.makedirs(TMP_DIR, exist_ok=True)
         os.makedirs(SAVED_MODELS_DIR, exist_ok=True)
 
+    def _ensure_loaded(self):
+        """Open the journal on first use; restore the previous conversation if configured (lock held)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.restore:
+            self._load_memory()
+            return
+        snapshot, records = self.journal.recover()
+        if snapshot and snapshot.get("history") or records:
+            # Keep the old conversation on disk until compaction, but not in the new one.
+            self.journal.append({"op": "clear"})
+
     def _load_memory(self):
-        """Loads conversation history from disk."""
-        if os.path.exists(MEMORY_FILE):
-            try:
-                with open(MEMORY_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.history = data.get("history", [])
-            except Exception as e:
-                print(f"[Memory] Failed to load memory: {e}")
-                self.history = []
+        """Loads conversation history from disk: the snapshot, then the journal records after it."""
+        started = time.perf_counter()
+        try:
+            snapshot, records = self.journal.recover()
+        except Exception as e:
+            logger.error("Failed to load memory: %s", e)
+            return
+        snapshot = snapshot or {}
+        self.history = snapshot.get("history", [])[-config.MEMORY_MAX_MESSAGES:]
+        self.summary = snapshot.get("summary", "")
+        self._added = snapshot.get("added", len(self.history))
+        self._folded = snapshot.get("folded", self._added)
+        self.index = None
+        for record in records:
+            self._apply(record)
+        logger.info("Memory restored: %d messages (%d journal records) in %.0f ms",
+                    len(self.history), len(records), (time.perf_counter() - started) * 1000)
+        self._schedule_compaction()
+
+    def _apply(self, record: Dict[str, Any]):
+        """Apply one journal record to the in-memory state (lock held)."""
+        op = record["op"]
+        if op == "add":
+            self.history.append({"role": record["role"], "content": record["content"],
+                                 "timestamp": record["timestamp"]})
+            if self.index is not None:
+                self.index.add(record["content"])
+            self._added += 1
+            if len(self.history) > config.MEMORY_MAX_MESSAGES:
+                self.history.pop(0)
+                if self.index is not None:
+                    self.index.drop_oldest()
+        elif op == "summary":
+            self.summary = record["summary"]
+            self._folded = record["folded"]
+        elif op == "clear":
+            self.history = []
+            if self.index is not None:
+                self.index.clear()
+            self.summary = ""
+            self._folded = self._added
 
     def save_memory(self):
-        """Persists conversation history to disk."""
+        """Persists conversation history to disk: a fresh snapshot, then the journal segment it covers is dropped."""
         try:
-            with open(MEMORY_FILE, 'w') as f:
-                json.dump({"history": self.history}, f, indent=2)
+            # Eviction close, background snapshots and clear_history may all save at
+            # once; each rotate → snapshot → drop-.old sequence must finish before the next.
+            with self.journal.checkpoint_lock:
+                with self._lock:
+                    self._ensure_loaded()
+                    seq = self.journal.rotate()
+                    state = {
+                        "history": list(self.history),
+                        "summary": self.summary,
+                        "added": self._added,
+                        "folded": self._folded,
+                    }
+                # Messages are never mutated once stored, so serializing outside the lock is safe.
+                self.journal.write_snapshot(state, seq)
         except Exception as e:
-            print(f"[Memory] Failed to save memory: {e}")
+            logger.error("Failed to save memory: %s", e)
 
     def add_message(self, role: str, content: str):
-        """Adds a message to the conversation history."""
-        self.history.append({
-            "role": role,
-            "content": content,
-            "timestamp": time.time()
-        })
-        # Keep window (e.g., last 50 messages)
-        if len(self.history) > 50:
-            self.history.pop(0)
-        self.save_memory()
+        """Adds a message to the conversation history (one journal append)."""
+        record = {"op": "add", "role": role, "content": content, "timestamp": time.time()}
+        with self._lock:
+            self._ensure_loaded()
+            self._apply(record)
+            self.journal.append(record)
+            self._schedule_compaction()
+
+    def get_history(self, token_budget: Optional[int] = None, prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Returns the conversation context formatted for the LLM, within
+        `token_budget` (default MEMORY_CONTEXT_TOKEN_BUDGET) estimated tokens:
+        the running summary of older turns, the MEMORY_RELEVANT_MESSAGES older
+        messages most similar to `prompt` (if given), then up to
+        MEMORY_RECENT_MESSAGES of the newest messages, newest kept first.
+        """
+
+        budget = token_budget or config.MEMORY_CONTEXT_TOKEN_BUDGET
+        with self._lock:
+            self._ensure_loaded()
+            summary = self.summary
+            recent = self.history[-config.MEMORY_RECENT_MESSAGES:]
+            relevant: List[Dict[str, Any]] = []
+            if prompt:
+                if self.index is None:
+                    self.index = ConversationIndex(config.MEMORY_INDEX_DIM)
+                    for m in self.history:
+                        self.index.add(m["content"])
+                hits = self.index.search(
+                    prompt,
+                    k=config.MEMORY_RELEVANT_MESSAGES,
+                    limit=len(self.history) - len(recent),
+                    min_score=config.MEMORY_RELEVANCE_MIN_SCORE,
+                )
+                relevant = [self.history[i] for i, _ in sorted(hits)]
+
+        context: List[Dict[str, str]] = []
+        if summary:
+            text = f"Summary of the earlier conversation:\n{summary}"
+            budget -= estimate_tokens(text)
+            context.append({"role": "user", "parts": [text]})
+
+        # Recent turns take priority over retrieved ones; whatever budget is left goes to recall.
+        turns: List[Dict[str, str]] = []
+        for m in reversed(recent):
+            cost = estimate_tokens(m["content"])
+            if cost > budget:
+                break
+            budget -= cost
+            turns.append({"role": m["role"], "parts": [m["content"]]})
+
+        lines = []
+        budget -= estimate_tokens("Relevant earlier messages:")
+        for m in relevant:
+            line = f"{m['role']}: {m['content']}"
+            cost = estimate_tokens(line)
+            if cost <= budget:
+                budget -= cost
+                lines.append(line)
+        if lines:
+            context.append({"role": "user", "parts": ["Relevant earlier messages:\n" + "\n".join(lines)]})
+        return context + turns[::-1]
+
+    def _schedule_compaction(self):
+        """
+        Queue background work (lock held): a summary fold once enough messages
+        sit outside the recent window, a snapshot once the journal is long enough.
+        """
+        unfolded = self._added - self._folded - config.MEMORY_RECENT_MESSAGES
+        if unfolded >= config.MEMORY_COMPACT_BATCH and not self._compacting:
+            self._compacting = True
+            _compactor.submit(self._compact)
+        if self.journal.pending >= config.MEMORY_JOURNAL_COMPACT_RECORDS and not self._snapshotting:
+            self._snapshotting = True
+            _compactor.submit(self._snapshot)
+
+    def _snapshot(self):
+        try:
+            self.save_memory()
+        finally:
+            with self._lock:
+                self._snapshotting = False
+
+    def _set_summary(self, summary: str, folded: int):
+        """Lock held."""
+        record = {"op": "summary", "summary": summary, "folded": folded}
+        self._apply(record)
+        self.journal.append(record)
 
-    def get_history(self) -> List[Dict[str, str]]:
-        """Returns the conversation history formatted for the LLM."""
-        return [{"role": m["role"], "parts": [m["content"]]} for m in self.history]
+    def _compact(self):
+        """Fold every message older than the recent window into the summary (background thread)."""
+        try:
+            with self._lock:
+                offset = self._added - len(self.history)   # messages already out of the window
+                start = max(self._folded, offset) - offset
+                end = len(self.history) - config.MEMORY_RECENT_MESSAGES
+                batch = [dict(m) for m in self.history[start:end]]
+                summary, folded_to = self.summary, offset + end
+            if not batch:
+                # Everything unfolded already slid out of the window; nothing left to fold.
+                with self._lock:
+                    if folded_to > self._folded:
+                        self._set_summary(self.summary, folded_to)
+                return
+            # The summarizer may be slow (an LLM call); requests keep reading the old summary.
+            new_summary = self.summarizer(summary, batch)
+            with self._lock:
+                if self._folded <= folded_to - len(batch):  # not cleared meanwhile
+                    self._set_summary(new_summary, folded_to)
+        except Exception as e:
+            logger.error("Memory compaction failed: %s", e)
+        finally:
+            with self._lock:
+                self._compacting = False
+                self._schedule_compaction()
 
-    def register_file(self, file_path: str, is_temp: bool = True):
+    def register_file(self, file_path: str, is_temp: bool = True, prompt: Optional[str] = None, kind: Optional[str] = None) -> str:
         """
-        Registers a generated file. 
-        If is_temp is True, it will be cleaned up unless saved later.
+        Registers a generated file in the shared asset registry (visible to every
+        process) under this manager's session, or the session of the request
+        being served. If is_temp is True, it will be cleaned up unless saved later.
+        Returns the asset ID.
         """
         if is_temp:
             self.active_session_files.append(file_path)
+        return asset_registry.register(
+            file_path, is_temp=is_temp, prompt=prompt, kind=kind, session=self.session_id or current_session.get()
+        )
 
     def save_model_permanently(self, filename: str) -> str:
         """
         Moves a file from tmp (or wherever) to the saved models directory.
         Returns the new path.
         """
-        # Find the file in active session or tmp
-        source_path = None
-        for path in self.active_session_files:
-            if os.path.basename(path) == filename:
-                source_path = path
-                break
-        
-        if not source_path and os.path.exists(os.path.join(TMP_DIR, filename)):
-            source_path = os.path.join(TMP_DIR, filename)
+        # Indexed lookup in the shared registry; files made before it existed may still sit in tmp
+        asset = asset_registry.find(filename)
+        source_path = asset["path"] if asset is not None else os.path.join(TMP_DIR, filename)
 
-        if source_path and os.path.exists(source_path):
+        if os.path.exists(source_path):
             target_path = os.path.join(SAVED_MODELS_DIR, filename)
             shutil.copy2(source_path, target_path)
-            print(f"[Memory] Saved model to {target_path}")
+            if asset is not None:
+                asset_registry.mark_saved(asset["asset_id"], os.path.abspath(target_path))
+            logger.info("Saved model to %s", target_path)
             return target_path
-        
+
         return ""
 
-    def cleanup_session(self):
+    def cleanup_session(self) -> int:
         """
-        Deletes temporary files tracked in this session.
+        Deletes temporary files registered in this session (by any process).
         This should be called when a "chat" ends or explicitly by the user (rare/complex to define 'end').
-        For now, we might provide a tool to call this.
+        Returns how many files were removed.
         """
-        for file_path in self.active_session_files:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    print(f"[Memory] Cleaned up {file_path}")
-                except Exception as e:
-                    print(f"[Memory] Error cleaning up {file_path}: {e}")
         self.active_session_files = []
+        return asset_registry.cleanup_session(self.session_id)
+
+
+class SessionStore:
+    """
+    Per-user conversation memory: an LRU of hot `MemoryManager`s keyed by user.
+
+    A lookup is one OrderedDict access. Sessions idle for MEMORY_SESSION_IDLE_SECONDS,
+    and the least recently used ones beyond MEMORY_MAX_HOT_SESSIONS, are evicted:
+    their unsaved changes are snapshotted to disk in the background and their
+    memory (history, embedding index) is released. The next request for that user
+    reloads the session from its snapshot + journal.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_hot: Optional[int] = None, idle_seconds: Optional[float] = None):
+        self.root = Path(root or config.MEMORY_SESSIONS_DIR)
+        self.max_hot = max_hot or config.MEMORY_MAX_HOT_SESSIONS
+        self.idle_seconds = idle_seconds or config.MEMORY_SESSION_IDLE_SECONDS
+        self._hot: "OrderedDict[str, MemoryManager]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._closing: Dict[str, Any] = {}  # session key -> Future of its background close
+        self._lock = threading.Lock()
+        # Guards `_closing` alone: close callbacks run on compactor threads and must
+        # never wait for `_lock`, which `get` may hold. Order: `_lock`, then this.
+        self._closing_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def session_key(user_id: str) -> str:
+        """Stable, filesystem-safe key; hashing avoids path tricks and collisions from sanitizing."""
+        return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, user_id: str) -> MemoryManager:
+        """The user's session, loaded from disk (lazily, on first use) if it is not hot."""
+        key = self.session_key(user_id)
+        while True:
+            with self._lock:
+                session = self._hot.get(key)
+                if session is not None:
+                    self._hot.move_to_end(key)
+                else:
+                    with self._closing_lock:
+                        pending = self._closing.get(key)
+                    if pending is None or pending.done():
+                        session = self._hot[key] = MemoryManager(
+                            memory_file=str(self.root / f"{key}.json"),
+                            journal_file=str(self.root / f"{key}.journal.jsonl"),
+                            restore=True,
+                            session_id=key,
+                        )
+                        self.loads += 1
+                if session is not None:
+                    now = time.monotonic()
+                    self._last_used[key] = now
+                    self._evict_locked(now)
+                    return session
+            # Evicted moments ago and still writing its snapshot: let it finish
+            # (without holding the lock its close callback needs), then look again.
+            wait([pending])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hot": len(self._hot), "loads": self.loads, "evictions": self.evictions}
+
+    def close(self):
+        """Snapshot and close every hot session (application shutdown)."""
+        with self._lock:
+            hot, self._hot = list(self._hot.values()), OrderedDict()
+            self._last_used.clear()
+        for session in hot:
+            session.close()
+
+    def _evict_locked(self, now: float):
+        # LRU order is also idle order, so only the front of the dict is ever examined.
+        while self._hot:
+            key, session = next(iter(self._hot.items()))
+            idle = now - self._last_used[key]
+            if len(self._hot) <= self.max_hot and idle < self.idle_seconds:
+                break
+            del self._hot[key]
+            del self._last_used[key]
+            self.evictions += 1
+            future = _compactor.submit(session.close)
+            with self._closing_lock:
+                self._closing[key] = future
+            future.add_done_callback(lambda _, key=key, future=future: self._forget_close(key, future))
+
+    def _forget_close(self, key: str, future: Any):
+        with self._closing_lock:
+            if self._closing.get(key) is future:
+                del self._closing[key]
+
 
-# Singleton
+# Singletons: `memory` is the process-wide manager (generated files, callers
+# without a user); `sessions` holds per-user conversation history.
 memory = MemoryManager()
+sessions = SessionStore()
@@ -0,0 +1,401 @@
+"""
+Pipeline Metrics (Prometheus text format)
+
+Low-overhead stage timers, counters and in-flight gauges for the whole
+request-to-hologram path: brain, SDXL, rembg, upload, ComfyUI, GLB copy and
+hologram broadcast.
+
+Every process (API, gpu worker, io worker) records into local buckets under a
+lock and a background thread flushes the *deltas* to Redis hashes every
+METRICS_FLUSH_SECONDS. `/metrics` renders the Redis totals, so one scrape sees
+all processes; p50/p95/p99 are estimated from the histogram buckets.
+
+Gauges are not deltas: each process publishes its current values in its own
+hash, refreshed on every flush and expiring after METRICS_GAUGE_STALE_SECONDS.
+A worker killed mid-task (SIGKILL, OOM) stops refreshing, so its in-flight
+count drops out of the totals instead of staying +1 forever.
+"""
+
+from __future__ import annotations
+
+import atexit
+import bisect
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import redis
+
+from .. import config
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "miles:metrics:counters"
+GAUGES_KEY = "miles:metrics:gauges"  # prefix of the per-process gauge hashes
+GAUGE_PROCESSES_KEY = "miles:metrics:gauge_processes"  # hash key -> last flush time
+HISTOGRAMS_KEY = "miles:metrics:histograms"
+
+STAGE_SECONDS = "miles_stage_duration_seconds"
+STAGE_INFLIGHT = "miles_stage_inflight"
+STAGE_ERRORS = "miles_stage_errors_total"
+
+HELP: Dict[str, str] = {
+    STAGE_SECONDS: "Wall time of one pipeline stage.",
+    STAGE_INFLIGHT: "Pipeline stages currently executing.",
+    STAGE_ERRORS: "Pipeline stages that raised.",
+    "miles_plan_tier_total": "Prompts planned, by the tier that answered.",
+    "miles_brain_calls_total": "Fallback chain brain calls, by brain and outcome (ok, error, timeout, circuit_open).",
+    "miles_intent_classifier_total": "Local intent classifier predictions, by label and whether the prompt was escalated to the LLM.",
+    "miles_admission_rejected_total": "Dispatches rejected by admission control.",
+    "miles_tasks_coalesced_total": "Dispatches attached to an identical task already in flight.",
+    "miles_tasks_total": "Celery tasks finished, by worker and final state.",
+    "miles_tasks_inflight": "Celery tasks currently executing.",
+    "miles_task_duration_seconds": "Celery task run time (prerun to postrun).",
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, Labels]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _series(name: str, labels: Labels) -> str:
+    if not labels:
+        return name
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return f"{name}{{{body}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size  # per-bucket (not cumulative); last is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Process-local recorder with periodic delta flush to Redis.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        redis_url: Optional[str],
+        bounds: List[float],
+        flush_seconds: float,
+        gauge_stale_seconds: float,
+    ):
+        self.enabled = enabled
+        self.redis_url = redis_url
+        self.bounds = sorted(bounds)
+        self.flush_seconds = flush_seconds
+        self.gauge_stale_seconds = gauge_stale_seconds
+        self._client: Optional[redis.Redis] = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flusher: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        # Process totals (fallback for /metrics without Redis) and unflushed deltas.
+        self._counters: Dict[SeriesKey, float] = {}
+        self._gauges: Dict[SeriesKey, float] = {}
+        self._histograms: Dict[SeriesKey, _Histogram] = {}
+        self._pending_counters: Dict[SeriesKey, float] = {}
+        self._pending_histograms: Dict[SeriesKey, _Histogram] = {}
+        self._gauges_key = f"{GAUGES_KEY}:{socket.gethostname()}:{os.getpid()}"
+        self._gauges_published = False
+
+    # ── Recording ────────────────────────────────────────────────────────────
+    def inc(self, name: str, value: float = 1.0, **labels: object) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._guard():
+            self._counters[key] = self._counters.get(key, 0.0) + value
+            self._pending_counters[key] = self._pending_counters.get(key, 0.0) + value
+
+    def gauge_add(self, name: str, value: float, **labels: object) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._guard():
+            self._gauges[key] = self._gauges.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        index = bisect.bisect_left(self.bounds, value)
+        with self._guard():
+            for store in (self._histograms, self._pending_histograms):
+                hist = store.get(key)
+                if hist is None:
+                    hist = store[key] = _Histogram(len(self.bounds) + 1)
+                hist.buckets[index] += 1
+                hist.sum += value
+                hist.count += 1
+
+    @contextmanager
+    def timer(self, stage: str, **labels: object) -> Iterator[None]:
+        """
+        Time a pipeline stage: duration histogram, in-flight gauge, error
+        counter, plus a trace span so the stage shows up in the request's waterfall.
+
+            with metrics.timer("sdxl"):
+                ...
+        """
+
+        with tracer.span(stage, **labels):
+            if not self.enabled:
+                yield
+                return
+            self.gauge_add(STAGE_INFLIGHT, 1, stage=stage, **labels)
+            started = time.perf_counter()
+            try:
+                yield
+            except BaseException:
+                self.inc(STAGE_ERRORS, stage=stage, **labels)
+                raise
+            finally:
+                self.observe(STAGE_SECONDS, time.perf_counter() - started, stage=stage, **labels)
+                self.gauge_add(STAGE_INFLIGHT, -1, stage=stage, **labels)
+
+    @contextmanager
+    def _guard(self) -> Iterator[None]:
+        if os.getpid() != self._pid:
+            self._after_fork()
+        with self._lock:
+            yield
+        if self._flusher is None and self.redis_url:
+            self._start_flusher()
+
+    def _after_fork(self) -> None:
+        # Celery prefork children inherit the parent's state; start clean so
+        # the parent's unflushed deltas are not counted twice.
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._client = None
+        self._flusher = None
+        self._reset()
+
+    # ── Redis aggregation ────────────────────────────────────────────────────
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        pid = self._pid
+        while pid == os.getpid():
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def _redis(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, decode_responses=True)
+        return self._client
+
+    def flush(self) -> None:
+        """Push deltas recorded since the last flush, and current gauge values, to Redis."""
+        if not self.redis_url:
+            return
+        with self._lock:
+            counters, self._pending_counters = self._pending_counters, {}
+            histograms, self._pending_histograms = self._pending_histograms, {}
+            gauges = {_series(*key): value for key, value in self._gauges.items() if value}
+        if not (counters or gauges or histograms or self._gauges_published):
+            return
+
+        try:
+            # One transaction, so a scrape never sees this process's gauges half rewritten.
+            pipe = self._redis().pipeline()
+            for (name, labels), value in counters.items():
+                pipe.hincrbyfloat(COUNTERS_KEY, _series(name, labels), value)
+            pipe.delete(self._gauges_key)
+            if gauges:
+                pipe.hset(self._gauges_key, mapping=gauges)
+                pipe.expire(self._gauges_key, int(self.gauge_stale_seconds))
+                pipe.zadd(GAUGE_PROCESSES_KEY, {self._gauges_key: time.time()})
+            else:
+                pipe.zrem(GAUGE_PROCESSES_KEY, self._gauges_key)
+            for (name, labels), hist in histograms.items():
+                series = _series(name, labels)
+                for index, count in enumerate(hist.buckets):
+                    if count:
+                        pipe.hincrby(HISTOGRAMS_KEY, f"{series}|{index}", count)
+                pipe.hincrbyfloat(HISTOGRAMS_KEY, f"{series}|sum", hist.sum)
+                pipe.hincrby(HISTOGRAMS_KEY, f"{series}|count", hist.count)
+            pipe.execute()
+            self._gauges_published = bool(gauges)
+        except redis.RedisError as exc:
+            logger.warning("Flush failed, keeping deltas for next time: %s", exc)
+            self._requeue(counters, histograms)
+
+    def _requeue(self, counters, histograms) -> None:
+        with self._lock:
+            for key, value in counters.items():
+                self._pending_counters[key] = self._pending_counters.get(key, 0.0) + value
+            for key, hist in histograms.items():
+                pending = self._pending_histograms.get(key)
+                if pending is None:
+                    self._pending_histograms[key] = hist
+                    continue
+                pending.buckets = [a + b for a, b in zip(pending.buckets, hist.buckets)]
+                pending.sum += hist.sum
+                pending.count += hist.count
+
+    # ── Exposition ───────────────────────────────────────────────────────────
+    def render(self) -> str:
+        """
+        Prometheus text exposition of all processes (Redis), or of this
+        process only if Redis is unreachable.
+        """
+
+        self.flush()
+        try:
+            if not self.redis_url:
+                raise redis.RedisError("no metrics Redis configured")
+            counters, gauges, histograms = self._read_redis()
+        except redis.RedisError:
+            counters, gauges, histograms = self._read_local()
+
+        lines: List[str] = []
+        self._render_scalars(lines, counters, "counter")
+        self._render_scalars(lines, gauges, "gauge")
+        self._render_histograms(lines, histograms)
+        return "\n".join(lines) + "\n"
+
+    def quantile(self, counts: List[int], q: float) -> float:
+        """Estimate quantile `q` from per-bucket counts (linear within a bucket)."""
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index >= len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def _read_redis(self):
+        # Forget processes that stopped flushing (their hashes have expired too).
+        client = self._redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.zremrangebyscore(GAUGE_PROCESSES_KEY, "-inf", time.time() - self.gauge_stale_seconds)
+        pipe.zrange(GAUGE_PROCESSES_KEY, 0, -1)
+        _, processes = pipe.execute()
+
+        pipe = client.pipeline(transaction=False)
+        pipe.hgetall(COUNTERS_KEY)
+        pipe.hgetall(HISTOGRAMS_KEY)
+        for key in processes:
+            pipe.hgetall(key)
+        raw_counters, raw_histograms, *raw_gauges = pipe.execute()
+
+        counters = {series: float(v) for series, v in raw_counters.items()}
+        gauges: Dict[str, float] = {}
+        for process in raw_gauges:
+            for series, value in process.items():
+                gauges[series] = gauges.get(series, 0.0) + float(value)
+        histograms: Dict[str, _Histogram] = {}
+        for field, value in raw_histograms.items():
+            series, part = field.rsplit("|", 1)
+            hist = histograms.get(series)
+            if hist is None:
+                hist = histograms[series] = _Histogram(len(self.bounds) + 1)
+            if part == "sum":
+                hist.sum = float(value)
+            elif part == "count":
+                hist.count = int(value)
+            elif int(part) < len(hist.buckets):
+                hist.buckets[int(part)] = int(value)
+        return counters, gauges, histograms
+
+    def _read_local(self):
+        with self._lock:
+            counters = {_series(*key): v for key, v in self._counters.items()}
+            gauges = {_series(*key): v for key, v in self._gauges.items()}
+            histograms = {_series(*key): h for key, h in self._histograms.items()}
+        return counters, gauges, histograms
+
+    @staticmethod
+    def _family(series: str) -> Tuple[str, str]:
+        name, _, rest = series.partition("{")
+        return name, rest[:-1] if rest else ""
+
+    def _header(self, lines: List[str], seen: set, name: str, kind: str) -> None:
+        if name in seen:
+            return
+        seen.add(name)
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def _render_scalars(self, lines: List[str], values: Dict[str, float], kind: str) -> None:
+        seen: set = set()
+        for series in sorted(values):
+            self._header(lines, seen, self._family(series)[0], kind)
+            lines.append(f"{series} {values[series]:g}")
+
+    def _render_histograms(self, lines: List[str], histograms: Dict[str, _Histogram]) -> None:
+        seen: set = set()
+        quantile_lines: Dict[str, List[str]] = {}
+        for series in sorted(histograms):
+            hist = histograms[series]
+            name, labels = self._family(series)
+            prefix = f"{labels}," if labels else ""
+            self._header(lines, seen, name, "histogram")
+
+            cumulative = 0
+            for bound, count in zip(self.bounds + [float("inf")], hist.buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {hist.sum:g}")
+            lines.append(f"{name}_count{suffix} {hist.count}")
+
+            family = quantile_lines.setdefault(f"{name}_quantile", [])
+            for q in QUANTILES:
+                value = self.quantile(hist.buckets, q)
+                family.append(f'{name}_quantile{{{prefix}quantile="{q:g}"}} {value:.4g}')
+
+        # Percentiles as plain gauges, so dashboards need no histogram_quantile().
+        for family, family_lines in quantile_lines.items():
+            lines.append(f"# HELP {family} p50/p95/p99 estimated from the histogram buckets.")
+            lines.append(f"# TYPE {family} gauge")
+            lines.extend(family_lines)
+
+
+metrics = MetricsRegistry(
+    enabled=config.METRICS_ENABLED,
+    redis_url=config.METRICS_REDIS_URL,
+    bounds=config.METRICS_LATENCY_BUCKETS,
+    flush_seconds=config.METRICS_FLUSH_SECONDS,
+    gauge_stale_seconds=config.METRICS_GAUGE_STALE_SECONDS,
+)
+atexit.register(metrics.flush)
@@ -20,7 +20,7 @@ class UserRequest(BaseModel):
     prompt: str = Field(..., description="Raw user instruction for the Orchestrator brain.")
     user_id: Optional[str] = Field(
         "default-user",
-        description="Identifier for telemetry or personalization experiments.",
+        description="Identifier of the user's conversation session (memory); also used for telemetry.",
     )
 
 
@@ -47,6 +47,10 @@ class OrchestratorPlan(BaseModel):
     save_memory: bool = Field(
         False, description="Flag indicating if the user wants to permanently save the generated assets."
     )
+    tier: Optional[str] = Field(
+        None,
+        description="Pipeline tier that produced this plan (e.g. fast_path:greeting, plan_cache, semantic_cache, preflight, classifier, brain, fallback).",
+    )
 
 
 class TaskDispatchResponse(BaseModel):
@@ -61,4 +65,41 @@ class TaskDispatchResponse(BaseModel):
         None,
         description="Immediate answer generated without dispatching to workers.",
     )
+    estimated_completion_seconds: Optional[float] = Field(
+        None,
+        description="Admission-control estimate of when the slowest dispatched task will finish.",
+    )
+    trace_id: Optional[str] = Field(
+        None,
+        description="Trace of this request; worker spans join it (see src/core/tracing.py).",
+    )
+
+
+class BatchUserRequest(BaseModel):
+    """
+    Several prompts submitted together to /interact/batch.
+    """
+
+    requests: List[UserRequest] = Field(..., description="Prompts to plan and dispatch as one batch.")
+
 
+class BatchDispatchResponse(BaseModel):
+    """
+    The immediate response for a batch: one ID plus a per-prompt dispatch result.
+    """
+
+    batch_id: str = Field(..., description="Celery group ID covering every task dispatched by this batch.")
+    items: List[TaskDispatchResponse] = Field(
+        ..., description="One TaskDispatchResponse per submitted prompt, in request order."
+    )
+
+
+class BrainReloadRequest(BaseModel):
+    """
+    Request body for swapping the active orchestrator brain at runtime.
+    """
+
+    mode: Optional[str] = Field(
+        None,
+        description="BRAIN_MODE to switch to (GEMINI, LOCAL, DEMO, CHAIN). Omit to rebuild the current brain.",
+    )
@@ -0,0 +1,284 @@
+"""
+Semantic Response Cache
+
+Exact-match caching misses paraphrases ("what is quantum physics" vs
+"explain quantum physics"). This cache embeds prompts with a hashed n-gram
+vectorizer, keeps every vector in one contiguous NumPy matrix, and serves a
+stored answer when cosine similarity passes a threshold — no LLM call.
+
+Capacity is fixed; when full, the least-recently-used entry is replaced.
+Entries are persisted to a compressed `.npz` file per namespace (model),
+written on a background thread so `store()` never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_NEGATION = re.compile(r"n['’]t\b|\bcannot\b")
+_APOSTROPHE = re.compile(r"['’]")
+
+# Question-framing words carry no topic; dropping them lets
+# "what is X", "explain X" and "tell me about X" land on the same vector.
+# Interrogatives other than "what" (who/when/where/why/how/which) and
+# negations change the question, so they stay features.
+FRAMING_WORDS = frozenset(
+    """
+    a an the is are was were be of to in on for and or about me us please
+    what whats explain describe define tell
+    give can could would you i do does did it its this that some
+    """.split()
+)
+
+# Bumped whenever features() changes; persisted vectors of another version are re-embedded.
+FEATURES_VERSION = 2
+
+# Words that flip what is being asked; weighted up so they outvote a shared topic.
+MARKER_WORDS = frozenset("who when where why how which not no never without".split())
+
+_WEIGHTS = {"w": 2.0, "m": 4.0, "b": 3.0, "c": 1.0}
+
+
+class HashingVectorizer:
+    """
+    Stateless text → unit vector embedding (word unigrams, word bigrams and
+    char trigrams, hashed). The bigrams make it order-sensitive, so
+    "celsius to fahrenheit" and "fahrenheit to celsius" differ.
+
+    Uses crc32 rather than `hash()` so vectors are stable across processes and
+    restarts, which is required for on-disk persistence.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def features(self, text: str) -> List[str]:
+        text = _APOSTROPHE.sub("", _NEGATION.sub(" not", text.lower()))
+        words = [w for w in _TOKEN.findall(text) if w not in FRAMING_WORDS]
+        feats = [f"m:{w}" if w in MARKER_WORDS else f"w:{w}" for w in words]
+        feats.extend(f"b:{a}_{b}" for a, b in zip(words, words[1:]))
+        for w in words:
+            padded = f"<{w}>"
+            feats.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return feats
+
+    def transform(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feat in self.features(text):
+            h = zlib.crc32(feat.encode("utf-8"))
+            # Word and bigram features weigh more than the sub-word trigrams.
+            weight = _WEIGHTS[feat[0]]
+            vec[h % self.dim] += weight if (h >> 31) == 0 else -weight
+        norm = float(np.linalg.norm(vec))
+        if norm > 0:
+            vec /= norm
+        return vec
+
+
+class SemanticCache:
+    """
+    Capacity-bounded, persistent nearest-neighbour answer cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        capacity: int,
+        threshold: float,
+        dim: int = 1024,
+        persist_every: int = 16,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.threshold = threshold
+        self.persist_every = persist_every
+        self.vectorizer = HashingVectorizer(dim)
+
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._prompts: List[str] = [""] * capacity
+        self._answers: List[str] = [""] * capacity
+        self._size = 0
+        self._dirty = 0
+        self._save_pending = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one writer of the .npz at a time
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path is not None:
+            self.load()
+
+    def lookup(self, prompt: str) -> Optional[str]:
+        """Return the cached answer of the most similar stored prompt, if similar enough."""
+        vec = self.vectorizer.transform(prompt)
+        with self._lock:
+            if self._size == 0 or not vec.any():
+                self.misses += 1
+                return None
+            scores = self._vectors[: self._size] @ vec
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self._last_used[best] = time.time()
+            self.hits += 1
+            return self._answers[best]
+
+    def store(self, prompt: str, answer: str) -> None:
+        vec = self.vectorizer.transform(prompt)
+        if not vec.any() or not answer:
+            return
+        with self._lock:
+            slot = self._slot_for(vec)
+            self._vectors[slot] = vec
+            self._last_used[slot] = time.time()
+            self._prompts[slot] = prompt
+            self._answers[slot] = answer
+            self._dirty += 1
+            should_persist = (
+                self.path is not None and self._dirty >= self.persist_every and not self._save_pending
+            )
+            if should_persist:
+                self._save_pending = True
+        if should_persist:
+            _saver.submit(self._background_save)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                n = self._size
+                vectors = self._vectors[:n].copy()
+                last_used = self._last_used[:n].copy()
+                prompts = np.array(self._prompts[:n], dtype=np.str_)
+                answers = np.array(self._answers[:n], dtype=np.str_)
+                self._dirty = 0
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix(".tmp.npz")
+                np.savez_compressed(
+                    tmp_path,
+                    vectors=vectors,
+                    last_used=last_used,
+                    prompts=prompts,
+                    answers=answers,
+                    version=np.array(FEATURES_VERSION),
+                )
+                os.replace(tmp_path, self.path)
+            except Exception as exc:
+                logger.error("Failed to persist %s: %s", self.path, exc)
+
+    def _background_save(self) -> None:
+        with self._lock:
+            self._save_pending = False
+        self.save()
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                vectors = data["vectors"]
+                version = int(data["version"]) if "version" in data.files else 1
+                if vectors.shape[1] != self._vectors.shape[1]:
+                    logger.warning("Ignoring %s: vector size changed", self.path)
+                    return
+                # Keep the most recently used entries if capacity shrank.
+                order = np.argsort(-data["last_used"])[: self.capacity]
+                n = len(order)
+                prompts = [str(p) for p in data["prompts"][order]]
+                if version == FEATURES_VERSION:
+                    self._vectors[:n] = vectors[order]
+                else:
+                    logger.info("Re-embedding %s (features v%d → v%d)", self.path, version, FEATURES_VERSION)
+                    for i, prompt in enumerate(prompts):
+                        self._vectors[i] = self.vectorizer.transform(prompt)
+                self._last_used[:n] = data["last_used"][order]
+                self._prompts[:n] = prompts
+                self._answers[:n] = [str(a) for a in data["answers"][order]]
+                self._size = n
+            logger.info("Loaded %d entries from %s", self._size, self.path)
+        except Exception as exc:
+            logger.error("Failed to load %s: %s", self.path, exc)
+
+    # ── Internals ────────────────────────────────────────────────────────────
+    def _slot_for(self, vec: np.ndarray) -> int:
+        # Caller holds the lock. Overwrite a near-duplicate instead of storing twice.
+        if self._size:
+            scores = self._vectors[: self._size] @ vec
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return best
+        if self._size < self.capacity:
+            self._size += 1
+            return self._size - 1
+        self.evictions += 1
+        return int(np.argmin(self._last_used))
+
+
+# Disk writes run here, off the caller's thread (often the event loop).
+_saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-cache-save")
+
+_caches: Dict[str, SemanticCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_semantic_cache(namespace: str) -> Optional[SemanticCache]:
+    """
+    Return the process-wide semantic cache for a namespace (usually a model name),
+    or None if the semantic cache is disabled in config.
+    """
+
+    if not config.SEMANTIC_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace)
+            cache = SemanticCache(
+                path=config.SEMANTIC_CACHE_DIR / f"{slug}.npz",
+                capacity=config.SEMANTIC_CACHE_CAPACITY,
+                threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                dim=config.SEMANTIC_CACHE_DIM,
+                persist_every=config.SEMANTIC_CACHE_PERSIST_EVERY,
+            )
+            _caches[namespace] = cache
+        return cache
+
+
+def all_semantic_caches() -> Dict[str, SemanticCache]:
+    with _caches_lock:
+        return dict(_caches)
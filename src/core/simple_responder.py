@@ -3,89 +3,163 @@ Lightweight rule-based responder for trivial prompts.
 
 This is used to keep the orchestrator/Celery pipeline focused on
 heavy research or generation tasks. Greetings, small-talk, and
-basic arithmetic are answered here synchronously.
+basic arithmetic are answered here synchronously, as "tier 0" of
+the interaction pipeline (see `FastPathResponder`).
 """
 
 from __future__ import annotations
 
 import ast
+import math
 import operator
 import re
-from typing import Callable, Optional
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
 
-
-GREETING_KEYWORDS = {
-    "hi",
-    "hello",
-    "hey",
-    "hola",
-    "yo",
-    "sup",
-}
+from .. import config
+from .intent_router import intent_router
 
 
 def try_simple_response(prompt: str) -> Optional[str]:
     """
     Attempt to generate a fast local response without invoking the orchestrator.
 
+    Runs every rule in `ALL_RULES` order; see `FastPathResponder` for the
+    configurable tier-0 stage used by the API.
+
     Returns:
         A string response if the prompt is classified as trivial, otherwise None.
     """
 
     stripped = prompt.strip()
     normalized = stripped.lower()
+    for name in ALL_RULES:
+        answer = RULES[name](stripped, normalized)
+        if answer is not None:
+            return answer
+    return None
 
+
+# ── Rules ─────────────────────────────────────────────────────────────────────
+# Each rule receives (stripped, normalized) and returns an answer or None.
+
+def _rule_empty(stripped: str, normalized: str) -> Optional[str]:
     if not stripped:
         return "Please provide a prompt so I know how to assist."
+    return None
+
 
-    if normalized in GREETING_KEYWORDS or normalized.startswith(("hi ", "hello ", "hey ")):
+def _rule_greeting(stripped: str, normalized: str) -> Optional[str]:
+    # Only short greetings: "hello, make a 3D model of a helmet" must reach the brain.
+    if intent_router.route(normalized).get("greeting") == 0 and len(normalized.split()) <= 4:
         return "Hello! I'm MILES. Ask me something more substantial and I'll bring in the specialists."
+    return None
+
 
-    if "your name" in normalized:
+def _rule_name(stripped: str, normalized: str) -> Optional[str]:
+    # Same guard as greetings: "what is your name and can you build me a car" must reach the brain.
+    if "ask_name" in intent_router.route(normalized) and len(normalized.split()) <= 6:
         return "I'm MILES – the Multimodal Intelligent Assistant orchestrating the specialists."
+    return None
+
 
+def _rule_math(stripped: str, normalized: str) -> Optional[str]:
     if _looks_like_math(normalized):
         try:
             return f"The answer is { _safe_eval_math(stripped) }."
-        except ValueError:
+        except (ValueError, SyntaxError, ZeroDivisionError, OverflowError, RecursionError, MemoryError):
             return "I tried to compute that, but the expression wasn't recognized."
+    return None
+
 
+def _rule_short_question(stripped: str, normalized: str) -> Optional[str]:
     if len(stripped) <= 20 and normalized.endswith("?"):
         return "That's a quick question. Could you add more detail so I know whether to research it?"
+    return None
 
+
+def _rule_short_prompt(stripped: str, normalized: str) -> Optional[str]:
     if len(stripped.split()) <= 3 and not normalized.endswith("?"):
         return "Could you elaborate a bit more? I want to ensure I send the right specialists."
-
     return None
 
 
-HEAVY_KEYWORDS = {
-    "research",
-    "deep dive",
-    "analyze",
-    "analysis",
-    "report",
-    "whitepaper",
-    "citation",
-    "compare",
-    "survey",
-    "comprehensive",
-    "study",
-    "pipeline",
-    "architecture",
-    "implementation details",
-    "evaluation",
-    "benchmark",
+RULES: Dict[str, Callable[[str, str], Optional[str]]] = {
+    "empty": _rule_empty,
+    "greeting": _rule_greeting,
+    "name": _rule_name,
+    "math": _rule_math,
+    "short_question": _rule_short_question,
+    "short_prompt": _rule_short_prompt,
 }
 
+ALL_RULES: Tuple[str, ...] = tuple(RULES)
+
+
+class FastPathResponder:
+    """
+    Tier-0 stage that answers trivial prompts before any brain is consulted.
+
+    The enabled rules (and their order) come from config. Prompts that look
+    like heavy research are never answered here. Counters show how much
+    traffic the fast path absorbs.
+    """
+
+    def __init__(self, rules: Sequence[str]):
+        unknown = [name for name in rules if name not in RULES]
+        if unknown:
+            raise ValueError(f"Unknown fast-path rules: {unknown}")
+        self.rules = tuple(rules)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bypassed_heavy = 0
+        self.answered_by_rule: Dict[str, int] = {name: 0 for name in self.rules}
+
+    def respond(self, prompt: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns (rule_name, answer) if a rule answers the prompt, otherwise None.
+        """
+
+        stripped = prompt.strip()
+        normalized = stripped.lower()
+
+        with self._lock:
+            self.requests += 1
+
+        if stripped and needs_deep_research(normalized):
+            with self._lock:
+                self.bypassed_heavy += 1
+            return None
+
+        for name in self.rules:
+            answer = RULES[name](stripped, normalized)
+            if answer is not None:
+                with self._lock:
+                    self.answered_by_rule[name] += 1
+                return name, answer
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            answered = sum(self.answered_by_rule.values())
+            return {
+                "rules": list(self.rules),
+                "requests": self.requests,
+                "answered": answered,
+                "absorbed_share": round(answered / self.requests, 4) if self.requests else 0.0,
+                "bypassed_heavy": self.bypassed_heavy,
+                "answered_by_rule": dict(self.answered_by_rule),
+            }
+
 
 def needs_deep_research(prompt: str) -> bool:
     """
     Determine whether a prompt should be routed to the full Orchestrator/worker pipeline.
+
+    The "deep_research" phrases live in config.INTENT_RULES.
     """
 
-    normalized = prompt.lower()
-    return any(keyword in normalized for keyword in HEAVY_KEYWORDS)
+    return intent_router.needs_deep_research(prompt)
 
 
 MATH_PATTERN = re.compile(r"^[\d\.\s\+\-\*\/\(\)]+$")
@@ -110,18 +184,45 @@ def _safe_eval_math(expression: str) -> float:
     Safely evaluate a basic arithmetic expression using the AST.
     """
 
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise ValueError("Expression too long")
     node = ast.parse(expression, mode="eval")
     return _eval(node.body)
 
 
+# Longest expression parsed at all; the parser and `_eval` recurse once per
+# operator, so "1+1+...+1" or "------1" must not reach them unbounded.
+MAX_EXPRESSION_CHARS = 200
+
+# Largest integer result (in bits, about 1200 digits) the evaluator will build.
+# Each Pow/Mult is checked before it runs, so nested towers such as
+# "(((9**99)**99)**99)**99" are refused instead of stalling the event loop.
+MAX_RESULT_BITS = 4096
+
+
+def _check_result_size(op: ast.operator, left: float, right: float) -> None:
+    # Floats overflow (OverflowError) on their own; only exact ints can grow without bound.
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return
+    if isinstance(op, ast.Pow):
+        if right > 0 and abs(left) > 1 and right * math.log2(abs(left)) > MAX_RESULT_BITS:
+            raise ValueError("Result too large")
+    elif isinstance(op, ast.Mult):
+        if left.bit_length() + right.bit_length() > MAX_RESULT_BITS:
+            raise ValueError("Result too large")
+
+
 def _eval(node: ast.AST) -> float:
-    if isinstance(node, ast.Num):  # type: ignore[attr-defined]
-        return node.n  # type: ignore[return-value]
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
     if isinstance(node, ast.BinOp) and type(node.op) in _OPS:
-        return _OPS[type(node.op)](_eval(node.left), _eval(node.right))
+        left, right = _eval(node.left), _eval(node.right)
+        _check_result_size(node.op, left, right)
+        return _OPS[type(node.op)](left, right)
     if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
         value = _eval(node.operand)
         return value if isinstance(node.op, ast.UAdd) else -value
     raise ValueError("Unsupported expression")
 
 
+fast_path = FastPathResponder(config.FAST_PATH_RULES)
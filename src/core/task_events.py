@@ -0,0 +1,135 @@
+"""
+Task Event Bus - Push-based task progress
+
+Workers publish a small JSON event to a Redis pub/sub channel whenever a
+task changes state. The API process runs ONE listener on that channel and
+fans each event out to every SSE client watching that task, so Redis load
+stays flat no matter how many browser tabs are open.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+READY_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+_publisher: Optional[redis.Redis] = None
+
+
+def publish_task_event(task_id: str, status: str, **extra: Any) -> None:
+    """
+    Publish a task state change. Called from the Celery worker processes.
+
+    Publishing is best-effort: a Redis hiccup must never fail the task itself,
+    SSE clients re-sync from the result backend on their own.
+    """
+
+    global _publisher
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(config.TASK_EVENTS_REDIS_URL)
+        payload = {"task_id": task_id, "status": status}
+        payload.update(extra)
+        _publisher.publish(config.TASK_EVENTS_CHANNEL, json.dumps(payload))
+    except Exception as exc:
+        logger.warning("Could not publish event for %s: %s", task_id, exc)
+
+
+class TaskEventHub:
+    """
+    Single Redis pub/sub listener that fans task events out to local subscribers.
+
+    Each SSE connection gets its own asyncio.Queue registered against the
+    task IDs it is watching. The hub never touches the result backend; it only
+    relays what the workers publish.
+    """
+
+    def __init__(self, redis_url: str, channel: str):
+        self.redis_url = redis_url
+        self.channel = channel
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None and not self._listener.done()
+
+    async def start(self) -> None:
+        """Spawn the background listener. Called once from the app lifespan."""
+        if self.running:
+            return
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+
+    def subscribe(self, task_ids: Iterable[str]) -> asyncio.Queue:
+        """Register a new queue that receives events for all given task IDs."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for task_id in task_ids:
+            self._subscribers[task_id].add(queue)
+        return queue
+
+    def unsubscribe(self, task_ids: Iterable[str], queue: asyncio.Queue) -> None:
+        for task_id in task_ids:
+            watchers = self._subscribers.get(task_id)
+            if not watchers:
+                continue
+            watchers.discard(queue)
+            if not watchers:
+                del self._subscribers[task_id]
+
+    def _dispatch(self, raw: Any) -> None:
+        try:
+            event = json.loads(raw)
+            task_id = event["task_id"]
+        except (ValueError, KeyError, TypeError):
+            return
+        for queue in self._subscribers.get(task_id, ()):
+            queue.put_nowait(event)
+
+    async def _listen(self) -> None:
+        backoff = 1.0
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info("Listening for task events on %r", self.channel)
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Listener error: %s (retrying in %.0fs)", exc, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+
+
+task_event_hub = TaskEventHub(config.TASK_EVENTS_REDIS_URL, config.TASK_EVENTS_CHANNEL)
@@ -0,0 +1,344 @@
+"""
+Request Tracing (W3C trace context, OTLP-JSON file sink)
+
+Every /interact call opens a root span; the trace context rides along in a
+`traceparent` Celery message header (see src/workers/signals.py), so the
+worker's task span and every service call inside it (SDXL, rembg, upload,
+ComfyUI, ...) join the same trace.
+
+Finished spans are batched by a background thread and appended to one
+JSONL file per process under TRACE_DIR. Each line is an OTLP/JSON
+`ExportTraceServiceRequest`, the format the OpenTelemetry Collector's file
+exporter writes, so the files can be replayed into any OTLP backend.
+
+Offline waterfall / critical path:
+
+    python -m src.core.tracing                 # list recent traces
+    python -m src.core.tracing <trace_id>      # waterfall, critical path marked *
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("miles_span", default=None)
+
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Return (trace_id, span_id) from a W3C `traceparent` header, or None if malformed."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.message = ""
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.message} if self.message else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        out.append({"key": key, "value": encoded})
+    return out
+
+
+class Tracer:
+    """
+    Context-propagating span recorder with a non-blocking file exporter.
+    """
+
+    def __init__(self, enabled: bool, trace_dir: Path, service_name: str, flush_seconds: float):
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.service_name = service_name
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.SimpleQueue[Span]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    # ── Context ──────────────────────────────────────────────────────────────
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current.get()
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current.get()
+        return span.traceparent if span is not None else None
+
+    def start_span(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Span:
+        """
+        Start a span under `traceparent` (remote parent), else under the
+        current span, else as the root of a new trace. Does not activate it.
+        """
+
+        remote = parse_traceparent(traceparent)
+        if remote is not None:
+            trace_id, parent_id = remote
+        else:
+            parent = _current.get()
+            trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+            parent_id = parent.span_id if parent is not None else None
+        return Span(name, trace_id, parent_id, attributes)
+
+    @staticmethod
+    def activate(span: Span) -> contextvars.Token:
+        return _current.set(span)
+
+    @staticmethod
+    def deactivate(token: contextvars.Token) -> None:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Token from another Context, e.g. a streaming generator closed by
+            # the server on client disconnect; that context is discarded anyway.
+            pass
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = STATUS_ERROR
+            span.message = f"{type(error).__name__}: {error}"
+        elif span.status == STATUS_UNSET:
+            span.status = STATUS_OK
+        if self.enabled:
+            self._export(span)
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Record a child span around a block and make it current inside it.
+
+            with tracer.span("sdxl", prompt_chars=len(prompt)) as span:
+                ...
+        """
+
+        span = self.start_span(name, traceparent, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            self.deactivate(token)
+            self.end_span(span, exc)
+            raise
+        self.deactivate(token)
+        self.end_span(span)
+
+    # ── Export ───────────────────────────────────────────────────────────────
+    def _export(self, span: Span) -> None:
+        if os.getpid() != self._pid:
+            # Forked (Celery prefork child): the parent's writer thread did not survive.
+            self._pid = os.getpid()
+            self._queue = queue.SimpleQueue()
+            self._writer = None
+        self._queue.put(span)
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="trace-export", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        pid = self._pid
+        while pid == os.getpid():
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all queued spans as one OTLP/JSON line."""
+        spans: List[Span] = []
+        while True:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not spans:
+            return
+
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({
+                    "service.name": self.service_name,
+                    "process.pid": os.getpid(),
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": "miles"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }, separators=(",", ":"))
+        try:
+            self.trace_dir.mkdir(parents=True, exist_ok=True)
+            path = self.trace_dir / f"spans-{self.service_name}-{os.getpid()}.jsonl"
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as exc:
+            logger.warning("Could not write %d spans: %s", len(spans), exc)
+
+
+# ── Offline analysis ─────────────────────────────────────────────────────────
+
+def load_spans(trace_dir: Path) -> Dict[str, List[Dict[str, Any]]]:
+    """Read every span file in `trace_dir`, grouped by trace ID."""
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for path in sorted(trace_dir.glob("spans-*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crashed process
+                for resource_spans in request.get("resourceSpans", []):
+                    service = next(
+                        (a["value"].get("stringValue") for a in resource_spans["resource"]["attributes"]
+                         if a["key"] == "service.name"),
+                        "?",
+                    )
+                    for scope in resource_spans.get("scopeSpans", []):
+                        for span in scope.get("spans", []):
+                            span["service"] = service
+                            traces.setdefault(span["traceId"], []).append(span)
+    return traces
+
+
+def _children(spans: List[Dict[str, Any]]) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    # Spans whose parent was never recorded are treated as roots.
+    ids = {s["spanId"] for s in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans:
+        parent = span.get("parentSpanId")
+        children.setdefault(parent if parent in ids else None, []).append(span)
+    for level in children.values():
+        level.sort(key=lambda s: int(s["startTimeUnixNano"]))
+    return children
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[str]:
+    """
+    Span IDs on the critical path: from the root, repeatedly follow the child
+    that finishes last (the one the end of the request actually waited on).
+    """
+
+    children = _children(spans)
+    path: List[str] = []
+    level = children.get(None, [])
+    while level:
+        last = max(level, key=lambda s: int(s["endTimeUnixNano"]))
+        path.append(last["spanId"])
+        level = children.get(last["spanId"], [])
+    return path
+
+
+def format_waterfall(spans: List[Dict[str, Any]]) -> str:
+    children = _children(spans)
+    t0 = min(int(s["startTimeUnixNano"]) for s in spans)
+    on_path = set(critical_path(spans))
+    lines: List[str] = []
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for span in children.get(parent, []):
+            start = (int(span["startTimeUnixNano"]) - t0) / 1e9
+            duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+            mark = "*" if span["spanId"] in on_path else " "
+            error = "  ERROR" if span.get("status", {}).get("code") == STATUS_ERROR else ""
+            lines.append(
+                f"{mark} {start:9.3f}s {duration:9.3f}s  {'  ' * depth}{span['name']}  [{span['service']}]{error}"
+            )
+            walk(span["spanId"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+tracer = Tracer(
+    enabled=config.TRACING_ENABLED,
+    trace_dir=config.TRACE_DIR,
+    service_name="miles-api",
+    flush_seconds=config.TRACE_FLUSH_SECONDS,
+)
+atexit.register(tracer.flush)
+
+
+if __name__ == "__main__":
+    all_traces = load_spans(config.TRACE_DIR)
+    if len(sys.argv) > 1:
+        trace = all_traces.get(sys.argv[1])
+        print(format_waterfall(trace) if trace else f"No spans for trace {sys.argv[1]} in {config.TRACE_DIR}")
+    else:
+        recent = sorted(all_traces.items(), key=lambda kv: -min(int(s["startTimeUnixNano"]) for s in kv[1]))
+        for trace_id, trace in recent[:20]:
+            root = min(trace, key=lambda s: int(s["startTimeUnixNano"]))
+            end = max(int(s["endTimeUnixNano"]) for s in trace)
+            total = (end - int(root["startTimeUnixNano"])) / 1e9
+            print(f"{trace_id}  {total:9.3f}s  {len(trace):3d} spans  {root['name']}")
@@ -5,28 +5,46 @@ This file starts the FastAPI server.
 
 from __future__ import annotations
 
+import asyncio
+import logging
 from pathlib import Path
 
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
 from contextlib import asynccontextmanager
 from src.api import endpoints as api_router
 from src.api import hologram_websocket
 
+from src.core.logs import setup_logging
+from src.core.memory import sessions
+from src.core.metrics import metrics
+from src.core.task_events import task_event_hub
+from src.orchestrator.orchestrator import orchestrator_registry
 from src.services.sf3d_service import sf3d_service
 
+setup_logging("miles-api")
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("[MILES] Starting System v2.0 (STRICT CHAT MODE)...")
+    logger.info("Starting System v2.0 (STRICT CHAT MODE)...")
     sf3d_service.start_service()
     # Start UDP → WebSocket bridge for hand tracker (port 5052)
     await hologram_websocket.start_udp_listener()
+    # Single Redis subscriber that pushes task progress to all SSE clients
+    await task_event_hub.start()
+    # Build the brain once; every request reuses it (LOCAL: model preloaded and kept warm)
+    await orchestrator_registry.start()
     yield
     # Shutdown
-    print("[MILES] Shutting Down...")
+    logger.info("Shutting Down...")
+    await task_event_hub.stop()
+    await orchestrator_registry.close()
+    # Snapshot every hot conversation session
+    await asyncio.to_thread(sessions.close)
     sf3d_service.stop_service()
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -61,6 +79,17 @@ async def root() -> dict[str, str]:
     return {"message": "MILES Orchestrator is running."}
 
 
+@app.get("/metrics", include_in_schema=False, response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape target: stage latencies, counters and gauges of the API
+    and all workers (aggregated through Redis).
+    """
+
+    body = await asyncio.to_thread(metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/playground", include_in_schema=False, summary="Chat UI")
 async def playground() -> RedirectResponse:
     """
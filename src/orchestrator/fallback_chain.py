@@ -0,0 +1,343 @@
+"""
+Brain Fallback Chain
+
+`FallbackOrchestrator` (BRAIN_MODE = "CHAIN") wraps several brains, by default
+Gemini → Ollama → DEMO, and answers each prompt with the first one that works.
+
+Every member has:
+- a per-call deadline (config.BRAIN_DEADLINE_SECONDS); a brain that misses it
+  counts as failed and the next one is tried,
+- a circuit breaker: after BRAIN_BREAKER_FAILURES consecutive failures the
+  brain is skipped outright (no timeout paid) until BRAIN_BREAKER_RESET_SECONDS
+  have passed, then a single probe request decides whether it closes again,
+- a health score (EWMA latency of its successful calls relative to its
+  deadline); a slow brain is tried after the healthy ones that follow it,
+  except the last member, which always stays the last resort. The slow mark
+  lapses after BRAIN_BREAKER_RESET_SECONDS without a call so it is re-measured.
+
+Brains swallow their own transport errors and return a plan tagged
+`tier="fallback"`; the chain treats those plans as failures too.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+
+from .. import config
+from ..core.metrics import metrics
+from ..core.schemas import OrchestratorPlan
+from .orchestrator import OrchestratorBase, _build_orchestrator
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+UNAVAILABLE_RESPONSE = "I'm having trouble connecting right now. Please try again."
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (closed → open → half-open → closed).
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go through; an expired open circuit admits one probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe whose call ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class BrainHealth:
+    """
+    One chain member: the brain, its breaker, deadline and latency statistics.
+    """
+
+    def __init__(self, name: str, brain: OrchestratorBase, deadline: float):
+        self.name = name
+        self.brain = brain
+        self.deadline = deadline
+        self.breaker = CircuitBreaker(config.BRAIN_BREAKER_FAILURES, config.BRAIN_BREAKER_RESET_SECONDS)
+        self.latency: Optional[float] = None  # EWMA seconds of successful calls
+        self._measured_at = 0.0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def score(self) -> float:
+        """EWMA latency as a fraction of the deadline (0 = instant, 1 = at the deadline)."""
+        if self.latency is None:
+            return 0.0
+        return self.latency / self.deadline
+
+    @property
+    def slow(self) -> bool:
+        recent = time.monotonic() - self._measured_at < config.BRAIN_BREAKER_RESET_SECONDS
+        return recent and self.score > config.BRAIN_SLOW_FRACTION
+
+    def record(self, elapsed: float, ok: bool, outcome: str) -> None:
+        if ok:
+            # Failures are the breaker's business; latency tracks working calls only.
+            alpha = config.BRAIN_HEALTH_EWMA_ALPHA
+            self.latency = elapsed if self.latency is None else alpha * elapsed + (1 - alpha) * self.latency
+            self._measured_at = time.monotonic()
+            self.successes += 1
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+            if self.breaker.state == OPEN:
+                logger.warning("Brain %s circuit open after %d failures (%s)", self.name,
+                               self.breaker.consecutive_failures, outcome)
+        metrics.inc("miles_brain_calls_total", brain=self.name, outcome=outcome)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "brain": type(self.brain).__name__,
+            "state": self.breaker.state,
+            "deadline_seconds": self.deadline,
+            "latency_ewma_seconds": None if self.latency is None else round(self.latency, 4),
+            "score": round(self.score, 4),
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.breaker.consecutive_failures,
+        }
+
+
+class FallbackOrchestrator(OrchestratorBase):
+    """
+    Composite brain trying each member in health order until one answers.
+    """
+
+    def __init__(self, modes: List[str]):
+        self.members: List[BrainHealth] = []
+        for mode in modes:
+            if mode == "CHAIN":
+                raise ValueError("BRAIN_CHAIN cannot contain CHAIN")
+            try:
+                brain = _build_orchestrator(mode)
+            except Exception as exc:
+                logger.error("Brain %s left out of the fallback chain: %s", mode, exc)
+                continue
+            # The chain routes pre-flight prompts once, before choosing a brain.
+            brain.preflight_enabled = False
+            deadline = config.BRAIN_DEADLINE_SECONDS.get(mode, config.BRAIN_DEFAULT_DEADLINE_SECONDS)
+            self.members.append(BrainHealth(mode, brain, deadline))
+        if not self.members:
+            raise ValueError(f"No brain in BRAIN_CHAIN could be built: {modes}")
+        self._executor = ThreadPoolExecutor(max_workers=len(self.members) * 4, thread_name_prefix="brain-chain")
+        logger.info("Brain chain: %s", " → ".join(member.name for member in self.members))
+
+    async def astart(self) -> None:
+        await asyncio.gather(*(member.brain.astart() for member in self.members))
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(member.brain.aclose() for member in self.members))
+        self._executor.shutdown(wait=False)
+
+    def health(self) -> List[Dict[str, Any]]:
+        return [dict(name=member.name, **member.snapshot()) for member in self.members]
+
+    def _candidates(self) -> Iterator[BrainHealth]:
+        """
+        Healthy members in chain order, then slow ones, then the last resort;
+        open circuits are skipped. Lazy, so a half-open probe is only claimed
+        by the brain actually called.
+        """
+        *ranked, last = self.members
+        for member in sorted(ranked, key=lambda member: member.slow) + [last]:
+            if member.breaker.allow():
+                yield member
+            else:
+                metrics.inc("miles_brain_calls_total", brain=member.name, outcome="circuit_open")
+
+    def _accept(self, member: BrainHealth, plan: OrchestratorPlan) -> OrchestratorPlan:
+        if member.name == "DEMO":
+            # Keyword heuristics, not a model decision: keep it out of the routing log.
+            plan.tier = "fallback"
+        return plan
+
+    @staticmethod
+    def _unavailable_plan() -> OrchestratorPlan:
+        logger.error("Every brain in the fallback chain failed or is open")
+        return OrchestratorPlan(direct_response=UNAVAILABLE_RESPONSE, tasks=[], tier="fallback")
+
+    # ── Planning ────────────────────────────────────────────────────────────
+    def decompose_task(self, user_prompt: str) -> OrchestratorPlan:
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            return plan
+
+        for member in self._candidates():
+            started = time.perf_counter()
+            future = self._executor.submit(member.brain.decompose_task, user_prompt)
+            try:
+                plan = future.result(timeout=member.deadline)
+            except FutureTimeoutError:
+                member.record(time.perf_counter() - started, False, "timeout")
+                continue
+            except Exception as exc:
+                logger.warning("Brain %s failed: %s", member.name, exc)
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            if plan.tier == "fallback":
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            member.record(time.perf_counter() - started, True, "ok")
+            return self._accept(member, plan)
+        return self._unavailable_plan()
+
+    async def adecompose_task(self, user_prompt: str) -> OrchestratorPlan:
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            return plan
+
+        for member in self._candidates():
+            started = time.perf_counter()
+            try:
+                plan = await asyncio.wait_for(member.brain.adecompose_task(user_prompt), member.deadline)
+            except asyncio.TimeoutError:
+                member.record(time.perf_counter() - started, False, "timeout")
+                continue
+            except Exception as exc:
+                logger.warning("Brain %s failed: %s", member.name, exc)
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            except BaseException:
+                # Cancelled (client went away): no verdict on the brain, but free its probe.
+                member.breaker.release_probe()
+                raise
+            if plan.tier == "fallback":
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            member.record(time.perf_counter() - started, True, "ok")
+            return self._accept(member, plan)
+        return self._unavailable_plan()
+
+    async def astream_decompose(self, user_prompt: str) -> AsyncIterator[Union[str, OrchestratorPlan]]:
+        """
+        Stream from the first member that produces output before its deadline.
+        Once text has been shown the chain is committed to that brain.
+        """
+
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            yield plan
+            return
+
+        for member in self._candidates():
+            started = time.perf_counter()
+            stream = member.brain.astream_decompose(user_prompt)
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), member.deadline)
+            except asyncio.TimeoutError:
+                member.record(time.perf_counter() - started, False, "timeout")
+                await stream.aclose()
+                continue
+            except StopAsyncIteration:
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            except Exception as exc:
+                logger.warning("Brain %s failed: %s", member.name, exc)
+                member.record(time.perf_counter() - started, False, "error")
+                await stream.aclose()
+                continue
+            except BaseException:
+                member.breaker.release_probe()
+                raise
+
+            if isinstance(first, OrchestratorPlan) and first.tier == "fallback":
+                member.record(time.perf_counter() - started, False, "error")
+                await stream.aclose()
+                continue
+            member.record(time.perf_counter() - started, True, "ok")
+
+            if isinstance(first, OrchestratorPlan):
+                yield self._accept(member, first)
+                await stream.aclose()
+                return
+            yield first
+            async for item in stream:
+                yield self._accept(member, item) if isinstance(item, OrchestratorPlan) else item
+            return
+
+        yield self._unavailable_plan()
+
+    # ── Direct answers ──────────────────────────────────────────────────────
+    def answer_prompt(self, user_prompt: str) -> str:
+        for member in self._candidates():
+            started = time.perf_counter()
+            future = self._executor.submit(member.brain.answer_prompt, user_prompt)
+            try:
+                answer = future.result(timeout=member.deadline)
+            except FutureTimeoutError:
+                member.record(time.perf_counter() - started, False, "timeout")
+                continue
+            except Exception as exc:
+                logger.warning("Brain %s failed: %s", member.name, exc)
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            member.record(time.perf_counter() - started, True, "ok")
+            return answer
+        return UNAVAILABLE_RESPONSE
+
+    async def aanswer_prompt(self, user_prompt: str) -> str:
+        for member in self._candidates():
+            started = time.perf_counter()
+            try:
+                answer = await asyncio.wait_for(member.brain.aanswer_prompt(user_prompt), member.deadline)
+            except asyncio.TimeoutError:
+                member.record(time.perf_counter() - started, False, "timeout")
+                continue
+            except Exception as exc:
+                logger.warning("Brain %s failed: %s", member.name, exc)
+                member.record(time.perf_counter() - started, False, "error")
+                continue
+            except BaseException:
+                member.breaker.release_probe()
+                raise
+            member.record(time.perf_counter() - started, True, "ok")
+            return answer
+        return UNAVAILABLE_RESPONSE
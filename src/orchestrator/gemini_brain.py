@@ -7,15 +7,21 @@ History is NOT sent to the JSON planner (avoids re-running old plans).
 
 from __future__ import annotations
 
+import asyncio
 import json
-import re
-from typing import Any
+import logging
+from typing import Any, AsyncIterator, Optional, Union
 
 import google.generativeai as genai
 
 from .orchestrator import OrchestratorBase
+from .streaming import DirectResponseExtractor
+from ..core.cache import PlanCache, plan_cache
+from ..core.key_pool import KeyPool, configured_gemini_keys, gemini_key_pool, gemini_model
+from ..core.semantic_cache import get_semantic_cache
 from ..core.schemas import OrchestratorPlan
-import time
+
+logger = logging.getLogger(__name__)
 
 
 ORCHESTRATOR_SYSTEM_PROMPT = """
@@ -48,145 +54,186 @@ class GeminiOrchestrator(OrchestratorBase):
     def __init__(self, api_keys: list[str] = None, model_name: str = "models/gemini-flash-latest"):
         from .. import config
 
-        keys = []
+        # Keys come from the process-wide pool shared with the RAG worker (Redis-backed
+        # budgets and cooldowns); explicit keys get their own pool over the same state.
         if api_keys:
-            keys.extend(api_keys)
-        if config.GEMINI_API_KEYS:
-            keys.extend(config.GEMINI_API_KEYS)
-        if config.GEMINI_API_KEY:
-            keys.append(config.GEMINI_API_KEY)
+            self.key_pool = KeyPool(
+                name="gemini",
+                keys=configured_gemini_keys(api_keys),
+                redis_url=config.GEMINI_KEY_POOL_REDIS_URL,
+                requests_per_minute=config.GEMINI_KEY_REQUESTS_PER_MINUTE,
+                burst=config.GEMINI_KEY_BURST,
+                cooldown_seconds=config.GEMINI_KEY_COOLDOWN_SECONDS,
+            )
+        else:
+            self.key_pool = gemini_key_pool
+        self.api_keys = self.key_pool.keys
 
-        self.api_keys = list(dict.fromkeys(keys))
-        self.api_keys = [k for k in self.api_keys if k and "YOUR_GEMINI" not in k]
+        self.model_name = model_name
+        # Process-wide, so cached answers survive brain reloads.
+        self.plan_cache = plan_cache
+        self.semantic_cache = get_semantic_cache(model_name)
+        logger.info("Brain Online (v3.1): %s (%d keys)", self.model_name, len(self.api_keys))
 
-        if not self.api_keys:
-            # Fallback if no keys provided so test doesn't crash on init without API keys.
-            self.api_keys = ["YOUR_GEMINI_API_KEY_GOES_HERE"]
+    def _model(self, api_key: str):
+        return gemini_model(api_key, self.model_name, ORCHESTRATOR_SYSTEM_PROMPT)
 
-        self.current_key_index = 0
-        self.model_name = model_name
-        self._configure_brain()
-
-    def _configure_brain(self):
-        current_key = self.api_keys[self.current_key_index]
-        genai.configure(api_key=current_key)
-        self.model = genai.GenerativeModel(
-            self.model_name,
-            system_instruction=ORCHESTRATOR_SYSTEM_PROMPT
-        )
-        print(f"[MILES] Brain Online (v3.1): {self.model_name} (Key {self.current_key_index})")
-
-    def _rotate_key(self) -> bool:
-        if len(self.api_keys) <= 1:
-            return False
-        time.sleep(2)
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        self._configure_brain()
-        return True
-
-    # ── Deterministic 3D pre-flight ──────────────────────────────────────────
-    _3D_VERBS = {"generate", "make", "create", "build", "produce", "render"}
-    _3D_NOUNS = {"3d", "model", "glb", "mesh", "hologram"}
-
-    def _is_3d_request(self, prompt: str) -> bool:
-        words = set(prompt.lower().split())
-        return bool(words & self._3D_VERBS) and bool(words & self._3D_NOUNS)
-
-    def _extract_object_name(self, prompt: str) -> str:
-        lower = prompt.lower()
-        m = re.search(r'\bof\s+(?:a\s+|an\s+)?(.+)', lower)
-        if m:
-            obj = m.group(1).strip()
-        else:
-            obj = lower
-            for word in ["generate", "make", "create", "build", "produce", "render",
-                         "3d model", "3d", "model", "glb", "me", "a", "an", "the"]:
-                obj = obj.replace(word, " ")
-            obj = " ".join(obj.split())
-        return obj.rstrip(".,!?") or prompt
-
-    # ── Deterministic RAG pre-flight ─────────────────────────────────────────
-    # Only explicit search phrasing triggers RAG — not just the word "research" alone
-    _RAG_PATTERNS = [
-        r'\bsearch\s+(for|about|on)\b',
-        r'\blook\s+up\b',
-        r'\bfind\s+(me\s+)?(news|info|information|latest)\b',
-        r'\bconduct\s+a?\s*research\b',
-        r'\bdo\s+a?\s*research\b',
-        r'\bweb\s+search\b',
-        r'\blatest\s+news\b',
-    ]
-
-    def _is_rag_request(self, prompt: str) -> bool:
-        lower = prompt.lower()
-        return any(re.search(pat, lower) for pat in self._RAG_PATTERNS)
-
-    def _extract_rag_query(self, prompt: str) -> str:
-        """Strip command words from RAG prompt to get the search query."""
-        lower = prompt.lower()
-        # Remove all trigger phrases
-        for pat in [r'conduct\s+a?\s*research\s+(on\s+)?', r'do\s+a?\s*research\s+(on\s+)?',
-                    r'search\s+(for|about|on)\s+', r'look\s+up\s+', r'find\s+(me\s+)?',
-                    r'web\s+search\s+(for\s+)?', r'latest\s+news\s+(on\s+|about\s+)?']:
-            lower = re.sub(pat, '', lower)
-        return lower.strip() or prompt
+    async def aclose(self) -> None:
+        if self.semantic_cache is not None:
+            await asyncio.to_thread(self.semantic_cache.save)
 
     # ── Main entry point ─────────────────────────────────────────────────────
     def decompose_task(self, user_prompt: str) -> OrchestratorPlan:
-        print(f"[MILES] Received: '{user_prompt}'")
-
-        # 1. Deterministic 3D route — no LLM needed
-        if self._is_3d_request(user_prompt):
-            obj = self._extract_object_name(user_prompt)
-            print(f"[MILES] → 3D route: '{obj}'")
-            return OrchestratorPlan(
-                direct_response=None,
-                tasks=[{"worker_name": "3D_Generator", "prompt": obj}]
-            )
-
-        # 2. Deterministic RAG route — explicit search command only
-        if self._is_rag_request(user_prompt):
-            query = self._extract_rag_query(user_prompt)
-            print(f"[MILES] → RAG route: '{query}'")
-            return OrchestratorPlan(
-                direct_response=None,
-                tasks=[{"worker_name": "RAG_Search", "prompt": query}]
-            )
-
-        # 3. Everything else → Gemini direct chat (JSON mode, NO history to avoid re-planning)
-        print(f"[MILES] → Direct chat")
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            return plan
+
+        # 3. Everything else → Gemini direct chat (JSON mode, NO history to avoid re-planning).
+        #    Without history the answer depends only on the prompt, so it is cacheable.
+        cache_key = PlanCache.make_key(user_prompt, self.model_name)
+        cached = self._cached_plan(user_prompt, cache_key)
+        if cached is not None:
+            return cached
+
+        logger.debug("→ Direct chat")
         raw = self._call_gemini_json(user_prompt)
+        return self._plan_from_raw(raw, user_prompt, cache_key)
+
+    async def adecompose_task(self, user_prompt: str) -> OrchestratorPlan:
+        """Native async path: same routing, but the Gemini call never blocks the loop."""
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            return plan
+
+        cache_key = PlanCache.make_key(user_prompt, self.model_name)
+        cached = self._cached_plan(user_prompt, cache_key)
+        if cached is not None:
+            return cached
+
+        logger.debug("→ Direct chat (async)")
+        raw = await self._acall_gemini_json(user_prompt)
+        return self._plan_from_raw(raw, user_prompt, cache_key)
+
+    async def astream_decompose(self, user_prompt: str) -> AsyncIterator[Union[str, OrchestratorPlan]]:
+        """Stream the direct-chat answer token by token using Gemini's streaming API."""
+        plan = self._preflight(user_prompt)
+        if plan is None:
+            cache_key = PlanCache.make_key(user_prompt, self.model_name)
+            plan = self._cached_plan(user_prompt, cache_key)
+
+        if plan is not None:
+            if plan.direct_response:
+                yield plan.direct_response
+            yield plan
+            return
+
+        logger.debug("→ Direct chat (streaming)")
+        extractor = DirectResponseExtractor()
+        try:
+            async with self.key_pool.alease() as lease:
+                chat = self._model(lease.key).start_chat(history=[])
+                response = await chat.send_message_async(
+                    f"User message: {user_prompt}",
+                    generation_config=self._json_generation_config(),
+                    stream=True,
+                )
+                async for chunk in response:
+                    delta = extractor.feed(chunk.text)
+                    if delta:
+                        yield delta
+        except Exception as e:
+            logger.warning("Gemini streaming error: %s", e)
+            if not extractor.text:
+                # Nothing shown yet: fall back to the non-streaming path (next healthy key).
+                plan = await self.adecompose_task(user_prompt)
+                if plan.tier == "fallback":
+                    # No leading token, so a fallback chain sees the failure and moves on.
+                    yield plan
+                    return
+                if plan.direct_response:
+                    yield plan.direct_response
+                yield plan
+                return
+            yield OrchestratorPlan(direct_response=extractor.text, tasks=[], tier="brain")
+            return
+
+        yield self._plan_from_raw(extractor.raw, user_prompt, cache_key)
+
+    def _cached_plan(self, user_prompt: str, cache_key: str) -> Optional[OrchestratorPlan]:
+        """Exact plan cache first, then the semantic (paraphrase) cache."""
+        cached = self.plan_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("→ Direct chat (cache hit)")
+            cached.tier = "plan_cache"
+            return cached
+
+        if self.semantic_cache is not None:
+            answer = self.semantic_cache.lookup(user_prompt)
+            if answer is not None:
+                logger.debug("→ Direct chat (semantic cache hit)")
+                plan = OrchestratorPlan(direct_response=answer, tasks=[], tier="semantic_cache")
+                self.plan_cache.set(cache_key, plan)
+                return plan
+        return None
+
+    def _plan_from_raw(self, raw: str | None, user_prompt: str, cache_key: str) -> OrchestratorPlan:
         if raw is None:
+            # Never cache the connection-failure reply.
             return OrchestratorPlan(
                 direct_response="I'm having trouble connecting right now. Please try again.",
-                tasks=[]
+                tasks=[],
+                tier="fallback",
             )
-        return self._parse_response(raw, user_prompt)
+        plan = self._parse_response(raw, user_prompt)
+        plan.tier = "brain"
+        self.plan_cache.set(cache_key, plan)
+        if self.semantic_cache is not None and plan.direct_response and not plan.tasks:
+            self.semantic_cache.store(user_prompt, plan.direct_response)
+        return plan
 
     def _call_gemini_json(self, user_prompt: str) -> str | None:
         """
         Call Gemini in JSON mode WITHOUT conversation history.
         History was the root cause of re-planning: Gemini saw "conduct research on X"
         in history and applied it to unrelated follow-up questions.
+        A 429 moves straight on to the next healthy key in the pool.
         """
-        for attempt in range(len(self.api_keys) + 1):
-            try:
-                # Fresh chat every time — no stale history contamination
-                chat = self.model.start_chat(history=[])
-                response = chat.send_message(
-                    f"User message: {user_prompt}",
-                    generation_config=genai.types.GenerationConfig(
-                        response_mime_type="application/json"
-                    ),
-                )
-                return response.text
-            except Exception as e:
-                is_rate = any(x in str(e) for x in ["429", "ResourceExhausted", "QuotaExceeded"])
-                if is_rate and self._rotate_key():
-                    continue
-                print(f"[MILES] Gemini error: {e}")
-                return None
-        return None
+
+        def send(api_key: str) -> str:
+            # Fresh chat every time — no stale history contamination
+            chat = self._model(api_key).start_chat(history=[])
+            response = chat.send_message(
+                f"User message: {user_prompt}",
+                generation_config=self._json_generation_config(),
+            )
+            return response.text
+
+        try:
+            return self.key_pool.call(send)
+        except Exception as e:
+            logger.error("Gemini error: %s", e)
+            return None
+
+    async def _acall_gemini_json(self, user_prompt: str) -> str | None:
+        """Async twin of `_call_gemini_json` using the SDK's async transport."""
+
+        async def send(api_key: str) -> str:
+            chat = self._model(api_key).start_chat(history=[])
+            response = await chat.send_message_async(
+                f"User message: {user_prompt}",
+                generation_config=self._json_generation_config(),
+            )
+            return response.text
+
+        try:
+            return await self.key_pool.acall(send)
+        except Exception as e:
+            logger.error("Gemini error: %s", e)
+            return None
+
+    @staticmethod
+    def _json_generation_config():
+        return genai.types.GenerationConfig(response_mime_type="application/json")
 
     def _parse_response(self, raw: str, original_prompt: str) -> OrchestratorPlan:
         try:
@@ -201,7 +248,7 @@ class GeminiOrchestrator(OrchestratorBase):
 
             # Guard: if direct_response is itself JSON, unwrap it
             if direct_response and direct_response.strip().startswith("{"):
-                print("[MILES] WARNING: direct_response contained JSON — unwrapping")
+                logger.warning("direct_response contained JSON — unwrapping")
                 try:
                     inner = json.loads(direct_response)
                     direct_response = inner.get("direct_response") or "Done."
@@ -213,16 +260,20 @@ class GeminiOrchestrator(OrchestratorBase):
             # Guard: strip any spurious 3D or RAG tasks from a direct-chat reply
             # (only keep tasks if there's no direct_response)
             if direct_response and tasks:
-                print("[MILES] WARNING: Gemini added tasks to a direct reply — stripping spurious tasks")
+                logger.warning("Gemini added tasks to a direct reply — stripping spurious tasks")
                 tasks = []
 
             return OrchestratorPlan(direct_response=direct_response, tasks=tasks)
 
         except Exception as exc:
-            print(f"[MILES] JSON parse failed: {exc}")
+            logger.warning("JSON parse failed: %s", exc)
             # Best-effort: return raw text as plain response
             return OrchestratorPlan(direct_response=raw.strip(), tasks=[])
 
     def answer_prompt(self, user_prompt: str) -> str:
         plan = self.decompose_task(user_prompt)
         return plan.direct_response or "No response generated."
+
+    async def aanswer_prompt(self, user_prompt: str) -> str:
+        plan = await self.adecompose_task(user_prompt)
+        return plan.direct_response or "No response generated."
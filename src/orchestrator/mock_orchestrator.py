@@ -10,6 +10,7 @@ from __future__ import annotations
 
 from typing import List
 
+from ..core.intent_router import intent_router
 from ..core.schemas import OrchestratorPlan, OrchestratorTask
 from .orchestrator import OrchestratorBase
 
@@ -18,8 +19,8 @@ class MockOrchestrator(OrchestratorBase):
     """
     Deterministic, rule-based orchestrator used for demos and tests.
 
-    The implementation looks for intent keywords and maps them to the
-    available specialist workers.
+    The implementation looks for intent keywords (the "demo_*" intents in
+    config.INTENT_RULES) and maps them to the available specialist workers.
     """
 
     def decompose_task(self, user_prompt: str) -> OrchestratorPlan:
@@ -28,9 +29,9 @@ class MockOrchestrator(OrchestratorBase):
         """
 
         tasks: List[OrchestratorTask] = []
-        lowered = user_prompt.lower()
+        intents = intent_router.route(user_prompt)
 
-        if any(keyword in lowered for keyword in ["research", "explain", "find", "compare"]):
+        if "demo_research" in intents:
             tasks.append(
                 OrchestratorTask(
                     worker_name="RAG_Search",
@@ -38,7 +39,7 @@ class MockOrchestrator(OrchestratorBase):
                 )
             )
 
-        if any(keyword in lowered for keyword in ["hologram", "gesture", "rotate"]):
+        if "demo_hologram" in intents:
             tasks.append(
                 OrchestratorTask(
                     worker_name="Hologram_Manipulator",
@@ -56,3 +57,9 @@ class MockOrchestrator(OrchestratorBase):
 
         return OrchestratorPlan(tasks=tasks)
 
+    def answer_prompt(self, user_prompt: str) -> str:
+        """
+        The mock brain has no language model; it only echoes the request.
+        """
+
+        return f"[DEMO] No language model attached. You asked: {user_prompt}"
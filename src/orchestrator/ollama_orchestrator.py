@@ -1,16 +1,38 @@
 """
 Ollama (Local Model) Orchestrator Implementation.
+
+The model is kept warm: it is preloaded when the brain starts (FastAPI
+lifespan), every request passes `keep_alive`, and an idle brain pings the
+model before keep_alive runs out, so LOCAL latency stays at decode speed
+instead of paying the model load after a quiet period. One pooled sync and
+one pooled async HTTP client are reused for all requests.
+
+In-flight model calls are counted, so a brain swapped out by
+`OrchestratorRegistry.reload` closes its clients only after the requests
+still using it have finished (or OLLAMA_CLOSE_GRACE_SECONDS have passed).
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
-from typing import Any, Dict
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 
+import httpx
 import ollama
 
+from .. import config
 from .orchestrator import OrchestratorBase
+from .streaming import DirectResponseExtractor
+from ..core.metrics import metrics
 from ..core.schemas import OrchestratorPlan
+from ..core.semantic_cache import get_semantic_cache
+
+logger = logging.getLogger(__name__)
 
 # This is the "System Prompt" formatted for local Ollama chat.
 OLLAMA_SYSTEM_MESSAGE: Dict[str, str] = {
@@ -38,45 +60,249 @@ class OllamaOrchestrator(OrchestratorBase):
 
     def __init__(self, model_name: str):
         self.model_name = model_name
-        print(f"[MILES] Brain Local: Using Ollama model '{self.model_name}'")
+        self.keep_alive = config.OLLAMA_KEEP_ALIVE
+        # One connection pool per client, reused by every request (sync for the
+        # thread-pool paths, async for the event-loop path).
+        limits = httpx.Limits(
+            max_connections=config.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=config.OLLAMA_MAX_CONNECTIONS,
+        )
+        self.client = ollama.Client(config.OLLAMA_HOST, timeout=config.OLLAMA_TIMEOUT_SECONDS, limits=limits)
+        self.async_client = ollama.AsyncClient(
+            config.OLLAMA_HOST, timeout=config.OLLAMA_TIMEOUT_SECONDS, limits=limits
+        )
+        # Near-duplicate questions reuse a previous answer instead of decoding again.
+        self.semantic_cache = get_semantic_cache(f"ollama-{model_name}")
+        self._last_used = time.monotonic()
+        self._keepwarm_task: Optional[asyncio.Task] = None
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        logger.info("Brain Local: Using Ollama model %r", self.model_name)
+
+    async def astart(self) -> None:
+        """
+        Load the model into memory before the first request and start the keep-warm loop.
+        """
+
+        if config.OLLAMA_PRELOAD:
+            try:
+                await asyncio.wait_for(self._warm("preload"), config.OLLAMA_PRELOAD_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                # Ollama keeps loading in the background; the first request just waits for it.
+                logger.warning("Ollama preload of %r still running after %ss", self.model_name,
+                               config.OLLAMA_PRELOAD_TIMEOUT_SECONDS)
+        if config.OLLAMA_KEEPWARM_SECONDS > 0 and self._keepwarm_task is None:
+            self._keepwarm_task = asyncio.create_task(self._keep_warm(), name="ollama-keepwarm")
+
+    async def _warm(self, reason: str) -> None:
+        """An empty chat loads the model (if needed) and resets its keep_alive timer."""
+        started = time.perf_counter()
+        try:
+            with metrics.timer("ollama_warm", reason=reason):
+                await self.async_client.chat(model=self.model_name, messages=[], keep_alive=self.keep_alive)
+        except Exception as exc:
+            logger.warning("Ollama %s of %r failed: %s", reason, self.model_name, exc)
+            return
+        self._last_used = time.monotonic()
+        elapsed = time.perf_counter() - started
+        if elapsed > 1.0:
+            logger.info("Ollama model %r loaded (%s, %.1fs)", self.model_name, reason, elapsed)
+
+    async def _keep_warm(self) -> None:
+        interval = config.OLLAMA_KEEPWARM_SECONDS
+        while True:
+            idle = time.monotonic() - self._last_used
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            await self._warm("keepwarm")
+            await asyncio.sleep(interval)
+
+    @contextmanager
+    def _call(self) -> Iterator[None]:
+        """Count one model call (sync or async) for the drain in `aclose`."""
+        with self._inflight_lock:
+            self._inflight += 1
+        self._last_used = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._inflight_lock:
+                self._inflight -= 1
 
     def decompose_task(self, user_prompt: str) -> OrchestratorPlan:
         """
         Decomposes the user's prompt using the local Ollama model.
+        Explicit 3D / search commands skip the model (shared pre-flight).
         """
 
-        print(f"Sending to Ollama: {user_prompt}")
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            return plan
+
+        logger.debug("Sending to Ollama: %r", user_prompt)
 
         try:
-            user_message = {"role": "user", "content": user_prompt}
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[OLLAMA_SYSTEM_MESSAGE, user_message],
-                format="json",  # We ask Ollama to guarantee JSON output
-            )
+            with self._call():
+                response = self.client.chat(
+                    model=self.model_name,
+                    messages=self._plan_messages(user_prompt),
+                    format="json",  # We ask Ollama to guarantee JSON output
+                    keep_alive=self.keep_alive,
+                )
+            return self._parse_plan(response)
+        except Exception as exc:  # pragma: no cover - fallback for local model issues
+            return self._fallback_plan(user_prompt, exc)
 
-            json_text = response["message"]["content"]
-            plan_data: Any = json.loads(json_text)
+    async def adecompose_task(self, user_prompt: str) -> OrchestratorPlan:
+        """
+        Async variant using `ollama.AsyncClient`, so planning never blocks the event loop.
+        """
 
-            return OrchestratorPlan(**plan_data)
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            return plan
+
+        logger.debug("Sending to Ollama (async): %r", user_prompt)
+
+        try:
+            with self._call():
+                response = await self.async_client.chat(
+                    model=self.model_name,
+                    messages=self._plan_messages(user_prompt),
+                    format="json",
+                    keep_alive=self.keep_alive,
+                )
+            return self._parse_plan(response)
         except Exception as exc:  # pragma: no cover - fallback for local model issues
-            print(f"Error communicating with Ollama or parsing JSON: {exc}")
-            return OrchestratorPlan(tasks=[{"worker_name": "RAG_Search", "prompt": user_prompt}])  # type: ignore[arg-type]
+            return self._fallback_plan(user_prompt, exc)
+
+    async def astream_decompose(self, user_prompt: str) -> AsyncIterator[Union[str, OrchestratorPlan]]:
+        """
+        Stream the plan from Ollama, surfacing `direct_response` text as it is decoded.
+        """
+
+        plan = self._preflight(user_prompt)
+        if plan is not None:
+            yield plan
+            return
+
+        logger.debug("Streaming from Ollama: %r", user_prompt)
+        extractor = DirectResponseExtractor()
+        try:
+            with self._call():
+                stream = await self.async_client.chat(
+                    model=self.model_name,
+                    messages=self._plan_messages(user_prompt),
+                    format="json",
+                    stream=True,
+                    keep_alive=self.keep_alive,
+                )
+                async for chunk in stream:
+                    delta = extractor.feed(chunk["message"]["content"])
+                    if delta:
+                        yield delta
+            plan = OrchestratorPlan(**json.loads(extractor.raw))
+        except Exception as exc:  # pragma: no cover - fallback for local model issues
+            if extractor.text:
+                plan = OrchestratorPlan(direct_response=extractor.text, tasks=[])
+            else:
+                plan = self._fallback_plan(user_prompt, exc)
+        yield plan
 
     def answer_prompt(self, user_prompt: str) -> str:
         """
         Generate a direct answer via the local Ollama model.
         """
 
-        response = ollama.chat(
-            model=self.model_name,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are MILES, respond directly and concisely.",
-                },
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        return response["message"]["content"]
+        cached = self._cached_answer(user_prompt)
+        if cached is not None:
+            return cached
 
+        with self._call():
+            response = self.client.chat(
+                model=self.model_name,
+                messages=self._answer_messages(user_prompt),
+                keep_alive=self.keep_alive,
+            )
+        return self._remember_answer(user_prompt, response["message"]["content"])
+
+    async def aanswer_prompt(self, user_prompt: str) -> str:
+        """
+        Async variant of `answer_prompt`.
+        """
+
+        cached = self._cached_answer(user_prompt)
+        if cached is not None:
+            return cached
+
+        with self._call():
+            response = await self.async_client.chat(
+                model=self.model_name,
+                messages=self._answer_messages(user_prompt),
+                keep_alive=self.keep_alive,
+            )
+        return self._remember_answer(user_prompt, response["message"]["content"])
+
+    async def aclose(self) -> None:
+        """
+        Stop the keep-warm loop, let in-flight calls finish (bounded by
+        OLLAMA_CLOSE_GRACE_SECONDS), then close the pooled clients.
+        """
+
+        if self._keepwarm_task is not None:
+            self._keepwarm_task.cancel()
+            self._keepwarm_task = None
+        deadline = time.monotonic() + config.OLLAMA_CLOSE_GRACE_SECONDS
+        while self._inflight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._inflight:
+            logger.warning("Closing Ollama clients with %d calls still in flight", self._inflight)
+        await self.async_client.close()
+        self.client.close()
+        if self.semantic_cache is not None:
+            await asyncio.to_thread(self.semantic_cache.save)
+
+    def _cached_answer(self, user_prompt: str) -> Optional[str]:
+        if self.semantic_cache is None:
+            return None
+        return self.semantic_cache.lookup(user_prompt)
+
+    def _remember_answer(self, user_prompt: str, answer: str) -> str:
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(user_prompt, answer)
+        return answer
+
+    @staticmethod
+    def _plan_messages(user_prompt: str) -> List[Dict[str, str]]:
+        return [OLLAMA_SYSTEM_MESSAGE, {"role": "user", "content": user_prompt}]
+
+    @staticmethod
+    def _answer_messages(user_prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": "You are MILES, respond directly and concisely.",
+            },
+            {"role": "user", "content": user_prompt},
+        ]
+
+    @staticmethod
+    def _parse_plan(response: Any) -> OrchestratorPlan:
+        json_text = response["message"]["content"]
+        plan_data: Any = json.loads(json_text)
+        return OrchestratorPlan(**plan_data)
+
+    @staticmethod
+    def _fallback_plan(user_prompt: str, exc: Exception) -> OrchestratorPlan:
+        if isinstance(exc, (ValueError, KeyError, TypeError)):
+            # The model answered but not with a usable plan: research the prompt instead.
+            logger.error("Could not parse the Ollama plan: %s", exc)
+            return OrchestratorPlan(tasks=[{"worker_name": "RAG_Search", "prompt": user_prompt}], tier="fallback")  # type: ignore[arg-type]
+        # Transport failure: nothing is known about the prompt, so dispatch nothing.
+        logger.error("Error communicating with Ollama: %s", exc)
+        return OrchestratorPlan(
+            direct_response="I'm having trouble connecting right now. Please try again.",
+            tasks=[],
+            tier="fallback",
+        )
@@ -1,18 +1,33 @@
 """
 Orchestrator Factory - The "Swappable Brain"
 
-This module contains the abstract base class for all orchestrators
-and the factory function (`get_orchestrator`) that selects the
-correct "brain" (e.g., Gemini or Ollama) based on the `config.py` file.
+This module contains the abstract base class for all orchestrators,
+the long-lived registry that holds the active "brain" (e.g., Gemini or
+Ollama) selected by the `config.py` file, and the `get_orchestrator`
+accessor used by the endpoints.
 """
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import re
+import threading
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional, Set, Union
 
 from .. import config
+from ..core.intent_classifier import get_intent_classifier
+from ..core.intent_router import intent_router
+from ..core.metrics import metrics
 from ..core.schemas import OrchestratorPlan
 
+logger = logging.getLogger(__name__)
+
+_OBJECT_FILLER_WORDS = frozenset(
+    ["generate", "make", "create", "build", "produce", "render", "3d", "model", "glb", "me", "a", "an", "the"]
+)
+
 
 class OrchestratorBase(ABC):
     """
@@ -22,6 +37,9 @@ class OrchestratorBase(ABC):
     core `decompose_task` method.
     """
 
+    # The fallback chain turns this off on its members and runs pre-flight once itself.
+    preflight_enabled = True
+
     @abstractmethod
     def decompose_task(self, user_prompt: str) -> OrchestratorPlan:
         """
@@ -38,21 +56,131 @@ class OrchestratorBase(ABC):
         Provide a direct, synchronous answer without dispatching workers.
         """
 
+    async def astart(self) -> None:
+        """
+        Lifecycle hook run once when the registry activates this brain.
+        """
 
-def get_orchestrator() -> OrchestratorBase:
-    """
-    Factory function to get the currently active orchestrator.
+    async def aclose(self) -> None:
+        """
+        Lifecycle hook run when the brain is swapped out or the app shuts down.
+        """
 
-    This function reads the `BRAIN_MODE` from `config.py` and
-    returns the corresponding orchestrator instance. This allows the
-    rest of the application to be completely ignorant of *which*
-    model is actually running.
+    async def adecompose_task(self, user_prompt: str) -> OrchestratorPlan:
+        """
+        Async variant of `decompose_task` used by the FastAPI endpoints.
 
-    Returns:
-        OrchestratorBase: Concrete orchestrator instance configured for the environment.
+        Brains with a native async client override this. The default runs the
+        synchronous implementation in a worker thread so a slow LLM call never
+        blocks the event loop.
+        """
+
+        return await asyncio.to_thread(self.decompose_task, user_prompt)
+
+    async def aanswer_prompt(self, user_prompt: str) -> str:
+        """
+        Async variant of `answer_prompt` (thread-pool fallback by default).
+        """
+
+        return await asyncio.to_thread(self.answer_prompt, user_prompt)
+
+    async def astream_decompose(self, user_prompt: str) -> AsyncIterator[Union[str, OrchestratorPlan]]:
+        """
+        Streaming variant of `adecompose_task`.
+
+        Yields `direct_response` text fragments (str) as the model produces
+        them, then exactly one final `OrchestratorPlan`. Brains without a
+        streaming API yield the whole answer as a single fragment.
+        """
+
+        plan = await self.adecompose_task(user_prompt)
+        if plan.direct_response:
+            yield plan.direct_response
+        yield plan
+
+    # ── Pre-flight routing (shared by the LLM brains) ───────────────────────
+    def _preflight(self, user_prompt: str) -> Optional[OrchestratorPlan]:
+        """
+        Route without an LLM call where possible: explicit 3D / search
+        commands (the "3d_*" and "web_search" intents in config.INTENT_RULES),
+        then confident predictions of the local intent classifier. Returns
+        None when the prompt should go to the model.
+        """
+
+        if not self.preflight_enabled:
+            return None
+        logger.debug("Received: %r", user_prompt)
+        intents = intent_router.route(user_prompt)
+
+        # 1. 3D route — needs both a verb and a noun
+        if "3d_verb" in intents and "3d_noun" in intents:
+            obj = self._extract_object_name(user_prompt)
+            logger.debug("→ 3D route: %r", obj)
+            return OrchestratorPlan(
+                direct_response=None,
+                tasks=[{"worker_name": "3D_Generator", "prompt": obj}],
+                tier="preflight",
+            )
+
+        # 2. RAG route — explicit search command only
+        if "web_search" in intents:
+            query = self._extract_rag_query(user_prompt)
+            logger.debug("→ RAG route: %r", query)
+            return OrchestratorPlan(
+                direct_response=None,
+                tasks=[{"worker_name": "RAG_Search", "prompt": query}],
+                tier="preflight",
+            )
+
+        # 3. Local classifier — only confident worker predictions skip the LLM
+        classifier = get_intent_classifier()
+        if classifier is not None:
+            label, confidence = classifier.predict(user_prompt)
+            local = label != "direct" and confidence >= config.INTENT_CLASSIFIER_THRESHOLD
+            metrics.inc("miles_intent_classifier_total", label=label, escalated=str(not local).lower())
+            if local:
+                task_prompt = (
+                    self._extract_object_name(user_prompt) if label == "3D_Generator"
+                    else self._extract_rag_query(user_prompt)
+                )
+                logger.debug("→ Classifier route: %s (%.2f) %r", label, confidence, task_prompt)
+                return OrchestratorPlan(
+                    direct_response=None,
+                    tasks=[{"worker_name": label, "prompt": task_prompt}],
+                    tier="classifier",
+                )
+
+        return None
+
+    @staticmethod
+    def _extract_object_name(prompt: str) -> str:
+        lower = prompt.lower()
+        m = re.search(r'\bof\s+(?:a\s+|an\s+)?(.+)', lower)
+        if m:
+            obj = m.group(1).strip()
+        else:
+            # Whole words only: substring replacement turned "castle" into "c stle".
+            obj = " ".join(word for word in lower.split() if word not in _OBJECT_FILLER_WORDS)
+        return obj.rstrip(".,!?") or prompt
+
+    @staticmethod
+    def _extract_rag_query(prompt: str) -> str:
+        """Strip command words from RAG prompt to get the search query."""
+        lower = prompt.lower()
+        # Remove all trigger phrases
+        for pat in [r'conduct\s+a?\s*research\s+(on\s+)?', r'do\s+a?\s*research\s+(on\s+)?',
+                    r'search\s+(for|about|on)\s+', r'look\s+up\s+', r'find\s+(me\s+)?',
+                    r'web\s+search\s+(for\s+)?', r'latest\s+news\s+(on\s+|about\s+)?']:
+            lower = re.sub(pat, '', lower)
+        return lower.strip() or prompt
+
+
+def _build_orchestrator(mode: str) -> OrchestratorBase:
+    """
+    Construct a fresh orchestrator for the given `BRAIN_MODE` value.
     """
 
-    if config.BRAIN_MODE == "GEMINI":
+    if mode == "GEMINI":
         from .gemini_brain import GeminiOrchestrator
 
         if config.GEMINI_API_KEY == "YOUR_GEMINI_API_KEY_GOES_HERE":
@@ -62,15 +190,117 @@ def get_orchestrator() -> OrchestratorBase:
             model_name=config.GEMINI_MODEL_NAME
         )
 
-    if config.BRAIN_MODE == "LOCAL":
+    if mode == "LOCAL":
         from .ollama_orchestrator import OllamaOrchestrator
 
         return OllamaOrchestrator(model_name=config.LOCAL_MODEL_NAME)
 
-    if config.BRAIN_MODE == "DEMO":
+    if mode == "DEMO":
         from .mock_orchestrator import MockOrchestrator
 
         return MockOrchestrator()
 
-    raise ValueError(f"Unknown BRAIN_MODE in config.py: {config.BRAIN_MODE}")
+    if mode == "CHAIN":
+        from .fallback_chain import FallbackOrchestrator
+
+        return FallbackOrchestrator(config.BRAIN_CHAIN)
+
+    raise ValueError(f"Unknown BRAIN_MODE in config.py: {mode}")
+
+
+class OrchestratorRegistry:
+    """
+    Process-wide, long-lived holder for the active orchestrator.
+
+    The brain is built once (normally in the FastAPI `lifespan` hook) and
+    reused by every request, so key rotation state and client connection
+    pools carry over between requests. `reload` swaps in a new brain
+    without restarting the server.
+    """
+
+    def __init__(self):
+        self._brain: Optional[OrchestratorBase] = None
+        self._mode: Optional[str] = None
+        self._lock = threading.Lock()
+        self._retiring: Set[asyncio.Task] = set()
+
+    @property
+    def mode(self) -> Optional[str]:
+        return self._mode
+
+    def get(self) -> OrchestratorBase:
+        """Return the active brain, building it lazily if startup was skipped."""
+        brain = self._brain
+        if brain is not None:
+            return brain
+        with self._lock:
+            if self._brain is None:
+                self._brain = _build_orchestrator(config.BRAIN_MODE)
+                self._mode = config.BRAIN_MODE
+            return self._brain
+
+    async def start(self) -> OrchestratorBase:
+        """Build (off the event loop) and start the configured brain."""
+        if self._brain is None:
+            await asyncio.to_thread(self.get)
+        await self._brain.astart()
+        return self._brain
+
+    async def reload(self, mode: Optional[str] = None) -> OrchestratorBase:
+        """
+        Build a new brain (optionally in a different mode) and swap it in.
+
+        Requests already holding the old brain finish with it; new requests
+        get the replacement as soon as the swap happens. The old brain is
+        closed in the background once those requests are done (its `aclose`
+        drains them).
+        """
+
+        mode = mode or self._mode or config.BRAIN_MODE
+        new_brain = await asyncio.to_thread(_build_orchestrator, mode)
+        await new_brain.astart()
+
+        with self._lock:
+            old_brain, self._brain, self._mode = self._brain, new_brain, mode
+
+        if old_brain is not None:
+            task = asyncio.create_task(self._retire(old_brain), name="brain-retire")
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+        logger.info("Brain reloaded: %s (%s)", type(new_brain).__name__, mode)
+        return new_brain
+
+    async def close(self) -> None:
+        with self._lock:
+            brain, self._brain = self._brain, None
+        if brain is not None:
+            await brain.aclose()
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+
+    @staticmethod
+    async def _retire(brain: OrchestratorBase) -> None:
+        try:
+            await brain.aclose()
+        except Exception as exc:
+            logger.error("Closing replaced brain %s failed: %s", type(brain).__name__, exc)
+
+
+orchestrator_registry = OrchestratorRegistry()
+
+
+def get_orchestrator() -> OrchestratorBase:
+    """
+    Return the currently active orchestrator.
+
+    The brain is selected by `BRAIN_MODE` in `config.py` and held by the
+    process-wide `orchestrator_registry`, so this is a cheap lookup rather
+    than a per-request construction. This allows the rest of the
+    application to be completely ignorant of *which* model is actually
+    running.
+
+    Returns:
+        OrchestratorBase: Concrete orchestrator instance configured for the environment.
+    """
 
+    return orchestrator_registry.get()
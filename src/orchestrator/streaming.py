@@ -0,0 +1,97 @@
+"""
+Incremental extraction of `direct_response` from a streamed JSON plan.
+
+Both brains answer in JSON mode ({"direct_response": "...", "tasks": [...]}).
+To show text as the model produces it, we scan the partial JSON for the
+`direct_response` string value and decode it chunk by chunk, including
+escape sequences that are split across chunk boundaries.
+"""
+
+from __future__ import annotations
+
+import re
+
+_KEY = re.compile(r'"direct_response"\s*:\s*"')
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class DirectResponseExtractor:
+    """
+    Feed raw JSON chunks; get back the newly decoded part of `direct_response`.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.text = ""
+        self._pos = -1      # index in `raw` of the next undecoded value char, -1 = key not seen
+        self._done = False
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self._done:
+            return ""
+
+        if self._pos < 0:
+            match = _KEY.search(self.raw)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        raw, i = self.raw, self._pos
+        while i < len(raw):
+            ch = raw[i]
+            if ch == '"':
+                self._done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if the chunk ended mid-way.
+            if i + 1 >= len(raw):
+                break
+            code = raw[i + 1]
+            if code == "u":
+                if i + 6 > len(raw):
+                    break
+                try:
+                    code_point = int(raw[i + 2:i + 6], 16)
+                except ValueError:
+                    i += 6
+                    continue
+                if 0xD800 <= code_point <= 0xDBFF:
+                    # High surrogate: needs the following \uXXXX low surrogate.
+                    if i + 12 > len(raw):
+                        break
+                    try:
+                        low = int(raw[i + 8:i + 12], 16)
+                    except ValueError:
+                        low = 0
+                    if raw[i + 6:i + 8] == "\\u" and 0xDC00 <= low <= 0xDFFF:
+                        out.append(chr(0x10000 + ((code_point - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+                    i += 6
+                    continue
+                out.append(chr(code_point))
+                i += 6
+                continue
+            out.append(_ESCAPES.get(code, code))
+            i += 2
+
+        self._pos = i
+        delta = "".join(out)
+        self.text += delta
+        return delta
@@ -16,6 +16,7 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 from src.core.memory import memory
+from src.core.metrics import metrics
 
 class ImageGenService:
     def __init__(self):
@@ -69,7 +70,8 @@ class ImageGenService:
         
         payload = {"inputs": final_prompt}
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        with metrics.timer("sdxl"):
+            response = requests.post(self.api_url, headers=headers, json=payload)
 
         if response.status_code != 200:
             logger.error(f"HF API Error: {response.text}")
@@ -87,7 +89,7 @@ class ImageGenService:
         logger.info(f"Image saved to: {save_path}")
         
         # Register with memory to track it as a temp file
-        memory.register_file(save_path, is_temp=True)
+        memory.register_file(save_path, is_temp=True, prompt=prompt, kind="image")
         
         return save_path
 
@@ -133,12 +135,13 @@ class ImageGenService:
             client = InferenceClient(model=self.api_url, token=self.api_token)
             
             # Using the base model for Img2Img is often better for big changes than the refiner
-            image = client.image_to_image(
-                prompt=final_prompt,
-                image=image_bytes, 
-                model="stabilityai/stable-diffusion-xl-base-1.0",
-                strength=0.75 # Allow significant changes (0.0 = no change, 1.0 = full replacement)
-            )
+            with metrics.timer("sdxl_refine"):
+                image = client.image_to_image(
+                    prompt=final_prompt,
+                    image=image_bytes, 
+                    model="stabilityai/stable-diffusion-xl-base-1.0",
+                    strength=0.75 # Allow significant changes (0.0 = no change, 1.0 = full replacement)
+                )
             
             image_id = str(uuid.uuid4())
             filename = f"{image_id}.png"
@@ -146,7 +149,7 @@ class ImageGenService:
             image.save(save_path)
             
             logger.info(f"Refined Image saved to: {save_path}")
-            memory.register_file(save_path, is_temp=True)
+            memory.register_file(save_path, is_temp=True, prompt=prompt, kind="image")
             return save_path
 
         except ImportError:
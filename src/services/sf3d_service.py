@@ -10,6 +10,8 @@ import rembg
 from PIL import Image
 from typing import Optional, Dict, Any
 
+from src.core.metrics import metrics
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -103,7 +105,8 @@ class SF3DService:
         logger.info(f"Removing background from {input_path}")
         try:
             img = Image.open(input_path)
-            output = rembg.remove(img)
+            with metrics.timer("rembg"):
+                output = rembg.remove(img)
             
             # Save processed image
             temp_dir = os.path.join(self.portable_root, "ComfyUI", "input") # Use Comfy input dir to avoid upload?
@@ -133,7 +136,8 @@ class SF3DService:
             processed_path = self._remove_background(image_path)
             
             # 1. Upload Image
-            filename = self.upload_image(processed_path)
+            with metrics.timer("upload"):
+                filename = self.upload_image(processed_path)
             logger.info(f"Image uploaded: {filename}")
             
             # Cleanup temp processed file? 
@@ -144,28 +148,30 @@ class SF3DService:
             client_id = str(uuid.uuid4())
             prompt_workflow = self._build_workflow(filename)
 
-            # 3. Connection to WebSocket for status updates
-            ws = websocket.WebSocket()
-            ws.connect(f"{self.ws_url}?clientId={client_id}")
+            # 3-5. Queue on ComfyUI and wait for execution (timed as one stage)
+            with metrics.timer("comfyui"):
+                # 3. Connection to WebSocket for status updates
+                ws = websocket.WebSocket()
+                ws.connect(f"{self.ws_url}?clientId={client_id}")
 
-            # 4. Queue Prompt
-            p = {"prompt": prompt_workflow, "client_id": client_id}
-            resp = requests.post(f"{self.base_url}/prompt", json=p)
-            resp.raise_for_status()
-            prompt_id = resp.json()['prompt_id']
-            logger.info(f"Prompt queued: {prompt_id}")
+                # 4. Queue Prompt
+                p = {"prompt": prompt_workflow, "client_id": client_id}
+                resp = requests.post(f"{self.base_url}/prompt", json=p)
+                resp.raise_for_status()
+                prompt_id = resp.json()['prompt_id']
+                logger.info(f"Prompt queued: {prompt_id}")
 
-            # 5. Wait for completion
-            output_filename = None
-            while True:
-                out = ws.recv()
-                if isinstance(out, str):
-                    message = json.loads(out)
-                    if message['type'] == 'executing':
-                        data = message['data']
-                        if data['node'] is None and data['prompt_id'] == prompt_id:
-                            logger.info("Execution complete!")
-                            break # Execution done
+                # 5. Wait for completion
+                output_filename = None
+                while True:
+                    out = ws.recv()
+                    if isinstance(out, str):
+                        message = json.loads(out)
+                        if message['type'] == 'executing':
+                            data = message['data']
+                            if data['node'] is None and data['prompt_id'] == prompt_id:
+                                logger.info("Execution complete!")
+                                break # Execution done
             
             # 6. Retrieve Output File Path
             # We know the output node ID is 9 (StableFast3DSave)
@@ -2,8 +2,9 @@
  * MILES Playground — Frontend Logic
  * 
  * API contract:
+ *  POST /api/v1/interact/stream → SSE: token* → plan → dispatch → task events → end
  *  POST /api/v1/interact        → { plan, task_ids, direct_response }
- *  GET  /api/v1/stream/{taskId} → SSE stream with status/result payloads
+ *  GET  /api/v1/stream?ids=a,b   → one multiplexed SSE stream, events tagged by task_id
  * 
  * HTML elements required:
  *  #chat-form, #prompt-input, #send-btn
@@ -32,7 +33,7 @@ const msgTemplate    = document.getElementById('message-template');
 const taskTemplate   = document.getElementById('task-template');
 
 // ── State ─────────────────────────────────────────────────────────────────────
-const activeStreams = new Map();  // taskId → EventSource
+const activeStreams = new Map();  // stream key → object with close() (EventSource or fetch abort)
 let   taskCount    = 0;
 let   typingNode   = null;
 
@@ -141,6 +142,14 @@ function addMessage(sender, text, role = 'ai') {
 
   messagesEl.appendChild(node);
   scrollToBottom();
+  return node;
+}
+
+/** Replace the body text of a message bubble (used while tokens stream in) */
+function setMessageText(node, text) {
+  const body = node.querySelector('.message__body');
+  body.innerHTML = window.marked ? marked.parse(String(text)) : _escHtml(String(text)).replace(/\n/g, '<br>');
+  scrollToBottom();
 }
 
 /** Build a model-viewer element */
@@ -232,41 +241,122 @@ function updateTaskStatus(taskId, status, resultText) {
   }
 }
 
-function subscribeToTask(taskId, workerName, prompt) {
-  _getOrCreateTaskCard(taskId, workerName, prompt);
-  updateTaskStatus(taskId, 'PENDING');
+/**
+ * Create task cards for dispatched tasks.
+ * @param {{taskId: string, workerName: string, prompt: string}[]} entries
+ * @returns {Map<string, string>} pending taskId → workerName
+ */
+function trackTasks(entries) {
+  const pending = new Map();
+  entries.forEach(({ taskId, workerName, prompt }) => {
+    _getOrCreateTaskCard(taskId, workerName, prompt);
+    updateTaskStatus(taskId, 'PENDING');
+    pending.set(taskId, workerName);
+  });
+  return pending;
+}
+
+/**
+ * Apply one task event ({task_id, status, result}) to the dashboard and chat.
+ * Removes the task from `pending` once it has finished.
+ */
+function handleTaskEvent(pending, payload) {
+  const taskId = payload.task_id;
+  if (!pending.has(taskId)) return;
+
+  updateTaskStatus(taskId, payload.status, payload.result);
+
+  if (payload.status === 'SUCCESS' || payload.status === 'FAILURE' || payload.status === 'REVOKED') {
+    const workerName = pending.get(taskId);
+    pending.delete(taskId);
+
+    // Echo result to chat
+    addMessage(
+      workerName,
+      payload.result || `Task finished with status ${payload.status}`,
+      payload.status === 'SUCCESS' ? 'ai' : 'system'
+    );
+  }
+}
+
+/** Map a plan + task_ids pair to task entries */
+function _taskEntries(plan, taskIds) {
+  return (plan?.tasks ?? [])
+    .map((task, i) => ({ taskId: taskIds?.[i], workerName: task.worker_name, prompt: task.prompt }))
+    .filter((entry) => entry.taskId);
+}
 
-  const stream = new EventSource(`/api/v1/stream/${encodeURIComponent(taskId)}`);
-  activeStreams.set(taskId, stream);
+/**
+ * Open ONE multiplexed SSE stream for every task of an /interact response.
+ * @param {{taskId: string, workerName: string, prompt: string}[]} entries
+ */
+function subscribeToTasks(entries) {
+  const pending = trackTasks(entries);
+  if (pending.size === 0) return;
+
+  const ids    = [...pending.keys()];
+  const key    = ids.join(',');
+  const stream = new EventSource(`/api/v1/stream?ids=${encodeURIComponent(key)}`);
+  activeStreams.set(key, stream);
+
+  const closeStream = () => {
+    stream.close();
+    activeStreams.delete(key);
+  };
 
   stream.onmessage = (event) => {
     try {
-      const payload = JSON.parse(event.data);
-      updateTaskStatus(taskId, payload.status, payload.result);
-
-      if (payload.status === 'SUCCESS' || payload.status === 'FAILURE') {
-        stream.close();
-        activeStreams.delete(taskId);
-
-        // Echo result to chat
-        addMessage(
-          workerName,
-          payload.result || `Task finished with status ${payload.status}`,
-          payload.status === 'FAILURE' ? 'system' : 'ai'
-        );
-      }
+      handleTaskEvent(pending, JSON.parse(event.data));
+      if (pending.size === 0) closeStream();
     } catch (err) {
       console.error('[MILES] SSE parse error:', err);
     }
   };
 
+  // Server signals that the last task finished
+  stream.addEventListener('end', closeStream);
+
   stream.onerror = () => {
-    stream.close();
-    activeStreams.delete(taskId);
-    updateTaskStatus(taskId, 'FAILURE', 'Connection to task stream lost.');
+    closeStream();
+    pending.forEach((_, taskId) => updateTaskStatus(taskId, 'FAILURE', 'Connection to task stream lost.'));
+    pending.clear();
   };
 }
 
+// ── Token streaming (/interact/stream) ───────────────────────────────────────
+
+/**
+ * Parse a fetch() body as Server-Sent Events.
+ * @param {Response} response
+ * @param {(event: string, data: any) => void} onEvent
+ */
+async function readEventStream(response, onEvent) {
+  const reader  = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = 'message';
+      const dataLines = [];
+      block.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+      });
+      if (dataLines.length === 0) continue;
+      onEvent(event, JSON.parse(dataLines.join('\n')));
+    }
+  }
+}
+
 // ── Form submit ───────────────────────────────────────────────────────────────
 chatForm.addEventListener('submit', async (e) => {
   e.preventDefault();
@@ -281,11 +371,21 @@ chatForm.addEventListener('submit', async (e) => {
   sendBtn.disabled = true;
   showTyping();
 
+  const controller = new AbortController();
+  const streamKey  = `interact:${Date.now()}`;
+  activeStreams.set(streamKey, { close: () => controller.abort() });
+
+  let answerNode = null;   // AI bubble filled token by token
+  let answerText = '';
+  let pending    = new Map();
+  let gotPlan    = false;
+
   try {
-    const response = await fetch('/api/v1/interact', {
+    const response = await fetch('/api/v1/interact/stream', {
       method:  'POST',
       headers: { 'Content-Type': 'application/json' },
       body:    JSON.stringify({ prompt }),
+      signal:  controller.signal,
     });
 
     if (!response.ok) {
@@ -293,35 +393,59 @@ chatForm.addEventListener('submit', async (e) => {
       throw new Error(err.detail || `Server error ${response.status}`);
     }
 
-    const data  = await response.json();
-    const tasks = data.plan?.tasks ?? [];
-
-    // Render plan sidebar
-    renderPlan(tasks);
-
-    // Show direct AI response
-    if (data.direct_response) {
-      addMessage('MILES', data.direct_response, 'ai');
-    }
-
-    // Subscribe to worker tasks
-    if (tasks.length > 0) {
-      if (!data.direct_response) {
-        hideTyping();  // already handled above for direct_response
+    await readEventStream(response, (event, data) => {
+      switch (event) {
+        case 'token':
+          answerText += data.text;
+          if (!answerNode) answerNode = addMessage('MILES', answerText, 'ai');
+          else setMessageText(answerNode, answerText);
+          break;
+
+        case 'plan':
+          gotPlan = true;
+          renderPlan(data.tasks ?? []);
+          // The parsed plan is authoritative (the brain may post-process the text)
+          if (data.direct_response) {
+            if (!answerNode) answerNode = addMessage('MILES', data.direct_response, 'ai');
+            else if (data.direct_response !== answerText) setMessageText(answerNode, data.direct_response);
+          } else if (!data.tasks?.length) {
+            addMessage('MILES', 'No response generated.', 'ai');
+          } else {
+            hideTyping();
+          }
+          break;
+
+        case 'dispatch':
+          pending = trackTasks(_taskEntries(data.plan, data.task_ids));
+          // Planning is done; tasks keep streaming on this connection
+          sendBtn.disabled = false;
+          break;
+
+        case 'error':
+          hideTyping();
+          addMessage('System', data.retry_after
+            ? `${data.detail} (retry in ${data.retry_after}s)`
+            : data.detail, 'system');
+          break;
+
+        case 'message':
+          handleTaskEvent(pending, data);
+          break;
       }
-      tasks.forEach((task, i) => {
-        const taskId = data.task_ids?.[i];
-        if (taskId) subscribeToTask(taskId, task.worker_name, task.prompt);
-      });
-    } else if (!data.direct_response) {
-      addMessage('MILES', 'No response generated.', 'ai');
-    }
+    });
+
+    // Stream closed before every task reported back
+    pending.forEach((_, taskId) => updateTaskStatus(taskId, 'FAILURE', 'Connection to task stream lost.'));
+    if (!gotPlan) hideTyping();
 
   } catch (error) {
-    console.error('[MILES] Fetch error:', error);
-    hideTyping();
-    addMessage('System', error.message, 'system');
+    if (error.name !== 'AbortError') {
+      console.error('[MILES] Fetch error:', error);
+      hideTyping();
+      addMessage('System', error.message, 'system');
+    }
   } finally {
+    activeStreams.delete(streamKey);
     sendBtn.disabled = false;
     promptInput.focus();
   }
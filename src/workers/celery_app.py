@@ -9,6 +9,7 @@ puts tasks on, and the Workers pick tasks up from.
 from __future__ import annotations
 
 from celery import Celery
+from kombu import Exchange, Queue
 
 from .. import config
 
@@ -26,5 +27,30 @@ celery_app = Celery(
 # Optional Celery configuration
 celery_app.conf.update(
     task_track_started=True,
+    # Dedicated queues: "gpu" for 3D generation, "io" for web research.
+    task_queues=[
+        Queue(name, Exchange(name), routing_key=name)
+        for name in dict.fromkeys(config.WORKER_QUEUES.values())
+    ],
+    task_default_queue="io",
+    task_routes={
+        config.WORKER_TASK_NAMES[worker]: {"queue": queue}
+        for worker, queue in config.WORKER_QUEUES.items()
+    },
+    # Long-running tasks: reserve one message at a time and acknowledge only
+    # after completion, so queued jobs stay visible to other idle workers and
+    # to admission control instead of hiding in one worker's prefetch buffer.
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
 )
 
+if config.PRIORITY_LANE_ENABLED:
+    celery_app.conf.broker_transport_options = {
+        "priority_steps": config.CELERY_PRIORITY_STEPS,
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    }
+
+
+# Register the worker-side signal hooks (task progress events)
+from . import signals  # noqa: E402,F401
@@ -0,0 +1,114 @@
+"""
+Celery Signal Hooks
+
+Runs inside the worker processes and reports every task state change
+to the API through the Redis task-event channel. Also records running
+counts and job durations used by admission control, and task metrics.
+
+Trace context: the publishing side stamps the current span into a
+`traceparent` message header; the worker opens the task span under it and
+keeps it current while the task runs, so service-call spans nest inside.
+The user session travels the same way (`miles_session`), so files a task
+registers are attributed to the user who asked for them.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, Tuple
+
+from celery import signals
+
+from ..core.admission import TASK_TO_WORKER, forget_worker_jobs, record_job_finished, record_job_started
+from ..core.asset_registry import current_session
+from ..core.logs import reset_after_fork, setup_logging
+from ..core.metrics import metrics
+from ..core.task_events import publish_task_event
+from ..core.tracing import STATUS_ERROR, Span, tracer
+
+_started_at: Dict[str, float] = {}
+_task_spans: Dict[str, Tuple[Span, object]] = {}
+_task_sessions: Dict[str, object] = {}
+
+
+@signals.before_task_publish.connect
+def _on_before_task_publish(headers=None, **_kwargs):
+    traceparent = tracer.current_traceparent()
+    if headers is not None and traceparent:
+        headers["traceparent"] = traceparent
+    session = current_session.get()
+    if headers is not None and session:
+        # A header set on the signature (batch items of different users) wins.
+        headers.setdefault("miles_session", session)
+
+
+@signals.setup_logging.connect
+def _on_setup_logging(**_kwargs):
+    # Connecting this signal stops Celery from installing its own handlers.
+    setup_logging("miles-worker")
+
+
+@signals.worker_ready.connect
+def _on_worker_ready(sender=None, **_kwargs):
+    # Jobs this worker was running when it last died will never report finished.
+    hostname = getattr(sender, "hostname", None)
+    if hostname:
+        forget_worker_jobs(hostname)
+
+
+@signals.worker_process_init.connect
+def _on_worker_process_init(**_kwargs):
+    tracer.service_name = "miles-worker"
+    reset_after_fork("miles-worker")
+
+
+@signals.task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **_kwargs):
+    publish_task_event(task_id, "STARTED")
+    worker_name = TASK_TO_WORKER.get(getattr(task, "name", ""))
+    request = getattr(task, "request", None)
+    # Eager runs have no message header but inherit the caller's current span.
+    traceparent = getattr(request, "traceparent", None)
+    span = tracer.start_span(f"task {getattr(task, 'name', '?')}", traceparent, task_id=task_id, worker=worker_name)
+    _task_spans[task_id] = (span, tracer.activate(span))
+    # Worker messages expose custom headers as request attributes; eager runs keep them in `headers`.
+    session = getattr(request, "miles_session", None) or (getattr(request, "headers", None) or {}).get("miles_session")
+    if session:
+        _task_sessions[task_id] = current_session.set(session)
+    if worker_name:
+        _started_at[task_id] = time.monotonic()
+        record_job_started(worker_name, task_id, getattr(request, "hostname", None))
+        metrics.gauge_add("miles_tasks_inflight", 1, worker=worker_name)
+
+
+@signals.task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **_kwargs):
+    # The result backend is written before task_postrun fires, so listeners
+    # can read the final result as soon as they see this event.
+    publish_task_event(task_id, state or "SUCCESS")
+    session_token = _task_sessions.pop(task_id, None)
+    if session_token is not None:
+        current_session.reset(session_token)
+    traced = _task_spans.pop(task_id, None)
+    if traced is not None:
+        span, token = traced
+        tracer.deactivate(token)
+        span.set("state", state or "SUCCESS")
+        if state == "FAILURE":
+            span.status = STATUS_ERROR
+        tracer.end_span(span)
+    worker_name = TASK_TO_WORKER.get(getattr(task, "name", ""))
+    if worker_name:
+        started = _started_at.pop(task_id, None)
+        duration = time.monotonic() - started if started is not None else None
+        record_job_finished(worker_name, task_id, duration, getattr(getattr(task, "request", None), "hostname", None))
+        metrics.gauge_add("miles_tasks_inflight", -1, worker=worker_name)
+        metrics.inc("miles_tasks_total", worker=worker_name, state=state or "SUCCESS")
+        if duration is not None:
+            metrics.observe("miles_task_duration_seconds", duration, worker=worker_name)
+
+
+@signals.task_revoked.connect
+def _on_task_revoked(request=None, **_kwargs):
+    if request is not None:
+        publish_task_event(request.id, "REVOKED")
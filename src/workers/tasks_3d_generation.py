@@ -6,13 +6,17 @@ This worker uses the local SF3D service (ComfyUI backend) to generate 3D meshes.
 
 from __future__ import annotations
 
+import logging
 import os
 from pathlib import Path
 
 # Local utils
 from .celery_app import celery_app
+from ..core.metrics import metrics
 from ..services.sf3d_service import sf3d_service
 
+logger = logging.getLogger(__name__)
+
 MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
 MODELS_DIR.mkdir(exist_ok=True)
 
@@ -24,7 +28,7 @@ def generate_3d_model(prompt: str) -> str:
     Args:
         prompt: Filepath to the input image. (Future: Text prompt if T2I is added)
     """
-    print(f"STARTING 3D_Generator (SF3D Local): '{prompt}'")
+    logger.info("STARTING 3D_Generator (SF3D Local): %r", prompt)
     
     # Determine if prompt is a file path or a text description
     image_path = prompt
@@ -40,9 +44,9 @@ def generate_3d_model(prompt: str) -> str:
         # Explicit refinement (e.g. "make it red") should be handled by the brain
         # by rewriting the full description, not by reusing the old image.
         try:
-            print(f"Generating new concept image for: '{prompt}'...")
+            logger.info("Generating new concept image for: %r...", prompt)
             image_path = image_gen_service.generate_image(prompt)
-            print(f"Concept image generated at: {image_path}")
+            logger.info("Concept image generated at: %s", image_path)
         except Exception as e:
             return f"Error generating concept image: {e}"
 
@@ -50,7 +54,7 @@ def generate_3d_model(prompt: str) -> str:
         return f"Error: Input image not found at '{image_path}'. Please provide a valid file path or text description."
 
     try:
-        print("Delegating to SF3DService...")
+        logger.info("Delegating to SF3DService...")
         glb_path = sf3d_service.generate_model(image_path)
         
         if not glb_path:
@@ -59,16 +63,17 @@ def generate_3d_model(prompt: str) -> str:
         filename = os.path.basename(glb_path)
         
         # Register the generated model in memory (temp by default)
-        memory.register_file(glb_path, is_temp=True)
+        memory.register_file(glb_path, is_temp=True, prompt=prompt, kind="model")
 
         # Copy to accessible models directory (so the UI can see it)
         # We treat the 'models' dir as a cache/staging area too.
         # True persistence only happens if user asks to 'save'.
         target_path = MODELS_DIR / filename
         import shutil
-        shutil.copy(glb_path, target_path)
+        with metrics.timer("glb_copy"):
+            shutil.copy(glb_path, target_path)
         
-        print(f"Model available at: {target_path}")
+        logger.info("Model available at: %s", target_path)
         
         # --- Hologram Display Integration ---
         # Automatically broadcast to connected hologram displays
@@ -85,16 +90,17 @@ def generate_3d_model(prompt: str) -> str:
                 "data": {"url": model_url}
             }
             
-            print(f"[HOLOGRAM] Broadcasting model to displays: {model_url}")
-            response = requests.post(broadcast_url, json=payload, timeout=2)
+            logger.info("Broadcasting model to hologram displays: %s", model_url)
+            with metrics.timer("hologram_broadcast"):
+                response = requests.post(broadcast_url, json=payload, timeout=2)
             
             if response.status_code == 200:
-                print(f"[HOLOGRAM] ✓ Model sent to display successfully!")
+                logger.info("Model sent to hologram display")
             else:
-                print(f"[HOLOGRAM] Warning: Broadcast failed ({response.status_code})")
+                logger.warning("Hologram broadcast failed (%d)", response.status_code)
         except Exception as broadcast_err:
             # Don't fail the whole task if broadcast fails
-            print(f"[HOLOGRAM] Could not broadcast (display may not be connected): {broadcast_err}")
+            logger.warning("Could not broadcast to hologram (display may not be connected): %s", broadcast_err)
         
         # Return a rich response with the image and model
         return (
@@ -104,5 +110,5 @@ def generate_3d_model(prompt: str) -> str:
         )
 
     except Exception as e:
-        print(f"SF3D Worker Error: {e}")
+        logger.exception("SF3D Worker Error: %s", e)
         return f"Error executing SF3D generation: {e}"
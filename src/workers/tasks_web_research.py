@@ -9,11 +9,16 @@ This worker uses:
 
 from __future__ import annotations
 
-import google.generativeai as genai
+import logging
+
 from tavily import TavilyClient
 
 from .celery_app import celery_app
 from .. import config
+from ..core.key_pool import KeyPoolExhausted, gemini_key_pool, gemini_model
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 
 @celery_app.task(name="tasks.perform_web_research")
@@ -25,38 +30,13 @@ def perform_web_research(user_prompt: str) -> str:
     User Prompt -> [Gemini] -> Clean Query -> [Tavily] -> Results -> [Gemini] -> Final Report
     """
 
-    print(f"STARTING RAG_Search: Processing '{user_prompt}'")
+    logger.info("STARTING RAG_Search: Processing %r", user_prompt)
     
-    # 1. Setup API Keys
-    api_keys = getattr(config, "GEMINI_API_KEYS", None) or [config.GEMINI_API_KEY]
-    current_key_index = 0
-    
-    def configure_gemini(index):
-        key = api_keys[index]
-        genai.configure(api_key=key)
-        return genai.GenerativeModel(config.GEMINI_MODEL_NAME)
-
-    model = configure_gemini(current_key_index)
-
-    # Helper for Retry Logic
-    def generate_with_retry(prompt, is_extraction=False):
-        nonlocal current_key_index, model
-        max_retries = len(api_keys) + 1
-        
-        for attempt in range(max_retries):
-            try:
-                response = model.generate_content(prompt)
-                return response
-            except Exception as e:
-                is_rate_limit = "429" in str(e) or "ResourceExhausted" in str(e) or "QuotaExceeded" in str(e)
-                if is_rate_limit:
-                    print(f"RAG_Search: Rate Limit (429) on Key {current_key_index}. Rotating...")
-                    if len(api_keys) > 1:
-                        current_key_index = (current_key_index + 1) % len(api_keys)
-                        model = configure_gemini(current_key_index)
-                        continue # Retry
-                raise e # Re-raise if not rate limit or no keys left
-        return None
+    # 1. Gemini calls draw on the key pool shared with the API (budgets, 429 cooldowns).
+    def generate_with_retry(prompt):
+        return gemini_key_pool.call(
+            lambda key: gemini_model(key, config.GEMINI_MODEL_NAME).generate_content(prompt)
+        )
 
     try:
         # 2. Extract a clean search query
@@ -66,23 +46,25 @@ def perform_web_research(user_prompt: str) -> str:
         User Request: "{user_prompt}"
         """
         
-        extraction_response = generate_with_retry(extraction_prompt, is_extraction=True)
+        with metrics.timer("gemini_query"):
+            extraction_response = generate_with_retry(extraction_prompt)
         
         # Safety Check
         if not extraction_response or not extraction_response.parts:
-            print(f"RAG_Search: Gemini blocked query extraction.")
+            logger.warning("Gemini blocked query extraction.")
             search_query = user_prompt
         else:
             search_query = extraction_response.text.strip()
             
-        print(f"RAG_Search: Refined query to '{search_query}'")
+        logger.info("Refined query to %r", search_query)
 
         # 3. Perform Search with Tavily
         if config.TAVILY_API_KEY == "YOUR_TAVILY_API_KEY_HERE":
              return "Error: Please set your TAVILY_API_KEY in src/config.py"
              
         tavily = TavilyClient(api_key=config.TAVILY_API_KEY)
-        search_result = tavily.search(query=search_query, search_depth="basic", max_results=5)
+        with metrics.timer("tavily_search"):
+            search_result = tavily.search(query=search_query, search_depth="basic", max_results=5)
         
         results = search_result.get("results", [])
         if not results:
@@ -111,17 +93,25 @@ def perform_web_research(user_prompt: str) -> str:
         - Be professional and concise.
         """
         
-        report_response = generate_with_retry(synthesis_prompt)
+        with metrics.timer("gemini_synthesis"):
+            report_response = generate_with_retry(synthesis_prompt)
         
         if not report_response or not report_response.parts:
              final_report = "I found results but couldn't summarize them due to safety/auth errors. Links:\n" + "\n".join([f"- {r.get('url')}" for r in results])
         else:
              final_report = report_response.text.strip()
         
-        print(f"FINISHED RAG_Search: Generated report ({len(final_report)} chars)")
+        logger.info("FINISHED RAG_Search: Generated report (%d chars)", len(final_report))
         return final_report
 
+    except KeyPoolExhausted as exc:
+        # Every key is cooling down: retry when one is free instead of failing the job.
+        logger.warning("RAG_Search deferred: %s", exc)
+        raise perform_web_research.retry(
+            exc=exc, countdown=max(1, int(exc.retry_after)), max_retries=config.RAG_KEY_EXHAUSTED_RETRIES
+        )
+
     except Exception as exc:
-        print(f"RAG_Search error: {exc}")
+        logger.error("RAG_Search error: %s", exc)
         return f"I encountered an error during research: {exc}"
 
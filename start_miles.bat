@@ -1,10 +1,14 @@
 @echo off
 echo Starting MILES System...
 
-:: 1. Start Celery Worker (Background or Separate Window)
+:: 1. Start Celery Workers (Background or Separate Window)
 :: We use start /min to keep it less intrusive
-echo Starting Celery Worker...
-start "MILES Worker" /min celery -A src.workers.celery_app worker --loglevel=info -P solo
+:: GPU queue: 3D generation, one job at a time
+echo Starting Celery GPU Worker...
+start "MILES GPU Worker" /min celery -A src.workers.celery_app worker -Q gpu -n gpu@%%h -P solo -c 1 --prefetch-multiplier 1 --loglevel=info
+:: IO queue: web research, many concurrent network-bound jobs
+echo Starting Celery IO Worker...
+start "MILES IO Worker" /min celery -A src.workers.celery_app worker -Q io -n io@%%h -P threads -c 8 --loglevel=info
 
 :: 2. Start Hand Tracker (Computer Vision)
 echo Starting Hand Tracker...
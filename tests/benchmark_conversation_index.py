@@ -0,0 +1,48 @@
+import sys
+import os
+import random
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+from src.core.conversation_index import ConversationIndex
+
+QUERIES = 1_000
+
+TOPICS = [
+    "quantum computing qubits and error correction",
+    "medieval castle architecture and siege towers",
+    "python asyncio event loop scheduling",
+    "volcano eruptions and lava flows",
+    "rotating the hologram on the kiosk display",
+    "latest gpu prices in europe",
+]
+
+QUESTIONS = [
+    "what did we say about castle towers?",
+    "remind me how the asyncio loop schedules tasks",
+    "go back to the gpu prices",
+]
+
+
+def benchmark():
+    rng = random.Random(0)
+    print(f"{'turns':>8} {'add us':>8} {'search ms':>10}")
+    for turns in (1_000, 10_000, 20_000, 50_000):
+        index = ConversationIndex(config.MEMORY_INDEX_DIM)
+        started = time.perf_counter()
+        for i in range(turns):
+            index.add(f"turn {i}: {rng.choice(TOPICS)} ({rng.random():.3f})")
+        add_us = (time.perf_counter() - started) / turns * 1e6
+
+        started = time.perf_counter()
+        for i in range(QUERIES):
+            index.search(QUESTIONS[i % len(QUESTIONS)], k=config.MEMORY_RELEVANT_MESSAGES, limit=turns)
+        search_ms = (time.perf_counter() - started) / QUERIES * 1e3
+        print(f"{turns:>8} {add_us:>8.1f} {search_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    benchmark()
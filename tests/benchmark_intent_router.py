@@ -0,0 +1,65 @@
+import sys
+import os
+import random
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+from src.core.intent_router import IntentRouter
+
+TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+SAMPLE_PROMPTS = [
+    "hi",
+    "hello there",
+    "what's your name?",
+    "generate a 3d model of a vintage motorcycle helmet",
+    "make me a glb of a cat sitting on a chair",
+    "search for the latest gpu prices in europe",
+    "look up the weather forecast for tomorrow in tokyo",
+    "do a research on retrieval augmented generation",
+    "please analyze this quarterly report and compare it with last year",
+    "explain how a transformer attention layer works",
+    "rotate the hologram to the left",
+    "tell me a joke about programmers",
+    "what is the capital of australia and why was it chosen",
+    "write a short poem about the sea at night",
+]
+
+
+def synthetic_rules(extra_intents: int) -> dict:
+    """Config rules plus `extra_intents` made-up intents of five phrases each."""
+    rng = random.Random(extra_intents)
+    rules = dict(config.INTENT_RULES)
+    for i in range(extra_intents):
+        rules[f"synthetic_{i}"] = [
+            " ".join(f"w{rng.randrange(100_000)}" for _ in range(rng.randint(1, 3))) for _ in range(5)
+        ]
+    return rules
+
+
+def run(router: IntentRouter, total: int) -> float:
+    prompts = SAMPLE_PROMPTS
+    n = len(prompts)
+    route = router.route
+    started = time.perf_counter()
+    for i in range(total):
+        route(prompts[i % n])
+    return time.perf_counter() - started
+
+
+def benchmark():
+    print(f"Routing {TOTAL:,} prompts per configuration...\n")
+    print(f"{'intents':>8} {'phrases':>8} {'seconds':>9} {'prompts/s':>12} {'us/prompt':>10}")
+    for extra in (0, 100, 1_000, 10_000):
+        rules = synthetic_rules(extra)
+        router = IntentRouter(rules)
+        elapsed = run(router, TOTAL)
+        phrases = sum(len(p) for p in rules.values())
+        print(f"{len(rules):>8} {phrases:>8} {elapsed:>9.2f} {TOTAL / elapsed:>12,.0f} {elapsed / TOTAL * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
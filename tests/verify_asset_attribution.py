@@ -0,0 +1,72 @@
+import sys
+import os
+import tempfile
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+
+config.BRAIN_MODE = "DEMO"
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import endpoints
+from src.core.asset_registry import asset_registry
+from src.core.memory import memory, sessions
+from src.workers.celery_app import celery_app
+
+# Run tasks in-process; the session header must still reach each task.
+celery_app.conf.task_always_eager = True
+
+tmp_dir = tempfile.mkdtemp()
+asset_registry.path = os.path.join(tmp_dir, "assets.sqlite3")
+
+
+@celery_app.task(name="tests.fake_generate_3d_model")
+def fake_generate_3d_model(prompt: str) -> str:
+    # Registers its output exactly like tasks.generate_3d_model does.
+    path = os.path.join(tmp_dir, f"{prompt.replace(' ', '_')}.glb")
+    with open(path, "w") as f:
+        f.write("glb")
+    memory.register_file(path, is_temp=True, prompt=prompt, kind="model")
+    return path
+
+
+def test_batch_attribution():
+    print("Checking that /interact/batch attributes each item's asset to its own user...")
+    # The DEMO brain plans every prompt as RAG_Search; route it to the fake model worker.
+    endpoints.WORKER_MAP["RAG_Search"] = fake_generate_3d_model
+    app = FastAPI()
+    app.include_router(endpoints.router, prefix="/api/v1")
+    client = TestClient(app)
+
+    response = client.post("/api/v1/interact/batch", json={"requests": [
+        {"prompt": "generate a 3d model of a chair", "user_id": "alice"},
+        {"prompt": "generate a 3d model of a lamp", "user_id": "bob"},
+    ]})
+    if response.status_code != 202:
+        print(f"FAIL: batch returned {response.status_code}: {response.text}")
+        return False
+
+    ok = True
+    for user, expected in (("alice", "chair"), ("bob", "lamp")):
+        assets = asset_registry.list_session(sessions.session_key(user))
+        names = [asset["basename"] for asset in assets]
+        if len(assets) == 1 and expected in names[0]:
+            print(f"  {user}: {names}")
+        else:
+            print(f"FAIL: {user} owns {names}, expected one {expected} model")
+            ok = False
+    unowned = asset_registry.list_session(None)
+    if unowned:
+        print(f"FAIL: assets without an owner: {[asset['basename'] for asset in unowned]}")
+        ok = False
+    if ok:
+        print("PASS: every batch item's asset belongs to its user")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_batch_attribution() else 1)
@@ -0,0 +1,64 @@
+import sys
+import os
+import asyncio
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+from src.core.schemas import OrchestratorPlan
+from src.orchestrator import gemini_brain
+from src.orchestrator.fallback_chain import OPEN, FallbackOrchestrator
+
+
+class _BrokenChat:
+    async def send_message_async(self, *args, **kwargs):
+        raise ConnectionError("Gemini unreachable")
+
+
+class _BrokenModel:
+    def start_chat(self, history=None):
+        return _BrokenChat()
+
+
+async def _stream(chain, prompt):
+    tokens, plan = [], None
+    async for item in chain.astream_decompose(prompt):
+        if isinstance(item, OrchestratorPlan):
+            plan = item
+        else:
+            tokens.append(item)
+    return tokens, plan
+
+
+def test_stream_failover():
+    print("Checking that /interact/stream fails over when the Gemini stream raises...")
+    # Every Gemini call (streaming and the non-streaming retry) fails before any text.
+    gemini_brain.gemini_model = lambda *args, **kwargs: _BrokenModel()
+    chain = FallbackOrchestrator(["GEMINI", "DEMO"])
+    gemini = chain.members[0]
+
+    ok = True
+    for attempt in range(config.BRAIN_BREAKER_FAILURES):
+        tokens, plan = asyncio.run(_stream(chain, f"tell me something about otters #{attempt}"))
+        if any("trouble connecting" in token for token in tokens):
+            print(f"FAIL: Gemini's connection error was streamed as an answer: {tokens}")
+            ok = False
+        if plan is None or not plan.tasks:
+            print(f"FAIL: the DEMO brain did not answer: {plan}")
+            ok = False
+
+    print(f"  Gemini: {gemini.successes} ok, {gemini.failures} failed, breaker {gemini.breaker.state}")
+    if gemini.successes or gemini.failures != config.BRAIN_BREAKER_FAILURES:
+        print("FAIL: the failed streams were not recorded as Gemini failures")
+        ok = False
+    if gemini.breaker.state != OPEN:
+        print("FAIL: Gemini's circuit did not open")
+        ok = False
+    if ok:
+        print("PASS: the next brain answered and Gemini's circuit opened")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_stream_failover() else 1)
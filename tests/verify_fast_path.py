@@ -0,0 +1,55 @@
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.simple_responder import fast_path
+
+ANSWERS = [
+    ("2+2", "The answer is 4."),
+    ("(3 + 4) * 2", "The answer is 14."),
+    ("-5 + 10", "The answer is 5."),
+]
+
+# Must be refused with the fast-path message, never raise or stall.
+HOSTILE = [
+    "1+" * 3000 + "1",
+    "-" * 5000 + "1",
+    "(" * 3000 + "1" + ")" * 3000,
+    "(((9**99)**99)**99)**99",
+    "9" * 5000 + "*" + "9" * 5000,
+    "1/0",
+]
+
+
+def test_math_rule():
+    print("Checking the fast-path math rule on normal and hostile expressions...")
+    ok = True
+    for prompt, expected in ANSWERS:
+        result = fast_path.respond(prompt)
+        if result != ("math", expected):
+            print(f"FAIL: {prompt!r} -> {result}, expected {expected!r}")
+            ok = False
+
+    for prompt in HOSTILE:
+        label = prompt if len(prompt) <= 30 else f"{prompt[:20]}... ({len(prompt)} chars)"
+        try:
+            result = fast_path.respond(prompt)
+        except Exception as exc:
+            print(f"FAIL: {label!r} raised {type(exc).__name__}: {exc}")
+            ok = False
+            continue
+        if result is not None and result[0] == "math" and "wasn't recognized" in result[1]:
+            print(f"  {label!r}: refused")
+        else:
+            print(f"FAIL: {label!r} -> {result}")
+            ok = False
+
+    if ok:
+        print("PASS: arithmetic is answered and hostile expressions are refused")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_math_rule() else 1)
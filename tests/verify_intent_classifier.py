@@ -0,0 +1,68 @@
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+from src.core.intent_classifier import SEED_EXAMPLES, train
+
+# Held-out prompts (none of them is a seed). None = ambiguous: the classifier
+# must leave it to the LLM, i.e. not route it to a worker at or above the threshold.
+HELD_OUT = [
+    ("create a 3d model of a lamp", "3D_Generator"),
+    ("generate a mesh of a teapot", "3D_Generator"),
+    ("model a wooden boat in 3d", "3D_Generator"),
+    ("i want a low poly fox", "3D_Generator"),
+    ("search the web for flight prices to tokyo", "RAG_Search"),
+    ("look up the weather in paris", "RAG_Search"),
+    ("find news about the election", "RAG_Search"),
+    ("what is the capital of france", "direct"),
+    ("tell me a story", "direct"),
+    ("explain gravity", "direct"),
+    ("how do magnets work", "direct"),
+    ("render a cat", None),
+    ("make a cat", None),
+    ("draw a cat", None),
+    ("show me a picture of a dog", None),
+    ("render this page", None),
+    ("build a website", None),
+    ("make me laugh", None),
+    ("create a poem about love", None),
+    ("find the bug in my code", None),
+    ("what's the latest on my order", None),
+]
+
+
+def test_held_out():
+    threshold = config.INTENT_CLASSIFIER_THRESHOLD
+    print(f"Checking INTENT_CLASSIFIER_THRESHOLD = {threshold} on {len(HELD_OUT)} held-out prompts...")
+    seeds = {prompt for prompt, _ in SEED_EXAMPLES}
+    assert not seeds & {prompt for prompt, _ in HELD_OUT}, "held-out prompt is a seed"
+
+    # Same data as `python -m src.core.intent_classifier train`.
+    model = train([config.ROUTING_LOG_PATH])
+
+    ok = True
+    local = 0
+    for prompt, expected in HELD_OUT:
+        label, confidence = model.predict(prompt)
+        routed = label != "direct" and confidence >= threshold
+        local += routed
+        if routed and label != expected:
+            print(f"FAIL: {prompt!r} routed to {label} ({confidence:.3f}), expected {expected or 'the LLM'}")
+            ok = False
+        else:
+            print(f"  {prompt!r}: {label} {confidence:.3f}{'  (local)' if routed else ''}")
+
+    print(f"Routed locally: {local}/{len(HELD_OUT)}")
+    if local == 0:
+        print("FAIL: nothing is routed locally; the threshold is too high to be useful")
+        ok = False
+    if ok:
+        print("PASS: no held-out prompt is routed to the wrong worker")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_held_out() else 1)
@@ -0,0 +1,94 @@
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+from src.core.semantic_cache import HashingVectorizer, SemanticCache
+
+# Rewordings of the same question: must be served from the cache.
+PARAPHRASES = [
+    ("what is quantum physics", "explain quantum physics"),
+    ("tell me about quantum physics", "what is quantum physics?"),
+    ("what is the capital of france", "tell me the capital of france"),
+    ("what's the capital of france", "What is the capital of France?"),
+    ("define photosynthesis", "what is photosynthesis"),
+    ("explain black holes", "describe black holes"),
+    ("what is machine learning", "can you explain machine learning"),
+    ("what are black holes", "please explain black holes to me"),
+]
+
+# Different questions about the same topic: must NOT get each other's answer.
+NEAR_MISSES = [
+    ("how do I convert celsius to fahrenheit", "how do I convert fahrenheit to celsius"),
+    ("who invented the telephone", "when was the telephone invented"),
+    ("where is the eiffel tower", "why is the eiffel tower"),
+    ("is it safe to eat raw chicken", "why is it not safe to eat raw chicken"),
+    ("is raw chicken safe", "isn't raw chicken safe"),
+    ("who is the president of france", "who is the president of the united states"),
+    ("what is the capital of france", "what is the capital of germany"),
+    ("how do I get from paris to london", "how do I get from london to paris"),
+    ("can dogs eat chocolate", "can cats eat chocolate"),
+    ("why is the sky blue", "why is the sea blue"),
+    ("what is 2 plus 2", "what is 2 plus 3"),
+    ("should I buy bitcoin", "should I not buy bitcoin"),
+    ("how tall is mount everest", "how old is mount everest"),
+    ("when did world war 2 end", "when did world war 1 end"),
+]
+
+
+def test_threshold_calibration():
+    print(f"Checking SEMANTIC_CACHE_THRESHOLD = {config.SEMANTIC_CACHE_THRESHOLD} against labelled pairs...")
+    vectorizer = HashingVectorizer(config.SEMANTIC_CACHE_DIM)
+
+    def score(a, b):
+        return float(vectorizer.transform(a) @ vectorizer.transform(b))
+
+    ok = True
+    lowest_hit = min(score(a, b) for a, b in PARAPHRASES)
+    for a, b in PARAPHRASES:
+        s = score(a, b)
+        if s < config.SEMANTIC_CACHE_THRESHOLD:
+            print(f"FAIL: paraphrase misses ({s:.3f}): {a!r} / {b!r}")
+            ok = False
+    highest_miss = max(score(a, b) for a, b in NEAR_MISSES)
+    for a, b in NEAR_MISSES:
+        s = score(a, b)
+        if s >= config.SEMANTIC_CACHE_THRESHOLD:
+            print(f"FAIL: near miss hits ({s:.3f}): {a!r} / {b!r}")
+            ok = False
+
+    print(f"Lowest paraphrase score: {lowest_hit:.3f}, highest near-miss score: {highest_miss:.3f}")
+    if ok:
+        print("PASS: threshold separates paraphrases from near misses")
+    return ok
+
+
+def test_background_save():
+    print("Checking that store() leaves the disk write to the background thread...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.npz"
+        cache = SemanticCache(path, capacity=config.SEMANTIC_CACHE_CAPACITY, threshold=0.9,
+                              dim=config.SEMANTIC_CACHE_DIM, persist_every=1)
+        started = time.perf_counter()
+        cache.store("what is quantum physics", "Quantum physics studies matter at the smallest scales.")
+        store_ms = (time.perf_counter() - started) * 1000
+
+        deadline = time.time() + 10
+        while not path.exists() and time.time() < deadline:
+            time.sleep(0.05)
+
+        reloaded = SemanticCache(path, capacity=16, threshold=0.9, dim=config.SEMANTIC_CACHE_DIM)
+        ok = reloaded.lookup("explain quantum physics") is not None
+        print(f"store(): {store_ms:.2f} ms")
+        print("PASS: persisted in the background" if ok else "FAIL: entry was not persisted")
+        return ok
+
+
+if __name__ == "__main__":
+    results = [test_threshold_calibration(), test_background_save()]
+    sys.exit(0 if all(results) else 1)